@@ -0,0 +1,158 @@
+# Copyright (c) 2021 Bo Jin <jinbostar@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import numpy as np
+
+from bay import Bay
+from bay_state import BayState, min_max
+from common import irange
+
+# empty slots of pri and qlt hold this sentinel (priorities start from 1)
+EMPTY = 0
+
+
+class ArrayBay:
+    __slots__ = ('n_stacks', 'n_tiers', 'h', 'n_blocks', 'pri', 'values', 'p_max', 'qlt')
+
+    def __init__(self, n_stacks, n_tiers, conf):
+        assert len(conf) == n_stacks
+        for s in range(n_stacks):
+            assert len(conf[s]) <= n_tiers
+            for t in range(1, len(conf[s])):
+                assert conf[s][t] is None or conf[s][t - 1] is not None
+
+        h = np.array([len(conf[s]) - conf[s].count(None) for s in range(n_stacks)], dtype=np.int32)
+        p_max = max((p for s in range(n_stacks) for p in conf[s][:h[s]]), default=0)
+        pri = np.full((n_stacks, n_tiers), EMPTY, dtype=grid_dtype(p_max))
+        for s in range(n_stacks):
+            pri[s, :h[s]] = conf[s][:h[s]]
+        self._setup(n_tiers, pri, h)
+
+    @classmethod
+    def from_grid(cls, grid):
+        # the grid is used as is (no copy), so a memory-mapped grid stays memory-mapped
+        (n_stacks, n_tiers) = grid.shape
+        h = np.count_nonzero(grid != EMPTY, axis=1).astype(np.int32)
+        assert np.all((np.arange(n_tiers) < h[:, None]) == (grid != EMPTY))
+        bay = cls.__new__(cls)
+        bay._setup(n_tiers, grid, h)
+        return bay
+
+    @classmethod
+    def from_bay(cls, bay):
+        return cls(bay.n_stacks, bay.n_tiers, [bay.pri[s][:bay.h[s]] for s in range(bay.n_stacks)])
+
+    def _setup(self, n_tiers, pri, h):
+        self.n_stacks = n_stacks = pri.shape[0]
+        self.n_tiers = n_tiers
+        self.h = h
+        self.n_blocks = int(h.sum())
+        self.pri = pri
+        self.values = values = pri[np.arange(n_tiers) < h[:, None]]
+        self.p_max = p_max = int(values.max()) if values.size > 0 else 0
+
+        # qlt[s][t] = min(pri[s][0..t]) for occupied slots; qlt[s][n_tiers] = p_max + 1 as in Bay
+        dtype = np.promote_types(pri.dtype, grid_dtype(p_max + 1))
+        occupied = np.arange(n_tiers) < h[:, None]
+        self.qlt = qlt = np.empty((n_stacks, n_tiers + 1), dtype=dtype)
+        qlt[:, :n_tiers] = np.where(occupied, np.minimum.accumulate(np.where(occupied, pri, p_max + 1), axis=1), EMPTY)
+        qlt[:, n_tiers] = p_max + 1
+
+    def to_bay(self):
+        return Bay(self.n_stacks, self.n_tiers, [self.pri[s, :self.h[s]].tolist() for s in range(self.n_stacks)])
+
+    def is_distinct(self):
+        values = self.values
+        return values.size == 0 or np.unique(values).size == values.size and int(values.min()) + values.size - 1 == int(values.max())
+
+    def __str__(self):
+        return str(self.to_bay())
+
+    def brp_min_max(self, with_moves=False):
+        # the number of relocations of the min-max heuristic and, if with_moves, its plan (see BayState.moves)
+        state = BayState.from_bay(self)
+        n_relos = min_max(state)
+        return (n_relos, state.moves) if with_moves else n_relos
+
+    def validate_full_distinct(self):
+        assert np.array_equal(np.sort(self.values), np.arange(1, self.n_blocks + 1))
+
+    def validate_distinct(self):
+        assert np.unique(self.values).size == self.n_blocks
+
+    def compute_lb_kh(self):
+        return int(np.count_nonzero(self.pri > self.qlt[:, :self.n_tiers]))
+
+    def compute_lb_zhu(self):
+        self.validate_distinct()
+        n_stacks = self.n_stacks
+        n_tiers = self.n_tiers
+        n_blocks = self.n_blocks
+        pri = self.pri
+        qlt = self.qlt
+
+        h = self.h.copy()
+        (stacks, tiers) = np.nonzero(np.arange(n_tiers) < h[:, None])
+        loc_s = np.zeros(self.p_max + 1, dtype=np.int32)
+        loc_t = np.zeros(self.p_max + 1, dtype=np.int32)
+        loc_s[self.values] = stacks
+        loc_t[self.values] = tiers
+        open_stacks = np.nonzero(h < n_tiers)[0]
+        q_max = int(qlt[open_stacks, h[open_stacks] - 1].max())
+
+        lb = {}
+        lb_plus = {}
+        for n in irange(1, n_blocks):
+            s = int(loc_s[n])
+            t = int(loc_t[n])
+            if t < h[s]:
+                lb[n] = int(h[s]) - t - 1
+                lb_plus[n] = int(np.count_nonzero(pri[s, t + 1:h[s]] > q_max))
+                h[s] = t
+                q_max = max(q_max, int(qlt[s, t - 1]) if t > 0 else int(qlt[s, n_tiers]))
+            else:
+                lb[n] = 0
+                lb_plus[n] = 0
+
+        return lb, lb_plus
+
+    compute_lb_fb = Bay.compute_lb_fb
+    compute_lb_lu = Bay.compute_lb_lu
+
+
+def grid_dtype(p_max):
+    return np.int16 if p_max <= np.iinfo(np.int16).max else np.int32
+
+
+def test():
+    conf = [[4, 1], [2], [1, 3, 4]]
+    bay = ArrayBay(3, 3, conf)
+    print('bay')
+    print(bay)
+    print('lb_kh = {}'.format(bay.compute_lb_kh()))
+    print('n_relos (min-max) = {}'.format(bay.brp_min_max()))
+
+    conf = [[4], [3, 1], [2, 5, 6]]
+    bay = ArrayBay(3, 3, conf)
+    bay.validate_full_distinct()
+    print()
+    print('bay')
+    print(bay)
+    print('lb_zhu = {}'.format(bay.compute_lb_zhu()))
+
+
+if __name__ == '__main__':
+    test()
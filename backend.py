@@ -0,0 +1,186 @@
+# Copyright (c) 2021 Bo Jin <jinbostar@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import os
+from array import array
+from importlib.util import find_spec
+from math import inf
+from time import perf_counter
+from types import SimpleNamespace
+
+from stream import Expr, StreamModel
+
+# The formulations build their models with new_model, so that they run with CPLEX (docplex) where it is installed and
+# with HiGHS (through scipy.optimize.milp) everywhere else. The model argument of a formulation is either a model to
+# build into (e.g., a stream.StreamModel) or the name of a backend; by default, the backend is the one named by the
+# environment variable CRP_BACKEND, or CPLEX if docplex is installed.
+BACKENDS = ('cplex', 'highs')
+
+
+def default_backend():
+    return os.environ.get('CRP_BACKEND') or ('cplex' if find_spec('docplex') else 'highs')
+
+
+def new_model(model=None):
+    if model is None:
+        model = default_backend()
+    if not isinstance(model, str):
+        return model
+    if model == 'cplex':
+        from docplex.mp.model import Model
+        return Model()
+    if model == 'highs':
+        return HighsModel()
+    raise ValueError('unknown backend: {}'.format(model))
+
+
+class HighsModel(StreamModel):
+    # the expression layer of stream.py, with the rows collected into CSR arrays instead of a file and solved by HiGHS;
+    # parameters.threads is kept for the callers but not passed on, as scipy does not expose it; lazy holds the separators
+    # of lazy.py
+    def __init__(self):
+        super().__init__()
+        self.writer = self.matrix = Matrix()
+        self.parameters = SimpleNamespace(timelimit=None, threads=0, mip_rel_gap=None, log_output=False)
+        self.solve_details = None
+        self.lazy = []
+
+    def set_objective(self, sense, expr):
+        # no file to lead, so that the objective may be set (or replaced) at any time
+        self.objective = Expr({}).add(expr, 1)
+        self.objective_sense = sense
+
+    @property
+    def number_of_nonzeros(self):
+        return len(self.matrix.data)
+
+    def solve(self):
+        # True if a solution was found, None otherwise (as docplex); objective_value, solution_value of the variables and
+        # solve_details (status, best_bound, mip_relative_gap, time) are set as by docplex
+        import numpy as np
+        from scipy.optimize import Bounds, LinearConstraint, milp
+        from scipy.sparse import csr_array
+
+        from lazy import LAZY_TOL, separate_all
+
+        start = perf_counter()
+        n = len(self.variables)
+        sign = -1 if self.objective_sense == 'max' else 1
+        c = np.zeros(n)
+        constant = 0
+        if self.objective is not None:
+            for i, coef in self.objective.terms.items():
+                c[i] += coef
+            constant = self.objective.constant
+        integrality = np.array([var.vtype != 'C' for var in self.variables], dtype=np.uint8)
+        bounds = Bounds(np.array([var.lb for var in self.variables], dtype=float), np.array([var.ub for var in self.variables], dtype=float))
+        options = {'disp': self.parameters.log_output}
+        if self.parameters.mip_rel_gap is not None:
+            options['mip_rel_gap'] = self.parameters.mip_rel_gap
+        while True:
+            constraints = []
+            if self.number_of_rows > 0:
+                matrix = self.matrix
+                a = csr_array((np.frombuffer(matrix.data, dtype=float), np.frombuffer(matrix.indices, dtype=np.int64), np.frombuffer(matrix.indptr, dtype=np.int64)), shape=(self.number_of_rows, n))
+                constraints = [LinearConstraint(a, np.frombuffer(matrix.row_lb, dtype=float), np.frombuffer(matrix.row_ub, dtype=float))]
+            if self.parameters.timelimit is not None:
+                options['time_limit'] = max(0, self.parameters.timelimit - (perf_counter() - start))
+            result = milp(sign * c, integrality=integrality, bounds=bounds, constraints=constraints, options=options)
+            (x, fun) = (result.x, result.fun)
+            # lazy families (see lazy.py) get the rows that the solution violates, and the model is solved again
+            rows = [] if x is None else separate_all(self.lazy, x, LAZY_TOL)
+            if not rows:
+                break
+            if result.status != 0:
+                # out of time with a solution that violates lazy rows
+                (x, fun) = (None, None)
+                break
+            # the CSR arrays are views of the matrix, which has to be released before it grows
+            (a, constraints) = (None, [])
+            self.add_rows([(cols, vals) for cols, vals, _, _ in rows], [sense for _, _, sense, _ in rows], [rhs for _, _, _, rhs in rows])
+
+        status = {0: 'integer optimal solution', 1: 'time limit exceeded', 2: 'integer infeasible', 3: 'unbounded'}.get(result.status, result.message)
+        bound = getattr(result, 'mip_dual_bound', None)
+        self.solve_details = SimpleNamespace(status=status, best_bound=None if bound is None else sign * bound + constant, mip_relative_gap=getattr(result, 'mip_gap', None), time=perf_counter() - start)
+        # scipy takes no MIP start, so a feasible start replaces a worse (or missing) solution afterwards
+        for values in self.mip_starts:
+            x0 = np.array([values.get(var, 0) for var in self.variables], dtype=float)
+            if (x is None or sign * c @ x0 < fun) and is_feasible(x0, bounds, integrality, constraints) and not separate_all(self.lazy, x0, LAZY_TOL):
+                (x, fun) = (x0, sign * c @ x0)
+                if self.solve_details.best_bound is not None:
+                    self.solve_details.mip_relative_gap = abs(sign * fun + constant - self.solve_details.best_bound) / (1e-10 + abs(sign * fun + constant))
+        if x is None:
+            self.objective_value = None
+            return None
+        for (var, value) in zip(self.variables, x.tolist()):
+            var.solution_value = value
+        self.objective_value = sign * fun + constant
+        if self.solve_details.best_bound is None:
+            # without integer variables
+            self.solve_details.best_bound = self.objective_value
+            self.solve_details.mip_relative_gap = 0
+        return True
+
+    @property
+    def number_of_rows(self):
+        return len(self.matrix.indptr) - 1
+
+
+def is_feasible(x, bounds, integrality, constraints, tol=1e-6):
+    import numpy as np
+
+    if np.any(x < bounds.lb - tol) or np.any(x > bounds.ub + tol) or np.any(np.abs(x - np.round(x))[integrality == 1] > tol):
+        return False
+    return all(np.all(ct.A @ x >= ct.lb - tol) and np.all(ct.A @ x <= ct.ub + tol) for ct in constraints)
+
+
+class Matrix:
+    # rows as CSR arrays, in place of a writer of stream.py
+    def __init__(self):
+        self.indptr = array('q', [0])
+        self.indices = array('q')
+        self.data = array('d')
+        self.row_lb = array('d')
+        self.row_ub = array('d')
+
+    def write_objective(self, sense, objective):
+        pass
+
+    def write_row(self, name, terms, sense, rhs):
+        self.indices.extend(terms.keys())
+        self.data.extend(terms.values())
+        self.indptr.append(len(self.indices))
+        self.row_lb.append(-inf if sense == 'L' else rhs)
+        self.row_ub.append(inf if sense == 'G' else rhs)
+
+    def close(self, sense, objective):
+        pass
+
+
+def test():
+    from bay import Bay
+    from demelodasilva2018.BRP_m2 import BRP_m2
+
+    bay = Bay(3, 3, [[4, 1], [2], [1, 3, 4]])
+    brp_m2 = BRP_m2(bay, model='highs')
+    if brp_m2.model.solve():
+        print('n_relos = {} ({})'.format(brp_m2.get_n_relos(), brp_m2.model.solve_details.status))
+        before, after = brp_m2.get_bays()
+        print(after[brp_m2.T])
+
+
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,199 @@
+# Copyright (c) 2021 Bo Jin <jinbostar@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import json
+import os
+import sys
+import warnings
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from itertools import islice
+from multiprocessing import get_context
+from time import perf_counter
+
+from backend import default_backend
+from bay import Bay
+from instrument import build
+from models import load
+from size import fit
+from template import Templates
+
+# the variables of the environment that size the thread pools of BLAS and OpenMP
+THREAD_VARIABLES = ['OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS']
+# the templates of a worker process, by formulation and flags
+TEMPLATES = {}
+
+
+def run_batch(bays, formulations, out=sys.stdout, n_workers=None, time_limit=None, threads=1, templates=False, memory_budget=None, build_report=False):
+    # Solves every bay with every formulation on a process pool and writes one JSON record per (bay, formulation) to out
+    # as soon as it finishes. A formulation is a name from models.FORMULATIONS or a (name, flags) pair. Each job gets
+    # threads CPLEX threads and the pool has n_workers processes (by default, as many as fit into the available cores),
+    # so that the cores are not oversubscribed; HiGHS solves through scipy on one thread whatever threads is (a warning
+    # says so), so that threads then only sizes the pool. bays may be a generator; only a bounded number of jobs is
+    # queued. With templates, every worker builds the formulations that support it with their flags (supports_template)
+    # once per size of bay (see template.py), and the others from scratch. With memory_budget (bytes per job), a
+    # formulation whose estimated model does not fit is replaced by the first smaller one that does, or refused with a
+    # MemoryError in the record, before anything is built (see size.py). With build_report, the records of the models
+    # built from scratch hold the time, rows, non-zeros and memory of every family of the build (see instrument.py). If a
+    # worker dies (e.g., killed for its memory), the remaining jobs go to a new pool, and the jobs of the broken pool are
+    # run again one at a time in a pool of their own, so that only a job that breaks it again gets a BrokenProcessPool
+    # error in its record.
+    formulations = [(f, {}) if isinstance(f, str) else f for f in formulations]
+    if n_workers is None:
+        n_workers = max(1, (os.cpu_count() or 1) // threads)
+    if threads > 1 and any(name != 'RestrictedSearch' and (flags.get('model') or default_backend()) == 'highs' for name, flags in formulations):
+        warnings.warn('HiGHS solves on one thread; threads = {} only sizes the pool'.format(threads))
+
+    def jobs():
+        for (index, bay) in enumerate(bays):
+            conf = [list(islice(bay.pri[s], bay.h[s])) for s in range(bay.n_stacks)]
+            for (name, flags) in formulations:
+                yield index, bay.n_stacks, bay.n_tiers, conf, name, flags, time_limit, threads, templates, memory_budget, build_report
+
+    def new_pool(n):
+        # spawned workers, which start NumPy with the thread limits of the environment
+        return ProcessPoolExecutor(n, mp_context=get_context('spawn'))
+
+    n_records = 0
+    # the jobs of broken pools
+    broken = []
+    with thread_limits(threads):
+        pool = new_pool(n_workers)
+        try:
+            # future -> job
+            pending = {}
+            for job in jobs():
+                try:
+                    future = pool.submit(run_job, job)
+                except BrokenProcessPool:
+                    pool.shutdown()
+                    pool = new_pool(n_workers)
+                    future = pool.submit(run_job, job)
+                pending[future] = job
+                if len(pending) >= 2 * n_workers:
+                    n_records += write(wait(pending, return_when=FIRST_COMPLETED)[0], pending, broken, out)
+            n_records += write(as_completed(pending), pending, broken, out)
+
+            pool.shutdown()
+            pool = new_pool(1)
+            for job in broken:
+                try:
+                    record = pool.submit(run_job, job).result()
+                except BrokenProcessPool as e:
+                    record = {'bay': job[0], 'model': job[4], 'flags': job[5], 'error': '{}: {}'.format(type(e).__name__, e)}
+                    pool.shutdown()
+                    pool = new_pool(1)
+                out.write(json.dumps(record) + '\n')
+                out.flush()
+                n_records += 1
+        finally:
+            pool.shutdown()
+    return n_records
+
+
+def write(futures, pending, broken, out):
+    # writes the records of the finished futures (removed from pending), as they come; the jobs of a broken pool go to
+    # broken instead
+    n_records = 0
+    for future in futures:
+        job = pending.pop(future)
+        try:
+            record = future.result()
+        except BrokenProcessPool:
+            broken.append(job)
+            continue
+        out.write(json.dumps(record) + '\n')
+        out.flush()
+        n_records += 1
+    return n_records
+
+
+@contextmanager
+def thread_limits(threads):
+    # limits the BLAS and OpenMP pools of the processes started within to threads (next to the CPLEX threads parameter
+    # set per model), by their environment: a library reads it once, when it is loaded, so that the processes must not
+    # inherit the loaded libraries of this one (fork), but load them anew (spawn)
+    environ = {name: os.environ.get(name) for name in THREAD_VARIABLES}
+    os.environ.update((name, str(threads)) for name in THREAD_VARIABLES)
+    try:
+        yield
+    finally:
+        for name, value in environ.items():
+            if value is None:
+                del os.environ[name]
+            else:
+                os.environ[name] = value
+
+
+def run_job(job):
+    (index, n_stacks, n_tiers, conf, name, flags, time_limit, threads, templates, memory_budget, build_report) = job
+    record = {'bay': index, 'model': name, 'flags': flags}
+    try:
+        if memory_budget is not None:
+            (name, flags, size) = fit(name, flags, Bay(n_stacks, n_tiers, conf), memory_budget)
+            if (name, flags) != (record['model'], record['flags']):
+                record['requested'] = {'model': record['model'], 'flags': record['flags']}
+                (record['model'], record['flags']) = (name, flags)
+            record['estimated_memory'] = size.memory if size is not None else None
+        cls = load(name)
+        start = perf_counter()
+        if templates and hasattr(cls, 'supports_template') and cls.supports_template(flags):
+            key = (name, json.dumps(flags, sort_keys=True))
+            if key not in TEMPLATES:
+                TEMPLATES[key] = Templates(cls, **flags)
+            instance = TEMPLATES[key].get(Bay(n_stacks, n_tiers, conf))
+        elif build_report and name != 'RestrictedSearch':
+            instance = build(cls, Bay(n_stacks, n_tiers, conf), **flags)
+            record['build_report'] = instance.model.build_report.to_list()
+        else:
+            instance = cls(Bay(n_stacks, n_tiers, conf), **flags)
+        record['build_time'] = perf_counter() - start
+        start = perf_counter()
+        if hasattr(instance, 'model'):
+            model = instance.model
+            model.parameters.threads = threads
+            if time_limit is not None:
+                model.parameters.timelimit = time_limit
+            solution = model.solve()
+            details = model.solve_details
+            record['status'] = details.status
+            record['n_relos'] = instance.get_n_relos() if solution else None
+            record['bound'] = details.best_bound if solution else None
+            record['gap'] = details.mip_relative_gap if solution else None
+        else:
+            # RestrictedSearch
+            instance.time_limit = time_limit
+            record['status'] = 'optimal' if instance.solve() else 'feasible'
+            record['n_relos'] = instance.get_n_relos()
+            record['bound'] = instance.lb
+            record['gap'] = (instance.get_n_relos() - instance.lb) / max(1, instance.get_n_relos())
+        record['solve_time'] = perf_counter() - start
+    except Exception as e:
+        record['error'] = '{}: {}'.format(type(e).__name__, e)
+    return record
+
+
+def test():
+    bays = [Bay(3, 3, [[1, 3, 4], [5], [2]]), Bay(3, 3, [[4], [3, 1], [2, 5, 6]])]
+    run_batch(bays, ['RestrictedSearch', 'BRP_II_A', ('BRP_m2', {'restricted': True, 'distinct': True})], n_workers=2, time_limit=60)
+    run_batch(bays, [('BRP_II', {'bulk': True})], n_workers=1, time_limit=60, templates=True)
+    run_batch(bays, ['BRP_II', 'BRP_I'], n_workers=1, time_limit=60, memory_budget=2 ** 20)
+    run_batch(bays, ['BRP_II_A'], n_workers=1, time_limit=60, build_report=True)
+
+
+if __name__ == '__main__':
+    test()
@@ -14,9 +14,10 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 
-from copy import copy, deepcopy
+from copy import copy
 from itertools import chain, islice
 
+from bay_state import BayState, min_max
 from common import irange
 
 
@@ -45,6 +46,23 @@ class Bay:
         values = list(chain(*(islice(self.pri, self.h[s]) for s in range(self.n_stacks))))
         return len(values) == 0 or len(values) == len(set(values)) and min(values) + len(values) - 1 == max(values)
 
+    def canonical(self, relabel=True):
+        # equivalent bay with the stacks sorted by their contents and, if relabel, every priority replaced by its rank
+        # among the distinct priorities; stack s of the canonical bay is stack perm[s] of this bay, and priority p of the
+        # canonical bay is priority labels[p] of this bay
+        labels = {r: p for r, p in enumerate(sorted(set(self.values)), 1)} if relabel else {p: p for p in set(self.values)}
+        rank = {p: r for r, p in labels.items()}
+        stacks = [[rank[p] for p in islice(self.pri[s], self.h[s])] for s in range(self.n_stacks)]
+        perm = sorted(range(self.n_stacks), key=lambda s: stacks[s])
+        return Bay(self.n_stacks, self.n_tiers, [stacks[s] for s in perm]), perm, labels
+
+    def restore(self, perm, labels):
+        # inverse of canonical: maps a bay of the canonical instance (e.g., from get_bays) back to the original instance
+        conf = [None] * self.n_stacks
+        for s in range(self.n_stacks):
+            conf[perm[s]] = [labels[p] for p in islice(self.pri[s], self.h[s])]
+        return Bay(self.n_stacks, self.n_tiers, conf)
+
     def __str__(self):
         n_stacks = self.n_stacks
         n_tiers = self.n_tiers
@@ -99,42 +117,11 @@ class Bay:
 
         return ''.join(builder)
 
-    def brp_min_max(self):
-        if self.n_blocks == 0:
-            return 0
-
-        n_stacks = self.n_stacks
-        n_tiers = self.n_tiers
-        n_blocks = self.n_blocks
-        h = copy(self.h)
-        pri = deepcopy(self.pri)
-        qlt = deepcopy(self.qlt)
-
-        n_relos = 0
-        while n_blocks > 0:
-            min_value = min(chain(*(islice(pri[s], h[s]) for s in range(n_stacks))))
-            (s_target, t_target) = next((s, t) for s in range(n_stacks) for t in reversed(range(h[s])) if pri[s][t] == min_value and t + 1 >= n_blocks - (n_stacks - 1) * n_tiers)
-            while t_target < h[s_target] - 1:
-                p = pri[s_target][h[s_target] - 1]
-
-                s_dest = min((s for s in range(n_stacks) if s != s_target and h[s] < n_tiers and p <= qlt[s][h[s] - 1]), key=lambda s: qlt[s][h[s] - 1], default=max((s for s in range(n_stacks) if s != s_target and h[s] < n_tiers), key=lambda s: qlt[s][h[s] - 1]))
-
-                pri[s_target][h[s_target] - 1] = None
-                qlt[s_target][h[s_target] - 1] = None
-                h[s_target] -= 1
-
-                h[s_dest] += 1
-                pri[s_dest][h[s_dest] - 1] = p
-                qlt[s_dest][h[s_dest] - 1] = min(qlt[s_dest][h[s_dest] - 2], p)
-
-                n_relos += 1
-
-            pri[s_target][h[s_target] - 1] = None
-            qlt[s_target][h[s_target] - 1] = None
-            h[s_target] -= 1
-            n_blocks -= 1
-
-        return n_relos
+    def brp_min_max(self, with_moves=False):
+        # the number of relocations of the min-max heuristic and, if with_moves, its plan (see BayState.moves)
+        state = BayState.from_bay(self)
+        n_relos = min_max(state)
+        return (n_relos, state.moves) if with_moves else n_relos
 
     def validate_full_distinct(self):
         values = sorted(self.values)
@@ -177,3 +164,64 @@ class Bay:
                 lb_plus[n] = 0
 
         return lb, lb_plus
+
+    def compute_lb_fb(self):
+        # LB3-style bound for the restricted CRP with distinct priorities, after Forster & Bortfeldt: lb[n] blocks above
+        # block n have to be relocated when n is retrieved, and lb_plus[n] of them are larger than the minimum priority
+        # of every other stack that is not full, so that they are relocated badly. The stacks are taken without the
+        # blocks relocated onto them, which can only lower their minimum priority or fill them, so the count stays a
+        # lower bound.
+        self.validate_distinct()
+        n_stacks = self.n_stacks
+        n_tiers = self.n_tiers
+        pri = self.pri
+        qlt = self.qlt
+
+        h = copy(self.h)
+        loc = {pri[s][t]: (s, t) for s in range(n_stacks) for t in range(h[s])}
+
+        lb = {}
+        lb_plus = {}
+        for n in sorted(loc):
+            (s, t) = loc[n]
+            if t < h[s]:
+                q_max = max((qlt[r][h[r] - 1] for r in range(n_stacks) if r != s and h[r] < n_tiers), default=0)
+                lb[n] = h[s] - t - 1
+                lb_plus[n] = sum(1 for p in pri[s][t + 1:h[s]] if p > q_max)
+                h[s] = t
+            else:
+                lb[n] = 0
+                lb_plus[n] = 0
+
+        return lb, lb_plus
+
+    def compute_lb_lu(self):
+        # lower bound for the restricted CRP with duplicate priorities in the spirit of Lu et al. (2020), broken down by
+        # period: lb[g] blocks above the lowest block of priority g in each stack have to be relocated in period g, and
+        # lb_plus[g] of them are larger than the minimum priority of every other stack that is not full (a stack dug
+        # out in the same period taken without its blocks from its lowest block of priority g up). It coincides with
+        # compute_lb_fb for distinct priorities.
+        n_stacks = self.n_stacks
+        n_tiers = self.n_tiers
+        pri = self.pri
+        qlt = self.qlt
+
+        h = copy(self.h)
+        lowest = {}
+        for s in range(n_stacks):
+            for t in reversed(range(h[s])):
+                lowest[pri[s][t], s] = t
+
+        lb = {}
+        lb_plus = {}
+        for g in sorted(set(self.values)):
+            sources = {s: t for (p, s), t in lowest.items() if p == g and t < h[s]}
+            above = {s: [p for p in pri[s][t + 1:h[s]] if p != g] for s, t in sources.items()}
+            lb[g] = sum(len(above[s]) for s in sources)
+            h = [sources.get(r, h[r]) for r in range(n_stacks)]
+            lb_plus[g] = 0
+            for s in sources:
+                q_max = max((qlt[r][h[r] - 1] for r in range(n_stacks) if r != s and h[r] < n_tiers), default=0)
+                lb_plus[g] += sum(1 for p in above[s] if p > q_max)
+
+        return lb, lb_plus
@@ -0,0 +1,173 @@
+# Copyright (c) 2021 Bo Jin <jinbostar@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+from itertools import islice
+
+from zobrist import zobrist_hash, zobrist_key
+
+
+class BayState:
+    def __init__(self, n_stacks, n_tiers, stacks):
+        assert len(stacks) == n_stacks
+        assert all(len(stack) <= n_tiers for stack in stacks)
+
+        self.n_stacks = n_stacks
+        self.n_tiers = n_tiers
+        self.stacks = stacks = [list(stack) for stack in stacks]
+        self.h = [len(stack) for stack in stacks]
+        self.n_blocks = sum(self.h)
+        self.n_relos = 0
+        self.p_max = p_max = max((p for stack in stacks for p in stack), default=0)
+
+        # qlt[s][t + 1] = min(stacks[s][0..t]), with sentinel qlt[s][0] = p_max + 1
+        self.qlt = qlt = [[p_max + 1] for _ in range(n_stacks)]
+        # bucket queue: count[p] blocks of priority p located in stacks where[p] (stack -> count)
+        self.count = count = [0] * (p_max + 2)
+        self.where = where = [{} for _ in range(p_max + 2)]
+        for s in range(n_stacks):
+            for p in stacks[s]:
+                qlt[s].append(min(qlt[s][-1], p))
+                count[p] += 1
+                where[p][s] = where[p].get(s, 0) + 1
+        self.p_min = next((p for p in range(p_max + 2) if count[p] > 0), p_max + 1)
+        # Zobrist hash of the configuration, updated with every relocation and retrieval
+        self.hash = zobrist_hash(stacks)
+
+        # (src, dst, p) for a relocation and (src, None, p) for a retrieval
+        self.moves = []
+
+    @classmethod
+    def from_bay(cls, bay):
+        return cls(bay.n_stacks, bay.n_tiers, [[int(p) for p in islice(bay.pri[s], bay.h[s])] for s in range(bay.n_stacks)])
+
+    def copy(self):
+        state = BayState.__new__(BayState)
+        state.n_stacks = self.n_stacks
+        state.n_tiers = self.n_tiers
+        state.stacks = [list(stack) for stack in self.stacks]
+        state.h = list(self.h)
+        state.n_blocks = self.n_blocks
+        state.n_relos = self.n_relos
+        state.p_max = self.p_max
+        state.qlt = [list(q) for q in self.qlt]
+        state.count = list(self.count)
+        state.where = [dict(w) if w else {} for w in self.where]
+        state.p_min = self.p_min
+        state.hash = self.hash
+        state.moves = list(self.moves)
+        return state
+
+    def conf(self):
+        return [list(stack) for stack in self.stacks]
+
+    def top(self, s):
+        return self.stacks[s][-1] if self.h[s] > 0 else None
+
+    def min_pri(self, s):
+        return self.qlt[s][-1]
+
+    def is_full(self, s):
+        return self.h[s] >= self.n_tiers
+
+    def _pop(self, s):
+        p = self.stacks[s].pop()
+        self.qlt[s].pop()
+        self.h[s] -= 1
+        self.hash ^= zobrist_key(s, self.h[s], p)
+        w = self.where[p]
+        if w[s] == 1:
+            del w[s]
+        else:
+            w[s] -= 1
+        return p
+
+    def relocate(self, src, dst):
+        assert src != dst and self.h[src] > 0 and self.h[dst] < self.n_tiers
+        p = self._pop(src)
+        self.stacks[dst].append(p)
+        self.qlt[dst].append(min(self.qlt[dst][-1], p))
+        self.hash ^= zobrist_key(dst, self.h[dst], p)
+        self.h[dst] += 1
+        self.where[p][dst] = self.where[p].get(dst, 0) + 1
+        self.n_relos += 1
+        self.moves.append((src, dst, p))
+        return p
+
+    def retrieve(self, s):
+        p = self._pop(s)
+        self.count[p] -= 1
+        self.n_blocks -= 1
+        while self.p_min <= self.p_max and self.count[self.p_min] == 0:
+            self.p_min += 1
+        self.moves.append((s, None, p))
+        return p
+
+    def target(self):
+        # the highest block of minimum priority in the first stack where it can be dug out
+        p = self.p_min
+        t_min = self.n_blocks - (self.n_stacks - 1) * self.n_tiers - 1
+        return next((s, t) for s in sorted(self.where[p]) for t in [next(t for t in reversed(range(self.h[s])) if self.stacks[s][t] == p)] if t >= t_min)
+
+    def min_max_dest(self, src):
+        p = self.stacks[src][-1]
+        qlt = self.qlt
+        open_stacks = [s for s in range(self.n_stacks) if s != src and self.h[s] < self.n_tiers]
+        s_dest = min((s for s in open_stacks if p <= qlt[s][-1]), key=lambda s: qlt[s][-1], default=None)
+        return s_dest if s_dest is not None else max(open_stacks, key=lambda s: qlt[s][-1])
+
+
+def min_max(state):
+    while state.n_blocks > 0:
+        (s_target, t_target) = state.target()
+        while t_target < state.h[s_target] - 1:
+            state.relocate(s_target, state.min_max_dest(s_target))
+        state.retrieve(s_target)
+    return state.n_relos
+
+
+def play(state, moves, restricted=False):
+    # applies a plan (moves as in BayState.moves) to the state and returns its number of relocations; raises ValueError
+    # at the first move that is not possible or retrieves a block out of priority order, or if blocks are left. If
+    # restricted, a block of minimum priority on top is retrieved before the next relocation (and its retrieval in the
+    # plan from the same stack is skipped), and only blocks of a stack with a block of minimum priority may be relocated;
+    # state.moves holds the plan in this order
+    ahead = {}
+    for i, (src, dst, p) in enumerate(moves):
+        if dst is None and ahead.get((src, p)):
+            ahead[src, p] -= 1
+            continue
+        if not 0 <= src < state.n_stacks or state.top(src) != p:
+            raise ValueError('move {}: block {} is not on top of stack {}'.format(i, p, src))
+        if dst is None:
+            if p != state.p_min:
+                raise ValueError('move {}: block {} is retrieved before block {}'.format(i, p, state.p_min))
+            state.retrieve(src)
+            continue
+        if not 0 <= dst < state.n_stacks or dst == src or state.is_full(dst):
+            raise ValueError('move {}: block {} cannot be relocated to stack {}'.format(i, p, dst))
+        if restricted:
+            while state.n_blocks > 0:
+                s = next((s for s in state.where[state.p_min] if state.top(s) == state.p_min), None)
+                if s is None:
+                    break
+                ahead[s, state.p_min] = ahead.get((s, state.p_min), 0) + 1
+                state.retrieve(s)
+            if state.top(src) != p or src not in state.where[state.p_min]:
+                raise ValueError('move {}: block {} is not above a block of minimum priority'.format(i, p))
+        state.relocate(src, dst)
+    if state.n_blocks > 0:
+        raise ValueError('{} blocks are not retrieved'.format(state.n_blocks))
+    return state.n_relos
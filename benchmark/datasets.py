@@ -0,0 +1,92 @@
+# Copyright (c) 2021 Bo Jin <jinbostar@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import os
+from itertools import chain
+
+from bay import Bay
+
+# An instance file is a header followed by one line per stack (from left to right), each with the number of blocks and
+# their priorities from bottom to top. The header fields differ between the instance sets:
+# - caserta: Caserta et al. (2011) CV instances, with the numbers of stacks and blocks. The number of tiers is not given
+#   and defaults to the initial number of tiers (blocks per stack) plus 2, as in Caserta et al. (2012).
+# - zhu: Zhu et al. (2012) instances, with the numbers of tiers, stacks and blocks.
+# - expositoizquierdo: Expósito-Izquierdo et al. (2014) instances, with the numbers of stacks, tiers and blocks.
+FORMATS = {
+    'caserta': ('n_stacks', 'n_blocks'),
+    'zhu': ('n_tiers', 'n_stacks', 'n_blocks'),
+    'expositoizquierdo': ('n_stacks', 'n_tiers', 'n_blocks'),
+}
+
+
+def parse(text, fmt='caserta', n_tiers=None):
+    return read(iter(int(token) for token in text.split()), fmt, n_tiers)
+
+
+def parse_all(text, fmt='caserta', n_tiers=None):
+    # the bays of a text with several instances one after another
+    tokens = iter(int(token) for token in text.split())
+    for token in tokens:
+        yield read(chain([token], tokens), fmt, n_tiers)
+
+
+def read(tokens, fmt, n_tiers):
+    # the bay of the next instance of an iterator of tokens
+    header = {field: next(tokens) for field in FORMATS[fmt]}
+    n_stacks = header['n_stacks']
+    conf = []
+    for _ in range(n_stacks):
+        h = next(tokens)
+        conf.append([next(tokens) for _ in range(h)])
+    assert sum(len(stack) for stack in conf) == header['n_blocks']
+    if n_tiers is None:
+        n_tiers = header['n_tiers'] if 'n_tiers' in header else header['n_blocks'] // n_stacks + 2
+    return Bay(n_stacks, n_tiers, conf)
+
+
+def load(path, fmt='caserta', n_tiers=None):
+    with open(path) as f:
+        return parse(f.read(), fmt, n_tiers)
+
+
+def load_dir(path, fmt='caserta', n_tiers=None):
+    # (file name, bay) for every instance file of a directory, in file name order
+    for name in sorted(os.listdir(path)):
+        if os.path.isfile(os.path.join(path, name)) and not name.startswith('.'):
+            yield name, load(os.path.join(path, name), fmt, n_tiers)
+
+
+def dump(bay, fmt='caserta'):
+    header = {'n_stacks': bay.n_stacks, 'n_tiers': bay.n_tiers, 'n_blocks': bay.n_blocks}
+    lines = [' '.join(str(header[field]) for field in FORMATS[fmt])]
+    for s in range(bay.n_stacks):
+        lines.append(' '.join(str(p) for p in [bay.h[s]] + bay.pri[s][:bay.h[s]]))
+    return '\n'.join(lines) + '\n'
+
+
+def test():
+    text = '3 6\n1 4\n2 3 1\n3 2 5 6\n'
+    bay = parse(text)
+    print('bay')
+    print(bay)
+    print()
+    print(dump(bay, 'zhu'), end='')
+    assert parse(dump(bay, 'zhu'), 'zhu').pri == bay.pri
+    assert [b.pri for b in parse_all(text + dump(bay))] == [bay.pri, bay.pri]
+
+
+if __name__ == '__main__':
+    test()
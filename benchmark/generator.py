@@ -0,0 +1,55 @@
+# Copyright (c) 2021 Bo Jin <jinbostar@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+from random import Random
+
+from bay import Bay
+from common import irange
+
+
+def random_bay(n_stacks, n_tiers, n_blocks, seed, n_priorities=None, max_height=None):
+    # n_blocks blocks with distinct priorities 1..n_blocks (or, with n_priorities, priorities drawn from
+    # 1..n_priorities) stacked one by one onto random stacks of height below max_height (n_tiers by default); the same
+    # arguments always give the same bay
+    rng = Random('{} {} {} {} {} {}'.format(n_stacks, n_tiers, n_blocks, seed, n_priorities, max_height))
+    if max_height is None:
+        max_height = n_tiers
+    assert n_blocks <= n_stacks * max_height and max_height <= n_tiers
+    if n_priorities is None:
+        priorities = list(irange(1, n_blocks))
+        rng.shuffle(priorities)
+    else:
+        priorities = [rng.randint(1, n_priorities) for _ in range(n_blocks)]
+    conf = [[] for _ in range(n_stacks)]
+    for p in priorities:
+        conf[rng.choice([s for s in range(n_stacks) if len(conf[s]) < max_height])].append(p)
+    return Bay(n_stacks, n_tiers, conf)
+
+
+def random_bays(n_stacks, n_tiers, n_blocks, n_instances, seed=0, n_priorities=None, max_height=None):
+    for i in range(n_instances):
+        yield random_bay(n_stacks, n_tiers, n_blocks, '{}-{}'.format(seed, i), n_priorities, max_height)
+
+
+def test():
+    for bay in random_bays(3, 4, 7, 2):
+        print(bay)
+        print()
+    print(random_bay(3, 3, 6, 0, n_priorities=3))
+
+
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,167 @@
+# Copyright (c) 2021 Bo Jin <jinbostar@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import os
+import struct
+
+import numpy as np
+
+from array_bay import EMPTY, ArrayBay
+from bay import Bay
+from benchmark.datasets import parse_all
+
+# A packed instance file holds bays of one size: a header of 32 bytes (little-endian), with the magic, the numbers of
+# stacks and tiers, the number of bays and the size in bytes (1, 2 or 4) of a priority, followed by the grids of the
+# bays, each n_stacks x n_tiers unsigned integers from the bottom tier up, with 0 (array_bay.EMPTY) for an empty slot.
+# The grids are memory-mapped as one array of shape (n_bays, n_stacks, n_tiers): read yields Bay objects one at a time,
+# read_arrays yields ArrayBay objects on views of the mapping, and load_grids hands out the array itself.
+MAGIC = b'CRPBAYS1'
+HEADER = struct.Struct('<8sIIQB7x')
+DTYPES = {1: np.dtype('<u1'), 2: np.dtype('<u2'), 4: np.dtype('<u4')}
+# bays per chunk of the vectorized bounds
+CHUNK = 1 << 16
+
+
+class Writer:
+    # writes bays of one size one at a time; the number of bays is filled in on close
+    def __init__(self, path, n_stacks, n_tiers, p_max=None):
+        # priorities up to p_max (by default, the number of slots)
+        p_max = n_stacks * n_tiers if p_max is None else p_max
+        self.dtype = next(dtype for dtype in DTYPES.values() if p_max <= np.iinfo(dtype).max)
+        (self.n_stacks, self.n_tiers, self.n_bays) = (n_stacks, n_tiers, 0)
+        self.f = open(path, 'wb')
+        self.f.write(HEADER.pack(MAGIC, n_stacks, n_tiers, 0, self.dtype.itemsize))
+        self.grid = np.zeros((n_stacks, n_tiers), dtype=self.dtype)
+
+    def write(self, bay):
+        if (bay.n_stacks, bay.n_tiers) != (self.n_stacks, self.n_tiers):
+            raise ValueError('a bay of {}x{} in a file of {}x{}'.format(bay.n_stacks, bay.n_tiers, self.n_stacks, self.n_tiers))
+        if bay.p_max > np.iinfo(self.dtype).max:
+            raise ValueError('priority {} exceeds {} bytes'.format(bay.p_max, self.dtype.itemsize))
+        grid = self.grid
+        grid.fill(EMPTY)
+        for s in range(bay.n_stacks):
+            grid[s, :bay.h[s]] = bay.pri[s][:bay.h[s]]
+        self.f.write(grid.tobytes())
+        self.n_bays += 1
+
+    def close(self):
+        self.f.seek(0)
+        self.f.write(HEADER.pack(MAGIC, self.n_stacks, self.n_tiers, self.n_bays, self.dtype.itemsize))
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write(path, bays, p_max=None):
+    # writes the bays (of one size, e.g., a generator) to a packed file; returns their number
+    bays = iter(bays)
+    first = next(bays, None)
+    if first is None:
+        raise ValueError('no bays to write')
+    with Writer(path, first.n_stacks, first.n_tiers, p_max) as writer:
+        writer.write(first)
+        for bay in bays:
+            writer.write(bay)
+    return writer.n_bays
+
+
+def header(path):
+    # (n_stacks, n_tiers, n_bays, dtype) of a packed file
+    with open(path, 'rb') as f:
+        data = f.read(HEADER.size)
+    (magic, n_stacks, n_tiers, n_bays, itemsize) = HEADER.unpack(data) if len(data) == HEADER.size else (None,) * 5
+    if magic != MAGIC or itemsize not in DTYPES:
+        raise ValueError('not a packed instance file: {}'.format(path))
+    return n_stacks, n_tiers, n_bays, DTYPES[itemsize]
+
+
+def load_grids(path):
+    # the grids of a packed file as a read-only memory-mapped array of shape (n_bays, n_stacks, n_tiers)
+    (n_stacks, n_tiers, n_bays, dtype) = header(path)
+    if n_bays == 0:
+        return np.zeros((0, n_stacks, n_tiers), dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', offset=HEADER.size, shape=(n_bays, n_stacks, n_tiers))
+
+
+def read(path, start=0, stop=None):
+    # the bays start..stop - 1 of a packed file, built one at a time
+    grids = load_grids(path)
+    (_, n_stacks, n_tiers) = grids.shape
+    for grid in grids[start:stop]:
+        yield Bay(n_stacks, n_tiers, [stack[:n_tiers - stack.count(EMPTY)] for stack in grid.tolist()])
+
+
+def read_arrays(path, start=0, stop=None):
+    # the bays start..stop - 1 of a packed file as ArrayBay objects on views of the mapping
+    for grid in load_grids(path)[start:stop]:
+        yield ArrayBay.from_grid(grid)
+
+
+def compute_lb_kh(grids):
+    # the lower bound of Kim and Hong (the blocks above a block of a smaller priority in their stack) of every bay of an
+    # array of grids (e.g., from load_grids), computed chunk by chunk
+    lb = np.empty(len(grids), dtype=np.int32)
+    for start in range(0, len(grids), CHUNK):
+        chunk = np.asarray(grids[start:start + CHUNK])
+        filled = np.where(chunk == EMPTY, np.iinfo(chunk.dtype).max, chunk)
+        lb[start:start + CHUNK] = np.count_nonzero((chunk != EMPTY) & (filled > np.minimum.accumulate(filled, axis=2)), axis=(1, 2))
+    return lb
+
+
+def convert(paths, out, fmt='caserta', n_tiers=None, p_max=None):
+    # writes the instances of text files (of a format of benchmark/datasets.py, one or more per file; the files of a
+    # directory in name order) to a packed file; returns their number
+    def bays():
+        for path in paths:
+            names = [os.path.join(path, name) for name in sorted(os.listdir(path))] if os.path.isdir(path) else [path]
+            for name in names:
+                if os.path.isfile(name) and not os.path.basename(name).startswith('.'):
+                    with open(name) as f:
+                        yield from parse_all(f.read(), fmt, n_tiers)
+
+    return write(out, bays(), p_max)
+
+
+def test():
+    import tempfile
+    from time import perf_counter
+
+    from benchmark.datasets import dump
+    from benchmark.generator import random_bay
+
+    with tempfile.TemporaryDirectory() as directory:
+        text = os.path.join(directory, 'bays.txt')
+        with open(text, 'w') as f:
+            f.write(''.join(dump(random_bay(4, 5, 12, seed), 'zhu') for seed in range(1000)))
+        path = os.path.join(directory, 'bays.bin')
+        print('{} bays, {} bytes'.format(convert([text], path, 'zhu'), os.path.getsize(path)))
+
+        expected = [random_bay(4, 5, 12, seed) for seed in range(1000)]
+        assert [bay.pri for bay in read(path)] == [bay.pri for bay in expected]
+        assert [bay.compute_lb_kh() for bay in read_arrays(path, 0, 10)] == [bay.compute_lb_kh() for bay in expected[:10]]
+        start = perf_counter()
+        lb = compute_lb_kh(load_grids(path))
+        print('lb_kh of all bays in {:.4f} s, mean {:.3f}'.format(perf_counter() - start, lb.mean()))
+        assert lb.tolist() == [bay.compute_lb_kh() for bay in expected]
+
+
+if __name__ == '__main__':
+    test()
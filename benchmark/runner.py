@@ -0,0 +1,155 @@
+# Copyright (c) 2021 Bo Jin <jinbostar@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import json
+import resource
+from itertools import islice
+from multiprocessing import Pool
+from statistics import mean
+from time import perf_counter
+
+from bay import Bay
+from models import load
+
+COLUMNS = ['n', 'solved', 'build_time', 'n_vars', 'n_constraints', 'nnz', 'peak_rss', 'solve_time', 'gap']
+
+
+def run(instances, formulations, time_limit=None, threads=1, n_workers=1):
+    # One record per (instance, formulation), where instances yields (name, bay) and a formulation is a name from
+    # models.FORMULATIONS or a (name, flags) pair. Every job runs in a fresh process, so that peak_rss (in MB) is the
+    # peak of that job alone.
+    formulations = [(f, {}) if isinstance(f, str) else f for f in formulations]
+    jobs = [(name, bay.n_stacks, bay.n_tiers, [bay.pri[s][:bay.h[s]] for s in range(bay.n_stacks)], model, flags, time_limit, threads) for name, bay in instances for model, flags in formulations]
+    with Pool(n_workers, maxtasksperchild=1) as pool:
+        return pool.map(measure, jobs, chunksize=1)
+
+
+def measure(job):
+    (name, n_stacks, n_tiers, conf, model_name, flags, time_limit, threads) = job
+    record = {'instance': name, 'model': model_name, 'flags': flags}
+    try:
+        cls = load(model_name)
+        bay = Bay(n_stacks, n_tiers, conf)
+        start = perf_counter()
+        instance = cls(bay, **flags)
+        record['build_time'] = perf_counter() - start
+        if hasattr(instance, 'model'):
+            model = instance.model
+            model.parameters.threads = threads
+            if time_limit is not None:
+                model.parameters.timelimit = time_limit
+            if hasattr(model, 'get_cplex'):
+                # the export to CPLEX is part of the build; the counts are taken from CPLEX, which also holds the rows
+                # of the bulk construction
+                start = perf_counter()
+                cpx = model.get_cplex()
+                record['build_time'] += perf_counter() - start
+                record['n_vars'] = cpx.variables.get_num()
+                record['n_constraints'] = cpx.linear_constraints.get_num()
+                record['nnz'] = cpx.linear_constraints.get_num_nonzeros()
+            else:
+                # backend.HighsModel
+                record['n_vars'] = model.number_of_variables
+                record['n_constraints'] = model.number_of_rows
+                record['nnz'] = model.number_of_nonzeros
+            start = perf_counter()
+            solution = model.solve()
+            record['solve_time'] = perf_counter() - start
+            details = model.solve_details
+            record['status'] = details.status
+            record['n_relos'] = instance.get_n_relos() if solution else None
+            record['bound'] = details.best_bound if solution else None
+            record['gap'] = details.mip_relative_gap if solution else None
+        else:
+            # RestrictedSearch
+            instance.time_limit = time_limit
+            start = perf_counter()
+            optimal = instance.solve()
+            record['solve_time'] = perf_counter() - start
+            record['status'] = 'optimal' if optimal else 'feasible'
+            record['n_relos'] = instance.get_n_relos()
+            record['bound'] = instance.lb
+            record['gap'] = (instance.get_n_relos() - instance.lb) / max(1, instance.get_n_relos())
+    except Exception as e:
+        record['error'] = '{}: {}'.format(type(e).__name__, e)
+    record['peak_rss'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return record
+
+
+def summarize(records):
+    # model -> column -> mean over the records of the model (solved counts the records with a gap of zero)
+    summary = {}
+    for model in dict.fromkeys(label(r) for r in records):
+        rs = [r for r in records if label(r) == model]
+        row = {'n': len(rs), 'solved': sum(1 for r in rs if r.get('gap') == 0)}
+        for column in COLUMNS[2:]:
+            values = [r[column] for r in rs if r.get(column) is not None]
+            row[column] = mean(values) if values else None
+        summary[model] = row
+    return summary
+
+
+def label(record):
+    return record['model'] + ''.join('/{}={}'.format(k, v) for k, v in sorted(record['flags'].items()))
+
+
+def table(summary, columns=COLUMNS):
+    rows = [['model'] + columns] + [[model] + [cell(summary[model][c]) for c in columns] for model in summary]
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    return '\n'.join('  '.join(row[i].ljust(widths[i]) if i == 0 else row[i].rjust(widths[i]) for i in range(len(row))) for row in rows)
+
+
+def cell(value):
+    if value is None:
+        return '-'
+    return str(value) if isinstance(value, int) else '{:.3g}'.format(value)
+
+
+def compare(baseline, current, columns=COLUMNS[2:]):
+    # ratios current / baseline of the column means per model; below 1 is an improvement for every column
+    (old, new) = (summarize(baseline), summarize(current))
+    ratios = {}
+    for model in new:
+        if model in old:
+            ratios[model] = {c: new[model][c] / old[model][c] if old[model][c] and new[model][c] is not None else None for c in columns}
+    return table(ratios, list(columns))
+
+
+def save(records, path):
+    with open(path, 'w') as f:
+        json.dump(records, f, indent=1)
+
+
+def load_records(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def test():
+    from benchmark.generator import random_bays
+
+    instances = [('3x3x5-{}'.format(i), bay) for i, bay in enumerate(random_bays(3, 3, 5, 3))]
+    records = run(instances, ['RestrictedSearch', 'BRP_II_A', 'CRP_I'], time_limit=60, n_workers=2)
+    for record in islice(records, 3):
+        print(json.dumps(record))
+    print()
+    print(table(summarize(records)))
+    print()
+    print(compare(records, records))
+
+
+if __name__ == '__main__':
+    test()
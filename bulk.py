@@ -0,0 +1,98 @@
+# Copyright (c) 2021 Bo Jin <jinbostar@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import numpy as np
+
+# Bulk construction of constraint families: the coefficients of a family are assembled as COO index arrays with NumPy
+# and loaded into the CPLEX engine of the docplex model at once. The variables and the objective stay in docplex, so
+# that solution_value and objective_value work as usual, but the rows are only known to CPLEX: they have to be added
+# after all docplex constraints, model.number_of_constraints does not count them, and the model has to be exported
+# with model.get_cplex().write(...) rather than with docplex. The models of stream.py and backend.py take the rows as
+# their own.
+
+
+def var_index(var_dict, shape, base=1):
+    # CPLEX column of every key (1-based indices as in the models, or base per axis) of a variable dictionary, -1 for
+    # absent keys
+    index = np.full(shape, -1, dtype=np.int64)
+    if var_dict:
+        keys = np.array(list(var_dict.keys()), dtype=np.int64) - np.asarray(base, dtype=np.int64)
+        index[tuple(keys.T)] = [var.index for var in var_dict.values()]
+    return index
+
+
+def grid(*sizes):
+    # open 0-based index grids, as np.ogrid
+    return np.ogrid[tuple(slice(0, size) for size in sizes)]
+
+
+def fit(array, shape):
+    # broadcasts an array over shape, dropping trailing unit axes (e.g., of grids with further axes for the terms)
+    while array.ndim > len(shape):
+        array = array[..., 0]
+    return np.broadcast_to(array, shape)
+
+
+class Rows:
+    # a constraint family lhs <sense> rhs with one row per index of shape (or only where where is true); sense is 'L',
+    # 'E' or 'G'
+    def __init__(self, shape, sense, rhs=0, where=True):
+        self.shape = tuple(shape)
+        self.sense = sense
+        self.rhs = fit(np.asarray(rhs, dtype=float), self.shape).ravel()
+        self.where = fit(np.asarray(where), self.shape).ravel()
+        self.rows = []
+        self.cols = []
+        self.vals = []
+
+    def add(self, cols, coef, row, mask=None):
+        # adds coef * var[cols] to the rows row (a tuple of index arrays), all broadcast together; entries outside mask
+        # and absent variables (-1) are skipped
+        arrays = np.broadcast_arrays(cols, np.asarray(coef, dtype=float), *row, *([] if mask is None else [mask]))
+        keep = arrays[0] >= 0
+        if mask is not None:
+            keep &= arrays[-1]
+        self.rows.append(np.ravel_multi_index(tuple(a[keep] for a in arrays[2:2 + len(row)]), self.shape))
+        self.cols.append(arrays[0][keep])
+        self.vals.append(arrays[1][keep])
+
+    def post(self, model, keep_empty=True):
+        # with keep_empty=False, rows without variables are dropped if they hold (as for pruned variables)
+        n_rows = len(self.rhs)
+        rows = np.concatenate(self.rows) if self.rows else np.zeros(0, dtype=np.int64)
+        cols = np.concatenate(self.cols) if self.cols else np.zeros(0, dtype=np.int64)
+        vals = np.concatenate(self.vals) if self.vals else np.zeros(0)
+
+        # merge repeated variables of a row and drop zeros
+        order = np.lexsort((cols, rows))
+        (rows, cols, vals) = (rows[order], cols[order], vals[order])
+        if len(rows) > 0:
+            start = np.flatnonzero(np.concatenate(([True], (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1]))))
+            (rows, cols, vals) = (rows[start], cols[start], np.add.reduceat(vals, start))
+            nonzero = vals != 0
+            (rows, cols, vals) = (rows[nonzero], cols[nonzero], vals[nonzero])
+
+        ptr = np.searchsorted(rows, np.arange(n_rows + 1))
+        where = self.where
+        if not keep_empty:
+            empty = ptr[1:] == ptr[:-1]
+            holds = {'L': self.rhs >= 0, 'E': self.rhs == 0, 'G': self.rhs <= 0}[self.sense]
+            where = where & ~(empty & holds)
+        selected = np.flatnonzero(where).tolist()
+        (ptr, cols, vals) = (ptr.tolist(), cols.tolist(), vals.tolist())
+        # CPLEX, or the models of stream.py and backend.py
+        add = model.get_cplex().linear_constraints.add if hasattr(model, 'get_cplex') else model.add_rows
+        add(lin_expr=[[cols[ptr[r]:ptr[r + 1]], vals[ptr[r]:ptr[r + 1]]] for r in selected], senses=self.sense * len(selected), rhs=self.rhs[selected].tolist())
@@ -0,0 +1,182 @@
+# Copyright (c) 2021 Bo Jin <jinbostar@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import json
+import sqlite3
+from hashlib import sha256
+from inspect import signature
+from itertools import islice
+from time import perf_counter, time
+
+from bay import Bay
+
+
+class SolutionCache:
+    # SQLite store of solved instances. An entry is keyed on the canonical form of the bay (see Bay.canonical), the
+    # formulation and its constructor flags (defaults included), and holds the solution in canonical space, so that
+    # equivalent bays share it. Once the stored solutions exceed max_bytes, the least recently used ones are evicted.
+    def __init__(self, path='crp_cache.sqlite', max_bytes=256 << 20):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.db = db = sqlite3.connect(path)
+        db.execute('CREATE TABLE IF NOT EXISTS solutions (key TEXT PRIMARY KEY, formulation TEXT, n_relos NUMERIC, bound NUMERIC, status TEXT, optimal INTEGER, time REAL, bays TEXT, size INTEGER, last_used REAL)')
+        db.commit()
+
+    def close(self):
+        self.db.close()
+
+    def __len__(self):
+        return self.db.execute('SELECT COUNT(*) FROM solutions').fetchone()[0]
+
+    def size(self):
+        return self.db.execute('SELECT COALESCE(SUM(size), 0) FROM solutions').fetchone()[0]
+
+    def get(self, cls, bay, **kwargs):
+        (key, _, perm, labels) = instance_key(cls, bay, kwargs)
+        row = self.db.execute('SELECT n_relos, bound, status, optimal, time, bays FROM solutions WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        self.db.execute('UPDATE solutions SET last_used = ? WHERE key = ?', (time(), key))
+        self.db.commit()
+        (n_relos, bound, status, optimal, solve_time, bays) = row
+        return CachedSolution(n_relos, bound, status, bool(optimal), solve_time, restore_bays(json.loads(bays), bay, perm, labels), True)
+
+    def put(self, cls, bay, solution, **kwargs):
+        # solution is a CachedSolution of the canonical bay
+        (key, _, _, _) = instance_key(cls, bay, kwargs)
+        bays = json.dumps(solution.bays)
+        self.db.execute('INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', (key, formulation_name(cls), solution.n_relos, solution.bound, solution.status, int(solution.optimal), solution.time, bays, len(bays) + 256, time()))
+        self.evict()
+        self.db.commit()
+
+    def evict(self):
+        total = self.size()
+        for (key, size) in self.db.execute('SELECT key, size FROM solutions ORDER BY last_used').fetchall():
+            if total <= self.max_bytes:
+                break
+            self.db.execute('DELETE FROM solutions WHERE key = ?', (key,))
+            total -= size
+
+
+class CachedSolution:
+    # the solution of a model with the interface of the model classes (get_n_relos, get_bays)
+    def __init__(self, n_relos, bound, status, optimal, time, bays, hit=False):
+        self.n_relos = n_relos
+        self.bound = bound
+        self.status = status
+        self.optimal = optimal
+        self.time = time
+        self.bays = bays
+        self.hit = hit
+
+    def get_n_relos(self):
+        return self.n_relos
+
+    def get_bays(self):
+        return self.bays
+
+
+def formulation_name(cls):
+    # module and class, since tang2015/ILP.py and wan2009/MRIP.py both define MRIP
+    return '{}.{}'.format(cls.__module__.rsplit('.', 1)[-1], cls.__qualname__)
+
+
+def instance_key(cls, bay, kwargs):
+    (canonical, perm, labels) = bay.canonical()
+    arguments = signature(cls).bind(canonical, **kwargs)
+    arguments.apply_defaults()
+    flags = sorted((name, value) for name, value in arguments.arguments.items() if name not in ('bay', 'model'))
+    text = json.dumps([formulation_name(cls), canonical.n_stacks, canonical.n_tiers, conf_of(canonical), flags])
+    return sha256(text.encode()).hexdigest(), canonical, perm, labels
+
+
+def conf_of(bay):
+    return [list(islice(bay.pri[s], bay.h[s])) for s in range(bay.n_stacks)]
+
+
+def restore_bays(bays, bay, perm, labels):
+    # bays holds the configurations of the canonical bay by period, or a list of such dicts (e.g., before and after)
+    if bays is None:
+        return None
+    if isinstance(bays, list):
+        return tuple(restore_bays(b, bay, perm, labels) for b in bays)
+    return {int(t): Bay(bay.n_stacks, bay.n_tiers, conf).restore(perm, labels) for t, conf in bays.items()}
+
+
+def solve(cls, bay, time_limit=None, **kwargs):
+    # builds and solves the model of a bay, returning a CachedSolution with the configurations in the space of the bay
+    start = perf_counter()
+    instance = cls(bay, **kwargs)
+    if hasattr(instance, 'model'):
+        model = instance.model
+        if time_limit is not None:
+            model.parameters.timelimit = time_limit
+        solution = model.solve()
+        details = model.solve_details
+        status = details.status
+        optimal = 'optimal' in status or 'infeasible' in status
+        bound = details.best_bound if solution else None
+    else:
+        # RestrictedSearch and other solvers without a docplex model
+        instance.time_limit = time_limit
+        solution = optimal = instance.solve()
+        status = 'optimal' if optimal else 'feasible'
+        bound = instance.lb
+    bays = None
+    n_relos = None
+    if solution:
+        n_relos = instance.get_n_relos()
+        bays = instance.get_bays()
+        bays = [{t: conf_of(b[t]) for t in b} for b in bays] if isinstance(bays, tuple) else {t: conf_of(bays[t]) for t in bays}
+    return CachedSolution(n_relos, bound, status, optimal, perf_counter() - start, bays)
+
+
+def cached_solve(cache, cls, bay, time_limit=None, **kwargs):
+    # a cached solution skips the model entirely; solutions that are not proven (optimal or infeasible) are solved again
+    hit = cache.get(cls, bay, **kwargs)
+    if hit is not None and hit.optimal:
+        return hit
+    (canonical, perm, labels) = bay.canonical()
+    solution = solve(cls, canonical, time_limit, **kwargs)
+    cache.put(cls, bay, solution, **kwargs)
+    solution.bays = restore_bays(json.loads(json.dumps(solution.bays)), bay, perm, labels)
+    return solution
+
+
+def test():
+    from search import RestrictedSearch
+
+    cache = SolutionCache(':memory:')
+    conf = [[5, 3, 6], [4, 2], [7, 1]]
+    bay = Bay(3, 4, conf)
+    print('bay')
+    print(bay)
+    solution = cached_solve(cache, RestrictedSearch, bay)
+    print('n_relos = {} (hit = {})'.format(solution.get_n_relos(), solution.hit))
+
+    # the same instance with the stacks swapped and the priorities shifted
+    bay = Bay(3, 4, [[17, 11], [15, 13, 16], [14, 12]])
+    print()
+    print('bay')
+    print(bay)
+    solution = cached_solve(cache, RestrictedSearch, bay)
+    print('n_relos = {} (hit = {})'.format(solution.get_n_relos(), solution.hit))
+    print('t = 1')
+    print(solution.get_bays()[1])
+
+
+if __name__ == '__main__':
+    test()
@@ -16,21 +16,22 @@
 
 from itertools import product
 
-from docplex.mp.model import Model
-
+from backend import new_model
 from bay import Bay
 from common import irange
+from heuristics import best_upper_bound
+from size import Size
 
 
 class BRP_I:
-    def __init__(self, bay):
+    def __init__(self, bay, model=None):
         bay.validate_full_distinct()
-        self.model = model = Model()
+        self.model = model = new_model(model)
 
         self.W = W = bay.n_stacks
         self.H = H = bay.n_tiers
         self.N = N = bay.n_blocks
-        self.T = T = N + bay.brp_min_max()
+        self.T = T = N + best_upper_bound(bay)
 
         self.b = b = model.binary_var_dict(product(irange(1, W), irange(1, H), irange(1, N), irange(1, T)), name='b')
         self.v = v = model.binary_var_dict(product(irange(1, N), irange(1, T)), name='v')
@@ -56,6 +57,27 @@ class BRP_I:
         # pre-processing
         model.add_constraints(b[i, j, n, 1] == int(bay.pri[i - 1][j - 1] == n) for i, j, n in product(irange(1, W), irange(1, H), irange(1, N)))
 
+    @staticmethod
+    def estimate_size(bay, model=None):
+        # the size of the model, counted from the index sets (see size.py)
+        (W, H, N) = (bay.n_stacks, bay.n_tiers, bay.n_blocks)
+        T = N + best_upper_bound(bay)
+        size = Size(model)
+        size.add_variables('b', W * H * N * T)
+        size.add_variables('v', N * T)
+        size.add_variables('x', W * H * W * H * N * T)
+        size.add_variables('y', W * H * N * T)
+        size.add_family('(1)', N * T, N * T * (W * H + 1))
+        size.add_family('(2)', W * H * T, W * H * T * N)
+        size.add_family('(3)', W * (H - 1) * T, W * (H - 1) * T * 2 * N)
+        size.add_family('(4)', T, T * (W * H * W * H * N + W * H * N))
+        size.add_family('(5)', N - 1, (N - 1) * 2 * T)
+        # x[i, j, i, j, n, t - 1] cancels out
+        size.add_family('(6)', W * H * N * (T - 1), W * H * N * (T - 1) * (2 * W * H + 1))
+        size.add_family('(7)', N * T, N * T + N * W * H * T * (T - 1) // 2)
+        size.add_family('pre-processing', W * H * N, W * H * N)
+        return size
+
     def get_bays(self):
         bays = {}
         for t in irange(1, self.T):
@@ -16,64 +16,255 @@
 
 from itertools import product
 
-from docplex.mp.model import Model
+import numpy as np
 
+from backend import new_model
 from bay import Bay
+from bulk import Rows, grid, var_index
 from common import irange
+from extract import Bays, block_grids, block_moves, solution_values, var_values
+from lazy import add_lazy, relocation_rows, retrieval_rows
+from prune import Pruned, adder
+from size import Size
+from template import fix
+from warm_start import add_mip_start, stages
 
 
 class BRP_II:
-    def __init__(self, bay, bug1_fixed=True, bug2_fixed=True):
+    def __init__(self, bay, bug1_fixed=True, bug2_fixed=True, bulk=False, prune=False, lazy=False, template=False, model=None):
         bay.validate_full_distinct()
-        self.model = model = Model()
+        self.model = model = new_model(model)
 
         self.W = W = bay.n_stacks
         self.H = H = bay.n_tiers
         self.N = N = bay.n_blocks
 
-        self.b = b = model.binary_var_dict(product(irange(1, W), irange(1, H), irange(1, N), irange(1, N)), name='b')
-        self.x = x = model.binary_var_dict(product(irange(1, W), irange(1, H), irange(1, W), irange(1, H), irange(1, N), irange(1, N)), name='x')
-        self.y = y = model.binary_var_dict(product(irange(1, W), irange(1, H), irange(1, N), irange(1, N)), name='y')
+        if prune:
+            # only the variables that are not fixed to 0: b with n >= t, by (1), and at t = 1, by the pre-processing; y with
+            # n = t < N, by (7) (y with t = N occurs in no constraint); x with i != k, by (10)
+            self.b = b = Pruned(model.binary_var_dict(((i, j, n, t) for i, j, n, t in product(irange(1, W), irange(1, H), irange(1, N), irange(1, N)) if n >= t and (t > 1 or bay.pri[i - 1][j - 1] == n)), name='b'))
+            self.x = x = Pruned(model.binary_var_dict(((i, j, k, l, n, t) for i, j, k, l, n, t in product(irange(1, W), irange(1, H), irange(1, W), irange(1, H), irange(1, N), irange(1, N)) if i != k), name='x'))
+            self.y = y = Pruned(model.binary_var_dict(((i, j, t, t) for i, j, t in product(irange(1, W), irange(1, H), irange(1, N - 1))), name='y'))
+        else:
+            self.b = b = model.binary_var_dict(product(irange(1, W), irange(1, H), irange(1, N), irange(1, N)), name='b')
+            self.x = x = model.binary_var_dict(product(irange(1, W), irange(1, H), irange(1, W), irange(1, H), irange(1, N), irange(1, N)), name='x')
+            self.y = y = model.binary_var_dict(product(irange(1, W), irange(1, H), irange(1, N), irange(1, N)), name='y')
 
         self.v = v = {(n, t): int(n < t) for n, t in product(irange(1, N), irange(1, N))}
 
         # objective
         model.minimize(model.sum(x[i, j, k, l, n, t] for i, j, k, l, n, t in product(irange(1, W), irange(1, H), irange(1, W), irange(1, H), irange(1, N), irange(1, N))))
+        self.template = template
+        if template:
+            # the pre-processing as bounds (see template.py)
+            assert not prune, 'the pruned variables depend on the bay'
+            self.set_bay(bay)
+        if lazy:
+            # (8) and (9) are separated (see lazy.py)
+            self.add_lazy(bug1_fixed, bug2_fixed)
+        if bulk:
+            self.add_constraints_bulk(bay, bug1_fixed, bug2_fixed, prune, lazy, template)
+            return
+        add = adder(model, prune)
         # (1)
-        model.add_constraints(model.sum(b[i, j, n, t] for i, j in product(irange(1, W), irange(1, H))) + v[n, t] == 1 for n, t in product(irange(1, N), irange(1, N)))
+        add(model.sum(b[i, j, n, t] for i, j in product(irange(1, W), irange(1, H))) + v[n, t] == 1 for n, t in product(irange(1, N), irange(1, N)))
         # (2)
-        model.add_constraints(model.sum(b[i, j, n, t] for n in irange(1, N)) <= 1 for i, j, t in product(irange(1, W), irange(1, H), irange(1, N)))
+        add(model.sum(b[i, j, n, t] for n in irange(1, N)) <= 1 for i, j, t in product(irange(1, W), irange(1, H), irange(1, N)))
         # (3)
-        model.add_constraints(model.sum(b[i, j, n, t] for n in irange(1, N)) >= model.sum(b[i, j + 1, n, t] for n in irange(1, N)) for i, j, t in product(irange(1, W), irange(1, H - 1), irange(1, N)))
+        add(model.sum(b[i, j, n, t] for n in irange(1, N)) >= model.sum(b[i, j + 1, n, t] for n in irange(1, N)) for i, j, t in product(irange(1, W), irange(1, H - 1), irange(1, N)))
         # (6)
-        model.add_constraints(b[i, j, n, t] == b[i, j, n, t - 1] + model.sum(x[k, l, i, j, n, t - 1] for k, l in product(irange(1, W), irange(1, H))) - model.sum(x[i, j, k, l, n, t - 1] for k, l in product(irange(1, W), irange(1, H))) - y[i, j, n, t - 1] for i, j, n, t in product(irange(1, W), irange(1, H), irange(1, N), irange(2, N)))
+        add(b[i, j, n, t] == b[i, j, n, t - 1] + model.sum(x[k, l, i, j, n, t - 1] for k, l in product(irange(1, W), irange(1, H))) - model.sum(x[i, j, k, l, n, t - 1] for k, l in product(irange(1, W), irange(1, H))) - y[i, j, n, t - 1] for i, j, n, t in product(irange(1, W), irange(1, H), irange(1, N), irange(2, N)))
         # (7)
-        model.add_constraints(v[n, t] == model.sum(y[i, j, n, tt] for i, j, tt in product(irange(1, W), irange(1, H), irange(1, t - 1))) for n, t in product(irange(1, N), irange(1, N)))
-        # (8)
-        if bug1_fixed:
-            model.add_constraints((H - 1) * (1 - model.sum(x[i, j, k, l, n, t] for n in irange(1, N))) >= model.sum(x[i, jj, k, ll, n, t] for n, jj, ll in product(irange(1, N), irange(j + 1, H), irange(l + 1, H))) for i, j, k, l, t in product(irange(1, W), irange(1, H), irange(1, W), irange(1, H), irange(1, N - 1)))
+        add(v[n, t] == model.sum(y[i, j, n, tt] for i, j, tt in product(irange(1, W), irange(1, H), irange(1, t - 1))) for n, t in product(irange(1, N), irange(1, N)))
+        if not lazy:
+            # (8)
+            if bug1_fixed:
+                add((H - 1) * (1 - model.sum(x[i, j, k, l, n, t] for n in irange(1, N))) >= model.sum(x[i, jj, k, ll, n, t] for n, jj, ll in product(irange(1, N), irange(j + 1, H), irange(l + 1, H))) for i, j, k, l, t in product(irange(1, W), irange(1, H), irange(1, W), irange(1, H), irange(1, N - 1)))
+            else:
+                add(1 - model.sum(x[i, j, k, l, n, t] for n in irange(1, N)) >= model.sum(x[i, jj, k, ll, n, t] for jj, ll, n in product(irange(j + 1, H), irange(l + 1, H), irange(1, N))) for i, j, k, l, t in product(irange(1, W), irange(1, H), irange(1, W), irange(1, H), irange(1, N - 1)))
+            # (9)
+            if bug2_fixed:
+                add((H - 1) * (1 - b[i, j, t, t]) >= model.sum(x[ii, jj, k, l, n, t] for ii in irange(1, W) for jj in irange(1, W if ii != i else j - 1) for k, l, n in product(irange(1, W), irange(1, H), irange(1, N))) for i, j, t in product(irange(1, W), irange(1, H), irange(1, N)))
+            else:
+                add((H - 1) * (1 - model.sum(b[i, j, t, t] for j in irange(1, H))) >= model.sum(x[ii, j, k, l, n, t] for ii in irange(1, W) if ii != i for j, k, l, n in product(irange(1, H), irange(1, W), irange(1, H), irange(1, N))) for i, t in product(irange(1, W), irange(1, N)))
+        # (10)
+        add(x[i, j, i, l, n, t] == 0 for i, j, l, n, t in product(irange(1, W), irange(1, H), irange(1, H), irange(1, N), irange(1, N)))
+
+        # pre-processing
+        if not template:
+            add(b[i, j, n, 1] == int(bay.pri[i - 1][j - 1] == n) for i, j, n in product(irange(1, W), irange(1, H), irange(1, N)))
+
+    @staticmethod
+    def estimate_size(bay, bug1_fixed=True, bug2_fixed=True, bulk=False, prune=False, lazy=False, template=False, model=None):
+        # the size of the model, counted from the index sets (see size.py); with prune, the rows without variables are
+        # dropped, and x[i, j, k, l, n, t] exists for i != k, b[i, j, n, t] for n >= t (at t = 1, at the initial
+        # position of n only) and y[i, j, n, t] for n = t < N
+        (W, H, N) = (bay.n_stacks, bay.n_tiers, bay.n_blocks)
+        pairs = N * (N - 1) // 2
+        # the stacks other than i (with prune, of relocations from stack i)
+        K = W - 1 if prune else W
+        size = Size(model, bulk)
+        if prune:
+            size.add_variables('b', N + W * H * pairs)
+            size.add_variables('x', W * (W - 1) * H * H * N * N)
+            size.add_variables('y', W * H * (N - 1))
         else:
-            model.add_constraints(1 - model.sum(x[i, j, k, l, n, t] for n in irange(1, N)) >= model.sum(x[i, jj, k, ll, n, t] for jj, ll, n in product(irange(j + 1, H), irange(l + 1, H), irange(1, N))) for i, j, k, l, t in product(irange(1, W), irange(1, H), irange(1, W), irange(1, H), irange(1, N - 1)))
-        # (9)
-        if bug2_fixed:
-            model.add_constraints((H - 1) * (1 - b[i, j, t, t]) >= model.sum(x[ii, jj, k, l, n, t] for ii in irange(1, W) for jj in irange(1, W if ii != i else j - 1) for k, l, n in product(irange(1, W), irange(1, H), irange(1, N))) for i, j, t in product(irange(1, W), irange(1, H), irange(1, N)))
+            size.add_variables('b', W * H * N * N)
+            size.add_variables('x', W * H * W * H * N * N)
+            size.add_variables('y', W * H * N * N)
+        occupied = [[int(bay.pri[i][j] is not None) for j in range(H)] + [0] for i in range(W)]
+        if prune:
+            size.add_family('(1)', N + pairs, N + W * H * pairs, W * H * N * N)
+            size.add_family('(2)', N + W * H * (N - 1), N + W * H * pairs, W * H * N * N)
+            size.add_rows('(3)', (occupied[i][j] + occupied[i][j + 1] for i in range(W) for j in range(H - 1) if occupied[i][j] + occupied[i][j + 1] > 0))
+            size.add_family('(3)', W * (H - 1) * (N - 1), W * (H - 1) * 2 * pairs, W * (H - 1) * N * N)
+            # the non-zeros of (6), term by term: b[i, j, n, t] for n >= t; b[i, j, n, t - 1] at the initial position of n
+            # for t = 2 and for n >= t - 1 after; the relocations to and from (i, j), from and to the other stacks; and
+            # y[i, j, t - 1, t - 1]
+            nonzeros = W * H * pairs
+            nonzeros += N + W * H * sum(N - t + 2 for t in irange(3, N))
+            nonzeros += W * H * N * (N - 1) * 2 * (W - 1) * H
+            nonzeros += W * H * (N - 1)
+            size.add_family('(6)', W * H * N * (N - 1), nonzeros, W * H * N * (N - 1) * W * H)
+            size.add_family('(7)', pairs, pairs * W * H, W * H * N ** 3)
         else:
-            model.add_constraints((H - 1) * (1 - model.sum(b[i, j, t, t] for j in irange(1, H))) >= model.sum(x[ii, j, k, l, n, t] for ii in irange(1, W) if ii != i for j, k, l, n in product(irange(1, H), irange(1, W), irange(1, H), irange(1, N))) for i, t in product(irange(1, W), irange(1, N)))
+            size.add_family('(1)', N * N, N * N * W * H, W * H * N * N)
+            size.add_family('(2)', W * H * N, W * H * N * N, W * H * N * N)
+            size.add_family('(3)', W * (H - 1) * N, W * (H - 1) * N * 2 * N, W * (H - 1) * N * N)
+            # x[i, j, i, j, n, t - 1] cancels out
+            size.add_family('(6)', W * H * N * (N - 1), W * H * N * (N - 1) * (2 * W * H + 1), W * H * N * (N - 1) * W * H)
+            # at t = 1, the rows of (7) hold no variables (v[n, 1] = 0) and are not built
+            size.add_family('(7)', N * (N - 1), N * W * H * pairs, W * H * N ** 3)
+        if not lazy:
+            size.add_family('(8)', K * W * H * H * (N - 1), K * W * (N - 1) * N * (H * H + (H * (H - 1) // 2) ** 2), W * H * W * H * (N - 1) * N * H * H)
+            # the rows of (9) have b[i, j, t, t] (with prune, for t > 1 or at the position of block 1) and the relocations
+            # from the stacks ii != i (tiers up to W) and below (i, j)
+            b = [[[1 if not prune or t > 1 else int(bay.pri[i][j] == 1) for t in irange(1, N)] for j in range(H)] for i in range(W)]
+            if bug2_fixed:
+                size.add_rows('(9)', (b[i][j][t] + ((W - 1) * min(W, H) + j) * K * H * N for i, j, t in product(range(W), range(H), range(N)) if b[i][j][t] + ((W - 1) * min(W, H) + j) * K * H * N > 0 or not prune), W * H * N * W * H * W * H * N)
+            else:
+                size.add_rows('(9)', (sum(b[i][j][t] for j in range(H)) + (W - 1) * H * K * H * N for i, t in product(range(W), range(N)) if sum(b[i][j][t] for j in range(H)) + (W - 1) * H * K * H * N > 0 or not prune), W * N * W * H * W * H * N)
+        if not prune:
+            size.add_family('(10)', W * H * H * N * N, W * H * H * N * N, W * H * H * N * N)
+        if not template:
+            size.add_family('pre-processing', N if prune else W * H * N, N if prune else W * H * N, W * H * N)
+        return size
+
+    def add_constraints_bulk(self, bay, bug1_fixed, bug2_fixed, prune, lazy, template):
+        # the constraints above, assembled with NumPy (0-based indices) and loaded into CPLEX at once (see bulk.py)
+        model = self.model
+        (W, H, N) = (self.W, self.H, self.N)
+        b = var_index(self.b, (W, H, N, N))
+        x = var_index(self.x, (W, H, W, H, N, N))
+        y = var_index(self.y, (W, H, N, N))
+        (n, t) = grid(N, N)
+        v = (n < t).astype(int)
+        pri = np.array([[p or 0 for p in bay.pri[s]] for s in range(W)])
+
+        # (1)
+        rows = Rows((N, N), 'E', 1 - v)
+        (i, j, n, t) = grid(W, H, N, N)
+        rows.add(b[i, j, n, t], 1, (n, t))
+        rows.post(model, not prune)
+        # (2)
+        rows = Rows((W, H, N), 'L', 1)
+        (i, j, t, n) = grid(W, H, N, N)
+        rows.add(b[i, j, n, t], 1, (i, j, t))
+        rows.post(model, not prune)
+        # (3)
+        rows = Rows((W, H - 1, N), 'G')
+        (i, j, t, n) = grid(W, H - 1, N, N)
+        rows.add(b[i, j, n, t], 1, (i, j, t))
+        rows.add(b[i, j + 1, n, t], -1, (i, j, t))
+        rows.post(model, not prune)
+        # (6)
+        rows = Rows((W, H, N, N - 1), 'E')
+        (i, j, n, t, k, l) = grid(W, H, N, N - 1, W, H)
+        rows.add(b[i, j, n, t + 1], 1, (i, j, n, t))
+        rows.add(b[i, j, n, t], -1, (i, j, n, t))
+        rows.add(x[k, l, i, j, n, t], -1, (i, j, n, t))
+        rows.add(x[i, j, k, l, n, t], 1, (i, j, n, t))
+        rows.add(y[i, j, n, t], 1, (i, j, n, t))
+        rows.post(model, not prune)
+        # (7)
+        rows = Rows((N, N), 'E', v)
+        (i, j, n, t, tt) = grid(W, H, N, N, N)
+        rows.add(y[i, j, n, tt], 1, (n, t), tt < t)
+        rows.post(model, not prune)
+        if not lazy:
+            # (8)
+            rows = Rows((W, H, W, H, N - 1), 'L', H - 1 if bug1_fixed else 1)
+            (i, j, k, l, t, n, jj, ll) = grid(W, H, W, H, N - 1, N, H, H)
+            rows.add(x[i, j, k, l, n, t], H - 1 if bug1_fixed else 1, (i, j, k, l, t))
+            rows.add(x[i, jj, k, ll, n, t], 1, (i, j, k, l, t), (jj > j) & (ll > l))
+            rows.post(model, not prune)
+            # (9)
+            if bug2_fixed:
+                rows = Rows((W, H, N), 'L', H - 1)
+                (i, j, t, ii, jj, k, l, n) = grid(W, H, N, W, H, W, H, N)
+                rows.add(b[i, j, t, t], H - 1, (i, j, t))
+                rows.add(x[ii, jj, k, l, n, t], 1, (i, j, t), np.where(ii != i, jj < W, jj < j))
+            else:
+                rows = Rows((W, N), 'L', H - 1)
+                (i, t, ii, j, k, l, n) = grid(W, N, W, H, W, H, N)
+                rows.add(b[i, j, t, t], H - 1, (i, t))
+                rows.add(x[ii, j, k, l, n, t], 1, (i, t), ii != i)
+            rows.post(model, not prune)
         # (10)
-        model.add_constraints(x[i, j, i, l, n, t] == 0 for i, j, l, n, t in product(irange(1, W), irange(1, H), irange(1, H), irange(1, N), irange(1, N)))
+        rows = Rows((W, H, H, N, N), 'E')
+        (i, j, l, n, t) = grid(W, H, H, N, N)
+        rows.add(x[i, j, i, l, n, t], 1, (i, j, l, n, t))
+        rows.post(model, not prune)
 
         # pre-processing
-        model.add_constraints(b[i, j, n, 1] == int(bay.pri[i - 1][j - 1] == n) for i, j, n in product(irange(1, W), irange(1, H), irange(1, N)))
-
-    def get_bays(self):
-        bays = {}
-        for t in irange(1, self.N):
-            conf = [[None] * self.H for _ in range(self.W)]
-            for i, j, n in product(irange(1, self.W), irange(1, self.H), irange(1, self.N)):
-                if round(self.b[i, j, n, t].solution_value) == 1:
-                    conf[i - 1][j - 1] = n
-            bays[t] = Bay(self.W, self.H, conf)
-        return bays
+        if not template:
+            (i, j, n) = grid(W, H, N)
+            rows = Rows((W, H, N), 'E', pri[i, j] == n + 1)
+            rows.add(b[i, j, n, 0], 1, (i, j, n))
+            rows.post(model, not prune)
+
+    @staticmethod
+    def supports_template(flags):
+        # whether a model built with the flags (and template=True) can be moved to another bay by set_bay
+        return not flags.get('prune')
+
+    def set_bay(self, bay):
+        # moves a model built with template=True to another bay of the same size
+        assert self.template
+        bay.validate_full_distinct()
+        assert (bay.n_stacks, bay.n_tiers, bay.n_blocks) == (self.W, self.H, self.N)
+        keys = list(product(irange(1, self.W), irange(1, self.H), irange(1, self.N)))
+        fix(self.model, [self.b[i, j, n, 1] for i, j, n in keys], [int(bay.pri[i - 1][j - 1] == n) for i, j, n in keys])
+
+    def add_lazy(self, bug1_fixed, bug2_fixed):
+        (W, H, N) = (self.W, self.H, self.N)
+        b = var_index(self.b, (W, H, N, N))
+        x = var_index(self.x, (W, H, W, H, N, N))
+        add_lazy(self.model, relocation_rows(x, H - 1 if bug1_fixed else 1, H - 1 if bug1_fixed else 1))
+        add_lazy(self.model, retrieval_rows(b, x, bug2_fixed))
+
+    def add_mip_start(self, bay, moves):
+        # period t begins with the configuration before block t is dug out (see warm_start.py)
+        (b, x, y) = ({}, {}, {})
+        for t, (conf, relocations, (n, (i, j))) in enumerate(stages(bay, moves), 1):
+            assert n == t
+            b.update(((k, l, nn, t), 1) for k, stack in enumerate(conf, 1) for l, nn in enumerate(stack, 1))
+            x.update(((ii, jj, k, l, nn, t), 1) for nn, (ii, jj), (k, l) in relocations)
+            if t < self.N:
+                y[i, j, t, t] = 1
+        return add_mip_start(self.model, (self.b, b), (self.x, x), (self.y, y))
+
+    def get_moves(self, values=None):
+        # the plan as (src, dst, block, period), decoded from all values at once (by default, of the solution; see
+        # extract.py)
+        values = solution_values(self.model) if values is None else values
+        (W, H, N) = (self.W, self.H, self.N)
+        return block_moves(var_values(self.b, (W, H, N, N), values), var_values(self.x, (W, H, W, H, N, N), values))
+
+    def get_bays(self, values=None):
+        # period -> Bay, built on access
+        values = solution_values(self.model) if values is None else values
+        return Bays(block_grids(var_values(self.b, (self.W, self.H, self.N, self.N), values)))
 
     def get_n_relos(self):
         return self.model.objective_value
@@ -0,0 +1,125 @@
+# Copyright (c) 2021 Bo Jin <jinbostar@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+from math import ceil
+from time import perf_counter
+
+from bay_state import BayState
+from common import irange
+from heuristics import best_plan, restricted_lower_bound
+from models import PROBLEMS
+from rolling import plan_bays
+
+# Horizon deepening for the time-indexed models (BRP_m1, BRP_m2, BRP_m3, BRP_III), whose size grows with the horizon.
+# Built with horizon=h, a model admits the plans with at most h relocations, so that its optimum is optimal for the bay
+# whenever it has a solution, and its infeasibility proves a lower bound of h + 1. The first horizon is the lower bound
+# of the bay; the horizon grows by step (at most to one less than the best heuristic plan, whose optimality follows from
+# the infeasibility of that model) until a model is solved to optimality. BRP_m2 grows its model in place with extend;
+# the other models are rebuilt. If the time runs out, the best plan and the best bound found so far are kept.
+
+
+class HorizonDeepening:
+    # solves a bay with a time-indexed model cls (and its flags) over horizons from the lower bound upwards
+    def __init__(self, cls, bay, step=1, time_limit=None, **flags):
+        assert step >= 1
+        self.cls = cls
+        self.bay = bay
+        self.step = step
+        self.time_limit = time_limit
+        self.flags = flags
+        # whether the objective value is the number of relocations, so that the bound of an unfinished solve counts
+        self.counts = PROBLEMS[cls.__name__][2]
+        self.best = best_plan(bay)
+        restricted = any(flags.get(flag) for flag in ['restricted', 'restricted_distinct'])
+        self.lb = restricted_lower_bound(bay) if restricted else bay.compute_lb_kh()
+        self.instance = None
+        self.horizons = []
+        self.optimal = False
+
+    def build(self, horizon):
+        # the model of the horizon, grown from the previous one where the model class supports it
+        if self.instance is not None and hasattr(self.instance, 'extend'):
+            self.instance.extend(horizon)
+        else:
+            self.instance = self.cls(self.bay, horizon=horizon, **self.flags)
+        self.horizons.append(horizon)
+        return self.instance
+
+    def solve(self):
+        start = perf_counter()
+        horizon = None
+        while self.lb < self.best.n_relos:
+            horizon = self.lb if horizon is None else max(self.lb, min(horizon + self.step, self.best.n_relos - 1))
+            instance = self.build(horizon)
+            if self.time_limit is not None:
+                remaining = self.time_limit - (perf_counter() - start)
+                if remaining <= 0:
+                    break
+                instance.model.parameters.timelimit = remaining
+            solved = instance.model.solve()
+            status = instance.model.solve_details.status
+            if solved:
+                n_relos = round(instance.get_n_relos())
+                if n_relos < self.best.n_relos:
+                    self.best = BayState.from_bay(self.bay)
+                    for (src, dst, _, _) in instance.get_moves():
+                        self.best.retrieve(src) if dst is None else self.best.relocate(src, dst)
+                if 'optimal' in status:
+                    self.lb = self.best.n_relos
+                elif self.counts:
+                    # out of time: the plans beyond the horizon have at least horizon + 1 relocations
+                    self.lb = max(self.lb, min(ceil(instance.model.solve_details.best_bound - 1e-6), horizon + 1))
+                    break
+                else:
+                    break
+            elif 'infeasible' in status:
+                self.lb = max(self.lb, horizon + 1)
+            else:
+                break
+        self.optimal = self.lb == self.best.n_relos
+        return self.optimal
+
+    def get_moves(self):
+        # (src, dst, p) for a relocation and (src, None, p) for a retrieval, with 0-based stacks as in BayState
+        return self.best.moves
+
+    def get_bays(self):
+        return plan_bays(self.bay, self.best.moves)
+
+    def get_n_relos(self):
+        return self.best.n_relos
+
+
+def test():
+    from benchmark.generator import random_bay
+    from demelodasilva2018.BRP_m2 import BRP_m2
+
+    bay = random_bay(3, 4, 8, 0)
+    print('bay')
+    print(bay)
+
+    deepening = HorizonDeepening(BRP_m2, bay, time_limit=60)
+    deepening.solve()
+    print()
+    print('n_relos = {} (horizons {}), lb = {}'.format(deepening.get_n_relos(), deepening.horizons, deepening.lb))
+    bays = deepening.get_bays()
+    for t in irange(1, bay.n_blocks):
+        print('t = {}'.format(t))
+        print(bays[t])
+
+
+if __name__ == '__main__':
+    test()
@@ -16,23 +16,28 @@
 
 from itertools import product
 
-from docplex.mp.model import Model
-
+from backend import new_model
 from bay import Bay
 from common import irange
+from extract import conf_moves
+from heuristics import best_plan
+from size import Size
+from warm_start import add_mip_start, replay
 
 
 class BRP_m1:
-    def __init__(self, bay, restricted_distinct=False):
+    def __init__(self, bay, restricted_distinct=False, horizon=None, model=None):
         if restricted_distinct:
             bay.validate_distinct()
-        self.model = model = Model()
+        self.model = model = new_model(model)
 
         self.S = S = bay.n_stacks
         self.H = H = bay.n_tiers
         self.G = G = bay.p_max
         self.N = N = bay.n_blocks
-        self.T = T = N + bay.brp_min_max()
+        # the horizon fits the best heuristic plan, which add_mip_start takes as a start, or horizon relocations
+        self.plan = plan = best_plan(bay)
+        self.T = T = N + (plan.n_relos if horizon is None else horizon)
 
         self.x = x = model.binary_var_dict(product(irange(0, T), irange(1, G), irange(1, S), irange(1, H)), name='x')
         self.y = y = model.binary_var_dict(product(irange(1, T), irange(1, G), irange(1, S), irange(1, H)), name='y')
@@ -92,6 +97,65 @@ class BRP_m1:
             # (51)
             model.add_constraints(model.sum(z[t, j, s, h] for j, h in product(irange(g + 1, G), irange(1, H))) <= w[t - 1, g, g] + model.sum(x[t, i, s, h] for i, h in product(irange(1, g), irange(1, H))) for t, g, s in product(irange(1, T), irange(1, G - 1), irange(1, S)))
 
+    @staticmethod
+    def estimate_size(bay, restricted_distinct=False, horizon=None, model=None):
+        # the size of the model, counted from the index sets (see size.py)
+        (S, H, G, N) = (bay.n_stacks, bay.n_tiers, bay.p_max, bay.n_blocks)
+        T = N + (best_plan(bay).n_relos if horizon is None else horizon)
+        size = Size(model)
+        size.add_variables('x', (T + 1) * G * S * H)
+        size.add_variables('y', T * G * S * H)
+        size.add_variables('z', T * G * S * H)
+        size.add_variables('k', T * G * N)
+        size.add_variables('w', (T + 1) * G * N)
+        size.add_family('(2)', G * S * H, G * S * H)
+        size.add_family('(4)', T * S * (H - 1), T * S * (H - 1) * 2 * G)
+        size.add_family('(8)', T, T * G * S * H)
+        size.add_family('(9)', T, T * G * S * H)
+        size.add_family('(11)', T - 1, (T - 1) * 2 * G * S * H)
+        size.add_family('(15)', T * S, T * S * 2 * G)
+        size.add_family('(16)', T * S * (H - 1), T * S * (H - 1) * 3 * G)
+        size.add_family('(17)', T * S * (H - 1), T * S * (H - 1) * 3 * G)
+        size.add_family('(19)', T * S * H, T * S * H * 2 * G)
+        size.add_family('(25)', 1, G * S * H)
+        size.add_family('(26)', G * N, G * N)
+        size.add_family('(27)', G * N, G * N)
+        size.add_family('(28)', T * N, T * N * G)
+        size.add_family('(29)', T, T * G * N)
+        size.add_family('(30)', T * (N - 1), T * (N - 1) * 2 * G)
+        size.add_family('(31)', T * G, T * G * 3 * N)
+        size.add_family('(32)', T * G * N, T * G * N * 3)
+        size.add_family('(33)', T * G, T * G * (2 * S * H + N))
+        size.add_family('(34)', T * G * S * H, T * G * S * H * 4)
+        size.add_family('(35)', T * G, T * G * (2 * S * H + N))
+        size.add_family('(36)', N, N * G * S * H)
+        if restricted_distinct:
+            size.add_family('(51)', T * (G - 1) * S, T * (G - 1) * S * (G * H + 1))
+        return size
+
+    def add_mip_start(self, bay, moves):
+        # one move per time step, the relocations (y) and retrievals (k) of the block lifted from (s, h) (z); x[t] is the
+        # configuration after step t (see warm_start.py)
+        x = {(0, bay.pri[s][h], s + 1, h + 1): 1 for s in range(self.S) for h in range(bay.h[s])}
+        (y, z, k, w) = ({}, {}, {}, {})
+        n = 0
+        for t, (g, (s, h), after, state) in enumerate(replay(bay, moves), 1):
+            assert t <= self.T, 'the plan does not fit into the horizon'
+            z[t, g, s, h] = 1
+            if after is None:
+                n += 1
+                k[t, g, n] = 1
+                w.update(((u, g, n), 1) for u in irange(t, self.T))
+            else:
+                y[(t, g) + after] = 1
+            x.update(((t, d, r, l), 1) for r, stack in enumerate(state.stacks, 1) for l, d in enumerate(stack, 1))
+        return add_mip_start(self.model, (self.x, x), (self.y, y), (self.z, z), (self.k, k), (self.w, w))
+
+    def get_moves(self):
+        # the plan as (src, dst, block, period), decoded from the configurations (see extract.conf_moves)
+        bays = self.get_bays()
+        return conf_moves((t, bays[t]) for t in irange(0, self.T))
+
     def get_bays(self):
         bays = {}
         for t in irange(0, self.T):
@@ -16,118 +16,222 @@
 
 from itertools import product
 
-from docplex.mp.model import Model
+import numpy as np
 
+from backend import new_model
 from bay import Bay
 from common import irange
+from extract import Bays, solution_values, var_values
+from heuristics import best_plan
+from size import Size
+from template import fix, free
+from warm_start import add_mip_start, replay
 
 
 class BRP_m2:
-    def __init__(self, bay, bugs_fixed=True, restricted=False, distinct=False):
+    def __init__(self, bay, bugs_fixed=True, restricted=False, distinct=False, horizon=None, model=None):
         if restricted or distinct:
             assert not restricted or distinct
             bay.validate_distinct()
 
-        self.model = model = Model()
+        self.model = model = new_model(model)
+        self.bugs_fixed = bugs_fixed
+        self.restricted = restricted
+        self.distinct = distinct
 
         self.S = S = bay.n_stacks
         self.H = H = bay.n_tiers
         self.N = N = bay.n_blocks
         self.G = G = bay.p_max
-        self.T = T = bay.brp_min_max()
+        # the horizon fits the best heuristic plan, which add_mip_start takes as a start, or horizon relocations
+        self.plan = plan = best_plan(bay)
+        T = plan.n_relos if horizon is None else horizon
 
-        self.x = x = model.binary_var_dict(product(irange(0, T), irange(1, G), irange(1, S), irange(1, H)), name='x')
-        self.y = y = model.binary_var_dict(product(irange(1, T), irange(1, G), irange(1, S), irange(1, H)), name='y')
-        self.z = z = model.binary_var_dict(product(irange(1, T), irange(1, G), irange(1, S), irange(1, H)), name='z')
-        self.k = k = model.binary_var_dict(product(irange(0, T), irange(1, G), irange(1, S), irange(1, H)), name='k')
+        (self.x, self.y, self.z, self.k) = ({}, {}, {}, {})
+        self.add_periods(0, T)
+        (x, k) = (self.x, self.k)
 
         C = {(g, s, h): int(g == bay.pri[s - 1][h - 1]) for g, s, h in product(irange(1, G), irange(1, S), irange(1, H))}
 
-        # objective
-        model.minimize(model.sum(y[t, g, s, h] for t, g, s, h in product(irange(1, T), irange(1, G), irange(1, S), irange(1, H))))
         # (2)
         if bugs_fixed:
             model.add_constraints(x[0, g, s, h] + k[0, g, s, h] == C[g, s, h] for g, s, h in product(irange(1, G), irange(1, S), irange(1, H)))
         else:
             model.add_constraints(x[0, g, s, h] == C[g, s, h] for g, s, h in product(irange(1, G), irange(1, S), irange(1, H)))
             model.add_constraints(k[0, g, s, h] == 0 for g, s, h in product(irange(1, G), irange(1, S), irange(1, H)))
+        # (41), by bounds, so that extend can move it to a later period
+        fix(model, [x[T, g, s, h] for g, s, h in product(irange(1, G), irange(1, S), irange(1, H))], [0] * (G * S * H))
+
+    def add_periods(self, first, last):
+        # the variables and constraints of periods first..last, which only refer to the periods up to last, and the
+        # objective over all periods
+        (model, S, H, N, G) = (self.model, self.S, self.H, self.N, self.G)
+        (bugs_fixed, restricted, distinct) = (self.bugs_fixed, self.restricted, self.distinct)
+        self.x.update(model.binary_var_dict(product(irange(first, last), irange(1, G), irange(1, S), irange(1, H)), name='x'))
+        self.y.update(model.binary_var_dict(product(irange(max(1, first), last), irange(1, G), irange(1, S), irange(1, H)), name='y'))
+        self.z.update(model.binary_var_dict(product(irange(max(1, first), last), irange(1, G), irange(1, S), irange(1, H)), name='z'))
+        self.k.update(model.binary_var_dict(product(irange(first, last), irange(1, G), irange(1, S), irange(1, H)), name='k'))
+        (x, y, z, k) = (self.x, self.y, self.z, self.k)
+        (periods, periods1, periods2) = (irange(first, last), irange(max(1, first), last), irange(max(2, first), last))
+        self.T = T = last
+
+        # objective
+        model.minimize(model.sum(y[t, g, s, h] for t, g, s, h in product(irange(1, T), irange(1, G), irange(1, S), irange(1, H))))
+
         # (4)
-        model.add_constraints(model.sum(x[t, g, s, h] for g in irange(1, G)) >= model.sum(x[t, g, s, h + 1] for g in irange(1, G)) for t, s, h in product(irange(1, T), irange(1, S), irange(1, H - 1)))
+        model.add_constraints(model.sum(x[t, g, s, h] for g in irange(1, G)) >= model.sum(x[t, g, s, h + 1] for g in irange(1, G)) for t, s, h in product(periods1, irange(1, S), irange(1, H - 1)))
         # (8)
-        model.add_constraints(model.sum(y[t, g, s, h] for g, s, h in product(irange(1, G), irange(1, S), irange(1, H))) <= 1 for t in irange(1, T))
+        model.add_constraints(model.sum(y[t, g, s, h] for g, s, h in product(irange(1, G), irange(1, S), irange(1, H))) <= 1 for t in periods1)
         # (9)
-        model.add_constraints(model.sum(z[t, g, s, h] for g, s, h in product(irange(1, G), irange(1, S), irange(1, H))) <= 1 for t in irange(1, T))
+        model.add_constraints(model.sum(z[t, g, s, h] for g, s, h in product(irange(1, G), irange(1, S), irange(1, H))) <= 1 for t in periods1)
         if bugs_fixed:
             # relocations are forced to be carried out as early as possible
-            model.add_constraints(model.sum(z[t - 1, g, s, h] for g, s, h in product(irange(1, G), irange(1, S), irange(1, H))) >= model.sum(z[t, g, s, h] for g, s, h in product(irange(1, G), irange(1, S), irange(1, H))) for t in irange(2, T))
+            model.add_constraints(model.sum(z[t - 1, g, s, h] for g, s, h in product(irange(1, G), irange(1, S), irange(1, H))) >= model.sum(z[t, g, s, h] for g, s, h in product(irange(1, G), irange(1, S), irange(1, H))) for t in periods2)
             # retrievals only occur after a relocation (except for time 0)
-            model.add_constraints(model.sum(k[t, g, s, h] for g, s, h in product(irange(1, G), irange(1, S), irange(1, H))) <= N * model.sum(z[t, g, s, h] for g, s, h in product(irange(1, G), irange(1, S), irange(1, H))) for t in irange(1, T))
+            model.add_constraints(model.sum(k[t, g, s, h] for g, s, h in product(irange(1, G), irange(1, S), irange(1, H))) <= N * model.sum(z[t, g, s, h] for g, s, h in product(irange(1, G), irange(1, S), irange(1, H))) for t in periods1)
         # (15)
-        model.add_constraints(model.sum(y[t, g, s, 1] for g in irange(1, G)) <= 1 - model.sum(x[t - 1, g, s, 1] for g in irange(1, G)) for t, s in product(irange(1, T), irange(1, S)))
+        model.add_constraints(model.sum(y[t, g, s, 1] for g in irange(1, G)) <= 1 - model.sum(x[t - 1, g, s, 1] for g in irange(1, G)) for t, s in product(periods1, irange(1, S)))
         # (16)
-        model.add_constraints(model.sum(y[t, g, s, h + 1] for g in irange(1, G)) <= model.sum(x[t - 1, g, s, h] - x[t - 1, g, s, h + 1] for g in irange(1, G)) for t, s, h in product(irange(1, T), irange(1, S), irange(1, H - 1)))
+        model.add_constraints(model.sum(y[t, g, s, h + 1] for g in irange(1, G)) <= model.sum(x[t - 1, g, s, h] - x[t - 1, g, s, h + 1] for g in irange(1, G)) for t, s, h in product(periods1, irange(1, S), irange(1, H - 1)))
         # (17)
-        model.add_constraints(model.sum(z[t, g, s, h] for g in irange(1, G)) <= model.sum(x[t - 1, g, s, h] - x[t - 1, g, s, h + 1] for g in irange(1, G)) for t, s, h in product(irange(1, T), irange(1, S), irange(1, H - 1)))
+        model.add_constraints(model.sum(z[t, g, s, h] for g in irange(1, G)) <= model.sum(x[t - 1, g, s, h] - x[t - 1, g, s, h + 1] for g in irange(1, G)) for t, s, h in product(periods1, irange(1, S), irange(1, H - 1)))
         # (20)
-        model.add_constraints(model.sum(z[t, g, s, h] + y[t, g, s, h] for g, h in product(irange(1, G), irange(1, H))) <= 1 for t, s in product(irange(1, T), irange(1, S)))
-        # (41)
-        model.add_constraint(model.sum(x[T, g, s, h] for g, s, h in product(irange(1, G), irange(1, S), irange(1, H))) == 0)
+        model.add_constraints(model.sum(z[t, g, s, h] + y[t, g, s, h] for g, h in product(irange(1, G), irange(1, H))) <= 1 for t, s in product(periods1, irange(1, S)))
         # (42)
-        model.add_constraints(model.sum(x[t, g, s, h] + k[t, g, s, h] for g in irange(1, G)) <= 1 for t, s, h in product(irange(1, T), irange(1, S), irange(1, H)))
+        model.add_constraints(model.sum(x[t, g, s, h] + k[t, g, s, h] for g in irange(1, G)) <= 1 for t, s, h in product(periods1, irange(1, S), irange(1, H)))
         # (43)
-        model.add_constraints(model.sum(x[t - 1, g, s, h] for s, h in product(irange(1, S), irange(1, H))) == model.sum(x[t, g, s, h] + k[t, g, s, h] for s, h in product(irange(1, S), irange(1, H))) for t, g in product(irange(1, T), irange(1, G)))
+        model.add_constraints(model.sum(x[t - 1, g, s, h] for s, h in product(irange(1, S), irange(1, H))) == model.sum(x[t, g, s, h] + k[t, g, s, h] for s, h in product(irange(1, S), irange(1, H))) for t, g in product(periods1, irange(1, G)))
         # (44)
-        model.add_constraints(z[t, g, s, h] + k[t, g, s, h] == y[t, g, s, h] + x[t - 1, g, s, h] - x[t, g, s, h] for t, g, s, h in product(irange(1, T), irange(1, G), irange(1, S), irange(1, H)))
+        model.add_constraints(z[t, g, s, h] + k[t, g, s, h] == y[t, g, s, h] + x[t - 1, g, s, h] - x[t, g, s, h] for t, g, s, h in product(periods1, irange(1, G), irange(1, S), irange(1, H)))
 
         if distinct:
             # (46)
             if bugs_fixed:
-                model.add_constraints(model.sum(k[t, g, s, h] for s, h in product(irange(1, S), irange(1, H))) <= model.sum(k[u, g - 1, s, h] for u, s, h in product(irange(0, t), irange(1, S), irange(1, H))) for t, g in product(irange(0, T), irange(2, G)))
+                model.add_constraints(model.sum(k[t, g, s, h] for s, h in product(irange(1, S), irange(1, H))) <= model.sum(k[u, g - 1, s, h] for u, s, h in product(irange(0, t), irange(1, S), irange(1, H))) for t, g in product(periods, irange(2, G)))
             else:
-                model.add_constraints(model.sum(k[t, g, s, h] for s, h in product(irange(1, S), irange(1, H))) <= model.sum(k[u, g - 1, s, h] for u, s, h in product(irange(1, t), irange(1, S), irange(1, H))) for t, g in product(irange(1, T), irange(2, G)))
+                model.add_constraints(model.sum(k[t, g, s, h] for s, h in product(irange(1, S), irange(1, H))) <= model.sum(k[u, g - 1, s, h] for u, s, h in product(irange(1, t), irange(1, S), irange(1, H))) for t, g in product(periods1, irange(2, G)))
             # (47)
             if bugs_fixed:
-                model.add_constraints(k[t, g, s, h] + model.sum(k[t, l, s, h + 1] for l in irange(g + 1, G)) <= 1 for t, g, s, h in product(irange(0, T), irange(1, G - 1), irange(1, S), irange(1, H - 1)))
+                model.add_constraints(k[t, g, s, h] + model.sum(k[t, l, s, h + 1] for l in irange(g + 1, G)) <= 1 for t, g, s, h in product(periods, irange(1, G - 1), irange(1, S), irange(1, H - 1)))
             else:
-                model.add_constraints(k[t, g, s, h] + model.sum(k[t, l, s, h + 1] for l in irange(g + 1, G)) <= 1 for t, g, s, h in product(irange(1, T), irange(1, G - 1), irange(1, S), irange(1, H - 1)))
+                model.add_constraints(k[t, g, s, h] + model.sum(k[t, l, s, h + 1] for l in irange(g + 1, G)) <= 1 for t, g, s, h in product(periods1, irange(1, G - 1), irange(1, S), irange(1, H - 1)))
             # (48)
             if bugs_fixed:
-                model.add_constraints(k[t, g, s, h] <= 1 - model.sum(x[t, l, s, h - 1] for l in irange(1, g - 1)) for t, g, s, h in product(irange(0, T), irange(2, G), irange(1, S), irange(2, H)))
+                model.add_constraints(k[t, g, s, h] <= 1 - model.sum(x[t, l, s, h - 1] for l in irange(1, g - 1)) for t, g, s, h in product(periods, irange(2, G), irange(1, S), irange(2, H)))
             else:
-                model.add_constraints(k[t, g, s, h] <= 1 - model.sum(x[t, l, s, h - 1] for l in irange(1, g - 1)) for t, g, s, h in product(irange(1, T), irange(2, G), irange(1, S), irange(2, H)))
+                model.add_constraints(k[t, g, s, h] <= 1 - model.sum(x[t, l, s, h - 1] for l in irange(1, g - 1)) for t, g, s, h in product(periods1, irange(2, G), irange(1, S), irange(2, H)))
         else:
             # (49)
             if bugs_fixed:
-                model.add_constraints(k[t, g, s, h] <= 1 - model.sum(x[t, l, s, i] + k[t, l, s, i] for l in irange(1, g - 1)) for t, g, s, h in product(irange(0, T), irange(2, G), irange(1, S), irange(2, H)) for i in irange(1, h - 1))
+                model.add_constraints(k[t, g, s, h] <= 1 - model.sum(x[t, l, s, i] + k[t, l, s, i] for l in irange(1, g - 1)) for t, g, s, h in product(periods, irange(2, G), irange(1, S), irange(2, H)) for i in irange(1, h - 1))
             else:
-                model.add_constraints(k[t, g, s, h] <= 1 - model.sum(x[t, l, s, i] for l in irange(1, g - 1)) for t, g, s, h in product(irange(1, T), irange(2, G), irange(1, S), irange(2, H)) for i in irange(1, h - 1))
+                model.add_constraints(k[t, g, s, h] <= 1 - model.sum(x[t, l, s, i] for l in irange(1, g - 1)) for t, g, s, h in product(periods1, irange(2, G), irange(1, S), irange(2, H)) for i in irange(1, h - 1))
             # (50)
             if bugs_fixed:
-                model.add_constraints(k[t, g, s, h] <= 1 - model.sum(x[t, l, p, i] for l in irange(1, g - 1)) for t, g, s, h in product(irange(0, T), irange(2, G), irange(1, S), irange(1, H)) for p in irange(1, S) if p != s for i in irange(1, H))
+                model.add_constraints(k[t, g, s, h] <= 1 - model.sum(x[t, l, p, i] for l in irange(1, g - 1)) for t, g, s, h in product(periods, irange(2, G), irange(1, S), irange(1, H)) for p in irange(1, S) if p != s for i in irange(1, H))
             else:
-                model.add_constraints(k[t, g, s, h] <= 1 - model.sum(x[t, l, p, i] for l in irange(1, g - 1)) for t, g, s, h in product(irange(1, T), irange(2, G), irange(1, S), irange(1, H)) for p in irange(1, S) if p != s for i in irange(1, H))
+                model.add_constraints(k[t, g, s, h] <= 1 - model.sum(x[t, l, p, i] for l in irange(1, g - 1)) for t, g, s, h in product(periods1, irange(2, G), irange(1, S), irange(1, H)) for p in irange(1, S) if p != s for i in irange(1, H))
 
         if restricted:
             # (52)
             if bugs_fixed:
-                model.add_constraints(model.sum(z[t, j, s, h] for j, h in product(irange(g + 1, G), irange(1, H))) <= model.sum(k[u, g, r, l] for u, r, l in product(irange(1, t - 1), irange(1, S), irange(1, H))) + model.sum(x[t - 1, i, s, h] for i, h in product(irange(1, g), irange(1, H))) for t, g, s in product(irange(1, T), irange(1, G - 1), irange(1, S)))
+                model.add_constraints(model.sum(z[t, j, s, h] for j, h in product(irange(g + 1, G), irange(1, H))) <= model.sum(k[u, g, r, l] for u, r, l in product(irange(1, t - 1), irange(1, S), irange(1, H))) + model.sum(x[t - 1, i, s, h] for i, h in product(irange(1, g), irange(1, H))) for t, g, s in product(periods1, irange(1, G - 1), irange(1, S)))
             else:
-                model.add_constraints(model.sum(z[t, j, s, h] for j, h in product(irange(g + 1, G), irange(1, H))) <= model.sum(k[u, g, r, l] for u, r, l in product(irange(1, t), irange(1, S), irange(1, H))) + model.sum(x[t, i, s, h] for i, h in product(irange(1, g), irange(1, H))) for t, g, s in product(irange(1, T), irange(1, G - 1), irange(1, S)))
-
-    def get_bays(self):
-        before = {}
-        after = {}
-        for t in irange(0, self.T):
-            conf_before = [[None] * self.H for _ in range(self.S)]
-            conf_after = [[None] * self.H for _ in range(self.S)]
-            for g, s, h in product(irange(1, self.G), irange(1, self.S), irange(1, self.H)):
-                if round(self.x[t, g, s, h].solution_value) + round(self.k[t, g, s, h].solution_value) == 1:
-                    conf_before[s - 1][h - 1] = g
-                if round(self.x[t, g, s, h].solution_value) == 1:
-                    conf_after[s - 1][h - 1] = g
-            before[t] = Bay(self.S, self.H, conf_before)
-            after[t] = Bay(self.S, self.H, conf_after)
-        return before, after
+                model.add_constraints(model.sum(z[t, j, s, h] for j, h in product(irange(g + 1, G), irange(1, H))) <= model.sum(k[u, g, r, l] for u, r, l in product(irange(1, t), irange(1, S), irange(1, H))) + model.sum(x[t, i, s, h] for i, h in product(irange(1, g), irange(1, H))) for t, g, s in product(periods1, irange(1, G - 1), irange(1, S)))
+
+    def extend(self, horizon):
+        # enlarges the horizon to horizon relocations in place: adds the later periods and moves (41) to the last one
+        assert horizon >= self.T
+        (G, S, H) = (self.G, self.S, self.H)
+        keys = list(product(irange(1, G), irange(1, S), irange(1, H)))
+        free(self.model, [self.x[(self.T,) + key] for key in keys])
+        self.add_periods(self.T + 1, horizon)
+        fix(self.model, [self.x[(self.T,) + key] for key in keys], [0] * len(keys))
+
+    @staticmethod
+    def estimate_size(bay, bugs_fixed=True, restricted=False, distinct=False, horizon=None, model=None):
+        # the size of the model, counted from the index sets (see size.py)
+        (S, H, N, G) = (bay.n_stacks, bay.n_tiers, bay.n_blocks, bay.p_max)
+        T = best_plan(bay).n_relos if horizon is None else horizon
+        K = G * S * H
+        # the periods of the constraints over 0..T with bugs_fixed, and over 1..T otherwise
+        P = T + 1 if bugs_fixed else T
+        size = Size(model)
+        size.add_variables('x', (T + 1) * K)
+        size.add_variables('y', T * K)
+        size.add_variables('z', T * K)
+        size.add_variables('k', (T + 1) * K)
+        if bugs_fixed:
+            size.add_family('(2)', K, 2 * K)
+        else:
+            size.add_family('(2)', 2 * K, 2 * K)
+        size.add_family('(4)', T * S * (H - 1), T * S * (H - 1) * 2 * G)
+        size.add_family('(8)', T, T * K)
+        size.add_family('(9)', T, T * K)
+        if bugs_fixed:
+            size.add_family('early', max(T - 1, 0), max(T - 1, 0) * 2 * K)
+            size.add_family('after', T, T * 2 * K)
+        size.add_family('(15)', T * S, T * S * 2 * G)
+        size.add_family('(16)', T * S * (H - 1), T * S * (H - 1) * 3 * G)
+        size.add_family('(17)', T * S * (H - 1), T * S * (H - 1) * 3 * G)
+        size.add_family('(20)', T * S, T * S * 2 * G * H)
+        size.add_family('(42)', T * S * H, T * S * H * 2 * G)
+        size.add_family('(43)', T * G, T * G * 3 * S * H)
+        size.add_family('(44)', T * K, T * K * 5)
+        if distinct:
+            # (46) sums k over the periods up to t (from 0 with bugs_fixed)
+            periods = (T + 1) * (T + 4) // 2 if bugs_fixed else T * (T + 3) // 2
+            size.add_family('(46)', P * (G - 1), (G - 1) * S * H * periods)
+            size.add_family('(47)', P * (G - 1) * S * (H - 1), P * S * (H - 1) * ((G - 1) + G * (G - 1) // 2))
+            size.add_family('(48)', P * (G - 1) * S * (H - 1), P * S * (H - 1) * (G * (G + 1) // 2 - 1))
+        else:
+            per_g = G * G - 1 if bugs_fixed else G * (G + 1) // 2 - 1
+            size.add_family('(49)', P * (G - 1) * S * H * (H - 1) // 2, P * S * H * (H - 1) // 2 * per_g)
+            size.add_family('(50)', P * (G - 1) * S * (S - 1) * H * H, P * S * (S - 1) * H * H * (G * (G + 1) // 2 - 1))
+        if restricted:
+            periods = T * (T - 1) // 2 if bugs_fixed else T * (T + 1) // 2
+            size.add_family('(52)', T * (G - 1) * S, (G - 1) * S * (T * G * H + S * H * periods))
+        return size
+
+    def add_mip_start(self, bay, moves):
+        # relocation t at time t (y, z), followed by the retrievals (k) up to the next relocation, and those before the
+        # first relocation at time 0 (as with bugs_fixed); x[t] is the configuration after time t (see warm_start.py)
+        (y, z, k) = ({}, {}, {})
+        confs = {0: [bay.pri[s][:bay.h[s]] for s in range(self.S)]}
+        t = 0
+        for g, (s, h), after, state in replay(bay, moves):
+            if after is None:
+                k[t, g, s, h] = 1
+            else:
+                t += 1
+                assert t <= self.T, 'the plan does not fit into the horizon'
+                z[t, g, s, h] = 1
+                y[(t, g) + after] = 1
+            confs[t] = state.conf()
+        x = {(t, d, r, l): 1 for t, conf in confs.items() for r, stack in enumerate(conf, 1) for l, d in enumerate(stack, 1)}
+        return add_mip_start(self.model, (self.x, x), (self.y, y), (self.z, z), (self.k, k))
+
+    def get_moves(self, values=None):
+        # the plan as (src, dst, block, period), decoded from all values at once (by default, of the solution; see
+        # extract.py): relocation t (z, y) in period t, then the retrievals (k) of period t by priority and from the top down
+        values = solution_values(self.model) if values is None else values
+        (T, G, S, H) = (self.T, self.G, self.S, self.H)
+        (t, _, s, _) = np.nonzero(var_values(self.z, (T, G, S, H), values))
+        src = dict(zip(t.tolist(), s.tolist()))
+        (t, g, s, _) = np.nonzero(var_values(self.y, (T, G, S, H), values))
+        relocations = [(src[t], s, g + 1, t + 1, 0, 0, 0) for t, g, s in zip(t.tolist(), g.tolist(), s.tolist())]
+        (t, g, s, h) = np.nonzero(var_values(self.k, (T + 1, G, S, H), values, (0, 1, 1, 1)))
+        retrievals = [(s, None, g + 1, t, 1, g, -h) for t, g, s, h in zip(t.tolist(), g.tolist(), s.tolist(), h.tolist())]
+        return [move[:4] for move in sorted(relocations + retrievals, key=lambda move: move[3:])]
+
+    def get_bays(self, values=None):
+        # period -> Bay before and after the retrievals of the period, built on access
+        values = solution_values(self.model) if values is None else values
+        (T, G, S, H) = (self.T, self.G, self.S, self.H)
+        x = var_values(self.x, (T + 1, G, S, H), values, (0, 1, 1, 1))
+        k = var_values(self.k, (T + 1, G, S, H), values, (0, 1, 1, 1))
+        priorities = np.arange(1, G + 1)
+        return Bays(np.einsum('tgsh,g->tsh', x + k, priorities), 0), Bays(np.einsum('tgsh,g->tsh', x, priorities), 0)
 
     def get_n_relos(self):
         return self.model.objective_value
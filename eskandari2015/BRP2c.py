@@ -16,16 +16,22 @@
 
 from itertools import product
 
-from docplex.mp.model import Model
+import numpy as np
 
+from backend import new_model
 from bay import Bay
+from bulk import Rows, grid, var_index
 from common import irange
+from extract import Bays, block_grids, block_moves, solution_values, var_values
+from lazy import add_lazy, relocation_rows, retrieval_rows
+from size import Size
+from template import fix
 
 
 class BRP2c:
-    def __init__(self, bay, bug_fixed=True):
+    def __init__(self, bay, bug_fixed=True, bulk=False, lazy=False, template=False, model=None):
         bay.validate_full_distinct()
-        self.model = model = Model()
+        self.model = model = new_model(model)
 
         self.W = W = bay.n_stacks
         self.H = H = bay.n_tiers
@@ -39,6 +45,16 @@ class BRP2c:
 
         # objective
         model.minimize(model.sum(x[i, j, k, l, n, t] for i, j, k, l, n, t in product(irange(1, W), irange(1, H), irange(1, W), irange(1, H), irange(1, N), irange(1, N))))
+        self.template = template
+        if template:
+            # the pre-processing as bounds (see template.py)
+            self.set_bay(bay)
+        if lazy:
+            # (7) and (9) are separated (see lazy.py)
+            self.add_lazy(bug_fixed)
+        if bulk:
+            self.add_constraints_bulk(bay, bug_fixed, lazy, template)
+            return
         # (1)
         model.add_constraints(model.sum(b[i, j, n, t] for i, j in product(irange(1, W), irange(1, H))) + v[n, t] == 1 for n, t in product(irange(1, N), irange(1, N)))
         # (2)
@@ -49,27 +65,153 @@ class BRP2c:
         model.add_constraints(b[i, j, n, t] == b[i, j, n, t - 1] + model.sum(x[k, l, i, j, n, t - 1] for k, l in product(irange(1, W), irange(1, H))) - model.sum(x[i, j, k, l, n, t - 1] for k, l in product(irange(1, W), irange(1, H))) - y[i, j, n, t - 1] for i, j, n, t in product(irange(1, W), irange(1, H), irange(1, N), irange(2, N)))
         # (5)
         model.add_constraints(v[n, t] == model.sum(y[i, j, n, tt] for i, j, tt in product(irange(1, W), irange(1, H), irange(1, t - 1))) for n, t in product(irange(1, N), irange(1, N)))
-        # (7)
-        if bug_fixed:
-            model.add_constraints((H - 1) * (1 - b[i, j, t, t]) >= model.sum(x[ii, jj, k, l, n, t] for ii in irange(1, W) for jj in irange(1, W if ii != i else j - 1) for k, l, n in product(irange(1, W), irange(1, H), irange(1, N))) for i, j, t in product(irange(1, W), irange(1, H), irange(1, N)))
-        else:
-            model.add_constraints((H - 1) * (1 - model.sum(b[i, j, t, t] for j in irange(1, H))) >= model.sum(x[ii, j, k, l, n, t] for ii in irange(1, W) if ii != i for j, k, l, n in product(irange(1, H), irange(1, W), irange(1, H), irange(1, N))) for i, t in product(irange(1, W), irange(1, N)))
+        if not lazy:
+            # (7)
+            if bug_fixed:
+                model.add_constraints((H - 1) * (1 - b[i, j, t, t]) >= model.sum(x[ii, jj, k, l, n, t] for ii in irange(1, W) for jj in irange(1, W if ii != i else j - 1) for k, l, n in product(irange(1, W), irange(1, H), irange(1, N))) for i, j, t in product(irange(1, W), irange(1, H), irange(1, N)))
+            else:
+                model.add_constraints((H - 1) * (1 - model.sum(b[i, j, t, t] for j in irange(1, H))) >= model.sum(x[ii, j, k, l, n, t] for ii in irange(1, W) if ii != i for j, k, l, n in product(irange(1, H), irange(1, W), irange(1, H), irange(1, N))) for i, t in product(irange(1, W), irange(1, N)))
         # (8)
         model.add_constraints(x[i, j, i, l, n, t] == 0 for i, j, l, n, t in product(irange(1, W), irange(1, H), irange(1, H), irange(1, N), irange(1, N)))
-        # (9)
-        model.add_constraints(H * (1 - model.sum(x[i, j, k, l, n, t] for n in irange(1, N))) >= model.sum(x[i, jj, k, ll, n, t] for jj, ll, n in product(irange(j + 1, H), irange(l + 1, H), irange(1, N))) for i, j, k, l, t in product(irange(1, W), irange(1, H), irange(1, W), irange(1, H), irange(1, N - 1)))
+        if not lazy:
+            # (9)
+            model.add_constraints(H * (1 - model.sum(x[i, j, k, l, n, t] for n in irange(1, N))) >= model.sum(x[i, jj, k, ll, n, t] for jj, ll, n in product(irange(j + 1, H), irange(l + 1, H), irange(1, N))) for i, j, k, l, t in product(irange(1, W), irange(1, H), irange(1, W), irange(1, H), irange(1, N - 1)))
         # pre-processing
-        model.add_constraints(b[i, j, n, 1] == int(bay.pri[i - 1][j - 1] == n) for i, j, n in product(irange(1, W), irange(1, H), irange(1, N)))
-
-    def get_bays(self):
-        bays = {}
-        for t in irange(1, self.N):
-            conf = [[None] * self.H for _ in range(self.W)]
-            for i, j, n in product(irange(1, self.W), irange(1, self.H), irange(1, self.N)):
-                if round(self.b[i, j, n, t].solution_value) == 1:
-                    conf[i - 1][j - 1] = n
-            bays[t] = Bay(self.W, self.H, conf)
-        return bays
+        if not template:
+            model.add_constraints(b[i, j, n, 1] == int(bay.pri[i - 1][j - 1] == n) for i, j, n in product(irange(1, W), irange(1, H), irange(1, N)))
+
+    @staticmethod
+    def estimate_size(bay, bug_fixed=True, bulk=False, lazy=False, template=False, model=None):
+        # the size of the model, counted from the index sets (see size.py)
+        (W, H, N) = (bay.n_stacks, bay.n_tiers, bay.n_blocks)
+        size = Size(model, bulk)
+        size.add_variables('b', W * H * N * N)
+        size.add_variables('x', W * H * W * H * N * N)
+        size.add_variables('y', W * H * N * N)
+        size.add_family('(1)', N * N, N * N * W * H, W * H * N * N)
+        size.add_family('(2)', W * H * N, W * H * N * N, W * H * N * N)
+        size.add_family('(3)', W * (H - 1) * N, W * (H - 1) * N * 2 * N, W * (H - 1) * N * N)
+        # x[i, j, i, j, n, t - 1] cancels out
+        size.add_family('(4)', W * H * N * (N - 1), W * H * N * (N - 1) * (2 * W * H + 1), W * H * N * (N - 1) * W * H)
+        # at t = 1, the rows of (5) hold no variables and are not built
+        size.add_family('(5)', N * (N - 1), N * W * H * N * (N - 1) // 2, W * H * N ** 3)
+        if not lazy:
+            if bug_fixed:
+                # b[i, j, t, t] and the relocations from the stacks ii != i (tiers up to W) and below (i, j)
+                size.add_rows('(7)', (1 + ((W - 1) * min(W, H) + j) * W * H * N for i, j, t in product(range(W), range(H), range(N))), W * H * N * W * H * W * H * N)
+            else:
+                size.add_family('(7)', W * N, W * N * (H + (W - 1) * H * W * H * N), W * N * W * H * W * H * N)
+        size.add_family('(8)', W * H * H * N * N, W * H * H * N * N, W * H * H * N * N)
+        if not lazy:
+            size.add_family('(9)', W * H * W * H * (N - 1), W * W * (N - 1) * N * (H * H + (H * (H - 1) // 2) ** 2), W * H * W * H * (N - 1) * N * H * H)
+        if not template:
+            size.add_family('pre-processing', W * H * N, W * H * N, W * H * N)
+        return size
+
+    def add_constraints_bulk(self, bay, bug_fixed, lazy, template):
+        # the constraints above, assembled with NumPy (0-based indices) and loaded into CPLEX at once (see bulk.py)
+        model = self.model
+        (W, H, N) = (self.W, self.H, self.N)
+        b = var_index(self.b, (W, H, N, N))
+        x = var_index(self.x, (W, H, W, H, N, N))
+        y = var_index(self.y, (W, H, N, N))
+        (n, t) = grid(N, N)
+        v = (n < t).astype(int)
+        pri = np.array([[p or 0 for p in bay.pri[s]] for s in range(W)])
+        # (1)
+        rows = Rows((N, N), 'E', 1 - v)
+        (i, j, n, t) = grid(W, H, N, N)
+        rows.add(b[i, j, n, t], 1, (n, t))
+        rows.post(model)
+        # (2)
+        rows = Rows((W, H, N), 'L', 1)
+        (i, j, t, n) = grid(W, H, N, N)
+        rows.add(b[i, j, n, t], 1, (i, j, t))
+        rows.post(model)
+        # (3)
+        rows = Rows((W, H - 1, N), 'G')
+        (i, j, t, n) = grid(W, H - 1, N, N)
+        rows.add(b[i, j, n, t], 1, (i, j, t))
+        rows.add(b[i, j + 1, n, t], -1, (i, j, t))
+        rows.post(model)
+        # (4)
+        rows = Rows((W, H, N, N - 1), 'E')
+        (i, j, n, t, k, l) = grid(W, H, N, N - 1, W, H)
+        rows.add(b[i, j, n, t + 1], 1, (i, j, n, t))
+        rows.add(b[i, j, n, t], -1, (i, j, n, t))
+        rows.add(x[k, l, i, j, n, t], -1, (i, j, n, t))
+        rows.add(x[i, j, k, l, n, t], 1, (i, j, n, t))
+        rows.add(y[i, j, n, t], 1, (i, j, n, t))
+        rows.post(model)
+        # (5)
+        rows = Rows((N, N), 'E', v)
+        (i, j, n, t, tt) = grid(W, H, N, N, N)
+        rows.add(y[i, j, n, tt], 1, (n, t), tt < t)
+        rows.post(model)
+        if not lazy:
+            # (7)
+            if bug_fixed:
+                rows = Rows((W, H, N), 'L', H - 1)
+                (i, j, t, ii, jj, k, l, n) = grid(W, H, N, W, H, W, H, N)
+                rows.add(b[i, j, t, t], H - 1, (i, j, t))
+                rows.add(x[ii, jj, k, l, n, t], 1, (i, j, t), np.where(ii != i, jj < W, jj < j))
+            else:
+                rows = Rows((W, N), 'L', H - 1)
+                (i, t, ii, j, k, l, n) = grid(W, N, W, H, W, H, N)
+                rows.add(b[i, j, t, t], H - 1, (i, t))
+                rows.add(x[ii, j, k, l, n, t], 1, (i, t), ii != i)
+            rows.post(model)
+        # (8)
+        rows = Rows((W, H, H, N, N), 'E')
+        (i, j, l, n, t) = grid(W, H, H, N, N)
+        rows.add(x[i, j, i, l, n, t], 1, (i, j, l, n, t))
+        rows.post(model)
+        if not lazy:
+            # (9)
+            rows = Rows((W, H, W, H, N - 1), 'L', H)
+            (i, j, k, l, t, n, jj, ll) = grid(W, H, W, H, N - 1, N, H, H)
+            rows.add(x[i, j, k, l, n, t], H, (i, j, k, l, t))
+            rows.add(x[i, jj, k, ll, n, t], 1, (i, j, k, l, t), (jj > j) & (ll > l))
+            rows.post(model)
+
+        # pre-processing
+        if not template:
+            (i, j, n) = grid(W, H, N)
+            rows = Rows((W, H, N), 'E', pri[i, j] == n + 1)
+            rows.add(b[i, j, n, 0], 1, (i, j, n))
+            rows.post(model)
+
+    @staticmethod
+    def supports_template(flags):
+        # whether a model built with the flags (and template=True) can be moved to another bay by set_bay
+        return True
+
+    def set_bay(self, bay):
+        # moves a model built with template=True to another bay of the same size
+        assert self.template
+        bay.validate_full_distinct()
+        assert (bay.n_stacks, bay.n_tiers, bay.n_blocks) == (self.W, self.H, self.N)
+        keys = list(product(irange(1, self.W), irange(1, self.H), irange(1, self.N)))
+        fix(self.model, [self.b[i, j, n, 1] for i, j, n in keys], [int(bay.pri[i - 1][j - 1] == n) for i, j, n in keys])
+
+    def add_lazy(self, bug_fixed):
+        (W, H, N) = (self.W, self.H, self.N)
+        b = var_index(self.b, (W, H, N, N))
+        x = var_index(self.x, (W, H, W, H, N, N))
+        add_lazy(self.model, retrieval_rows(b, x, bug_fixed))
+        add_lazy(self.model, relocation_rows(x, H, H))
+
+    def get_moves(self, values=None):
+        # the plan as (src, dst, block, period), decoded from all values at once (by default, of the solution; see
+        # extract.py)
+        values = solution_values(self.model) if values is None else values
+        (W, H, N) = (self.W, self.H, self.N)
+        return block_moves(var_values(self.b, (W, H, N, N), values), var_values(self.x, (W, H, W, H, N, N), values))
+
+    def get_bays(self, values=None):
+        # period -> Bay, built on access
+        values = solution_values(self.model) if values is None else values
+        return Bays(block_grids(var_values(self.b, (self.W, self.H, self.N, self.N), values)))
 
     def get_n_relos(self):
         return self.model.objective_value
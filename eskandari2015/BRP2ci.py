@@ -16,16 +16,20 @@
 
 from itertools import product
 
-from docplex.mp.model import Model
+import numpy as np
 
+from backend import new_model
 from bay import Bay
+from bulk import Rows, grid, var_index
 from common import irange
+from extract import Bays, block_grids, block_moves, solution_values, var_values
+from size import Size
 
 
 class BRP2ci:
-    def __init__(self, bay):
+    def __init__(self, bay, bulk=False, model=None):
         bay.validate_full_distinct()
-        self.model = model = Model()
+        self.model = model = new_model(model)
 
         self.W = W = bay.n_stacks
         self.H = H = bay.n_tiers
@@ -39,6 +43,9 @@ class BRP2ci:
 
         # objective
         model.minimize(model.sum(x[i, j, k, l, n, t] for i, j, k, l, n, t in product(irange(1, W), irange(1, H), irange(1, W), irange(1, H), irange(1, N), irange(1, N))))
+        if bulk:
+            self.add_constraints_bulk(bay)
+            return
         # (1)
         model.add_constraints(model.sum(b[i, j, n, t] for i, j in product(irange(1, W), irange(1, H))) + v[n, t] == 1 for n, t in product(irange(1, N), irange(1, N)))
         # (2)
@@ -64,15 +71,122 @@ class BRP2ci:
         # pre-processing
         model.add_constraints(b[i, j, n, 1] == int(bay.pri[i - 1][j - 1] == n) for i, j, n in product(irange(1, W), irange(1, H), irange(1, N)))
 
-    def get_bays(self):
-        bays = {}
-        for t in irange(1, self.N):
-            conf = [[None] * self.H for _ in range(self.W)]
-            for i, j, n in product(irange(1, self.W), irange(1, self.H), irange(1, self.N)):
-                if round(self.b[i, j, n, t].solution_value) == 1:
-                    conf[i - 1][j - 1] = n
-            bays[t] = Bay(self.W, self.H, conf)
-        return bays
+    @staticmethod
+    def estimate_size(bay, bulk=False, model=None):
+        # the size of the model, counted from the index sets (see size.py)
+        (W, H, N) = (bay.n_stacks, bay.n_tiers, bay.n_blocks)
+        size = Size(model, bulk)
+        size.add_variables('b', W * H * N * N)
+        size.add_variables('x', W * H * W * H * N * N)
+        size.add_variables('y', W * H * N * N)
+        size.add_family('(1)', N * N, N * N * W * H, W * H * N * N)
+        size.add_family('(2)', W * H * N, W * H * N * N, W * H * N * N)
+        size.add_family('(3)', W * (H - 1) * N, W * (H - 1) * N * 2 * N, W * (H - 1) * N * N)
+        # x[i, j, i, j, n, t - 1] cancels out
+        size.add_family('(4)', W * H * N * (N - 1), W * H * N * (N - 1) * (2 * W * H + 1), W * H * N * (N - 1) * W * H)
+        # at t = 1, the rows of (5) hold no variables and are not built
+        size.add_family('(5)', N * (N - 1), N * W * H * N * (N - 1) // 2, W * H * N ** 3)
+        size.add_family('(8)', W * H * H * N * N, W * H * H * N * N, W * H * H * N * N)
+        size.add_family('(9)', W * H * W * H * (N - 1), W * W * (N - 1) * N * (H * H + (H * (H - 1) // 2) ** 2), W * H * W * H * (N - 1) * N * H * H)
+        size.add_family('(10)', N, N * W * H, N * W * H)
+        size.add_family('(11)', N * (N - 1), N * (N - 1) * W * H, N * N * W * H)
+        size.add_family('(12)', W * H * N, W * N * (H * W * H * N + H * (H - 1) // 2), W * H * N * W * H * N)
+        size.add_family('(13)', W * H * N * N, W * H * N * N * (W * H + 2), W * H * N * N * W * H)
+        size.add_family('pre-processing', W * H * N, W * H * N, W * H * N)
+        return size
+
+    def add_constraints_bulk(self, bay):
+        # the constraints above, assembled with NumPy (0-based indices) and loaded into CPLEX at once (see bulk.py)
+        model = self.model
+        (W, H, N) = (self.W, self.H, self.N)
+        b = var_index(self.b, (W, H, N, N))
+        x = var_index(self.x, (W, H, W, H, N, N))
+        y = var_index(self.y, (W, H, N, N))
+        (n, t) = grid(N, N)
+        v = (n < t).astype(int)
+        pri = np.array([[p or 0 for p in bay.pri[s]] for s in range(W)])
+        # (1)
+        rows = Rows((N, N), 'E', 1 - v)
+        (i, j, n, t) = grid(W, H, N, N)
+        rows.add(b[i, j, n, t], 1, (n, t))
+        rows.post(model)
+        # (2)
+        rows = Rows((W, H, N), 'L', 1)
+        (i, j, t, n) = grid(W, H, N, N)
+        rows.add(b[i, j, n, t], 1, (i, j, t))
+        rows.post(model)
+        # (3)
+        rows = Rows((W, H - 1, N), 'G')
+        (i, j, t, n) = grid(W, H - 1, N, N)
+        rows.add(b[i, j, n, t], 1, (i, j, t))
+        rows.add(b[i, j + 1, n, t], -1, (i, j, t))
+        rows.post(model)
+        # (4)
+        rows = Rows((W, H, N, N - 1), 'E')
+        (i, j, n, t, k, l) = grid(W, H, N, N - 1, W, H)
+        rows.add(b[i, j, n, t + 1], 1, (i, j, n, t))
+        rows.add(b[i, j, n, t], -1, (i, j, n, t))
+        rows.add(x[k, l, i, j, n, t], -1, (i, j, n, t))
+        rows.add(x[i, j, k, l, n, t], 1, (i, j, n, t))
+        rows.add(y[i, j, n, t], 1, (i, j, n, t))
+        rows.post(model)
+        # (5)
+        rows = Rows((N, N), 'E', v)
+        (i, j, n, t, tt) = grid(W, H, N, N, N)
+        rows.add(y[i, j, n, tt], 1, (n, t), tt < t)
+        rows.post(model)
+        # (8)
+        rows = Rows((W, H, H, N, N), 'E')
+        (i, j, l, n, t) = grid(W, H, H, N, N)
+        rows.add(x[i, j, i, l, n, t], 1, (i, j, l, n, t))
+        rows.post(model)
+        # (9)
+        rows = Rows((W, H, W, H, N - 1), 'L', H)
+        (i, j, k, l, t, n, jj, ll) = grid(W, H, W, H, N - 1, N, H, H)
+        rows.add(x[i, j, k, l, n, t], H, (i, j, k, l, t))
+        rows.add(x[i, jj, k, ll, n, t], 1, (i, j, k, l, t), (jj > j) & (ll > l))
+        rows.post(model)
+        # (10)
+        rows = Rows((N,), 'E', 1)
+        (t, i, j) = grid(N, W, H)
+        rows.add(y[i, j, t, t], 1, (t,))
+        rows.post(model)
+        # (11)
+        (n, t, i, j) = grid(N, N, W, H)
+        rows = Rows((N, N), 'E', where=n != t)
+        rows.add(y[i, j, n, t], 1, (n, t))
+        rows.post(model)
+        # (12)
+        rows = Rows((W, H, N), 'L')
+        (i, j, t, k, l, n) = grid(W, H, N, W, H, N)
+        rows.add(x[i, j, k, l, n, t], 1, (i, j, t))
+        rows.add(y[i, l, t, t], -1, (i, j, t), l < j)
+        rows.post(model)
+        # (13)
+        rows = Rows((W, H, N, N), 'L')
+        (i, j, n, t, k, l) = grid(W, H, N, N, W, H)
+        rows.add(x[i, j, k, l, n, t], 1, (i, j, n, t))
+        rows.add(y[i, j, n, t], 1, (i, j, n, t))
+        rows.add(b[i, j, n, t], -1, (i, j, n, t))
+        rows.post(model)
+
+        # pre-processing
+        (i, j, n) = grid(W, H, N)
+        rows = Rows((W, H, N), 'E', pri[i, j] == n + 1)
+        rows.add(b[i, j, n, 0], 1, (i, j, n))
+        rows.post(model)
+
+    def get_moves(self, values=None):
+        # the plan as (src, dst, block, period), decoded from all values at once (by default, of the solution; see
+        # extract.py)
+        values = solution_values(self.model) if values is None else values
+        (W, H, N) = (self.W, self.H, self.N)
+        return block_moves(var_values(self.b, (W, H, N, N), values), var_values(self.x, (W, H, W, H, N, N), values))
+
+    def get_bays(self, values=None):
+        # period -> Bay, built on access
+        values = solution_values(self.model) if values is None else values
+        return Bays(block_grids(var_values(self.b, (self.W, self.H, self.N, self.N), values)))
 
     def get_n_relos(self):
         return self.model.objective_value
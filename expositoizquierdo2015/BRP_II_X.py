@@ -16,16 +16,20 @@
 
 from itertools import product
 
-from docplex.mp.model import Model
+import numpy as np
 
+from backend import new_model
 from bay import Bay
+from bulk import Rows, grid, var_index
 from common import irange
+from size import Size
+from template import fix
 
 
 class BRP_II_X:
-    def __init__(self, bay, bug_fixed=True):
+    def __init__(self, bay, bug_fixed=True, bulk=False, template=False, model=None):
         bay.validate_full_distinct()
-        self.model = model = Model()
+        self.model = model = new_model(model)
 
         self.S = S = bay.n_stacks
         self.T = T = bay.n_tiers
@@ -39,6 +43,13 @@ class BRP_II_X:
 
         # objective
         model.minimize(model.sum(x[i, j, k, l, n, t] for i, j, k, l, n, t in product(irange(1, S), irange(1, T), irange(1, S), irange(1, T), irange(1, N), irange(1, N))))
+        self.template = template
+        if template:
+            # the pre-processing as bounds (see template.py)
+            self.set_bay(bay)
+        if bulk:
+            self.add_constraints_bulk(bay, bug_fixed, template)
+            return
         # (7)
         model.add_constraints(model.sum(b[i, j, n, t] for i, j in product(irange(1, S), irange(1, T))) + v[n, t] == 1 for n, t in product(irange(1, N), irange(1, N)))
         # (8)
@@ -59,7 +70,117 @@ class BRP_II_X:
         # (16)
         model.add_constraints((T - 1) * (1 - b[i, j, t, t]) >= model.sum(x[i, jj, k, l, n, t] for jj, k, l, n in product(irange(1, j - 1), irange(1, S), irange(1, T), irange(1, N))) for i, j, t in product(irange(1, S), irange(1, T), irange(1, N)))
         # pre-processing
-        model.add_constraints(b[i, j, n, 1] == int(bay.pri[i - 1][j - 1] == n) for i, j, n in product(irange(1, S), irange(1, T), irange(1, N)))
+        if not template:
+            model.add_constraints(b[i, j, n, 1] == int(bay.pri[i - 1][j - 1] == n) for i, j, n in product(irange(1, S), irange(1, T), irange(1, N)))
+
+    @staticmethod
+    def estimate_size(bay, bug_fixed=True, bulk=False, template=False, model=None):
+        # the size of the model, counted from the index sets (see size.py)
+        (S, T, N) = (bay.n_stacks, bay.n_tiers, bay.n_blocks)
+        size = Size(model, bulk)
+        size.add_variables('b', S * T * N * N)
+        size.add_variables('x', S * T * S * T * N * N)
+        size.add_variables('y', S * T * N * N)
+        size.add_family('(7)', N * N, N * N * S * T, S * T * N * N)
+        size.add_family('(8)', S * T * N, S * T * N * N, S * T * N * N)
+        size.add_family('(9)', S * (T - 1) * N, S * (T - 1) * N * 2 * N, S * (T - 1) * N * N)
+        # x[i, j, i, j, n, t - 1] cancels out
+        size.add_family('(10)', S * T * N * (N - 1), S * T * N * (N - 1) * (2 * S * T + 1), S * T * N * (N - 1) * S * T)
+        # at t = 1, the rows of (11) hold no variables and are not built
+        size.add_family('(11)', N * (N - 1), N * S * T * N * (N - 1) // 2, S * T * N ** 3)
+        if bug_fixed:
+            size.add_family('(13)', S * N, S * N * (T + (S - 1) * T * S * T * N), S * N * S * T * S * T * N)
+        size.add_family('(14)', S * T * T * N * N, S * T * T * N * N, S * T * T * N * N)
+        size.add_family('(15)', S * T * S * T * (N - 1), S * S * (N - 1) * N * (T * T + (T * (T - 1) // 2) ** 2), S * T * S * T * (N - 1) * N * T * T)
+        size.add_family('(16)', S * T * N, S * N * (T + T * (T - 1) // 2 * S * T * N), S * T * N * T * S * T * N)
+        if not template:
+            size.add_family('pre-processing', S * T * N, S * T * N, S * T * N)
+        return size
+
+    def add_constraints_bulk(self, bay, bug_fixed, template):
+        # the constraints above, assembled with NumPy (0-based indices) and loaded into CPLEX at once (see bulk.py)
+        model = self.model
+        (S, T, N) = (self.S, self.T, self.N)
+        b = var_index(self.b, (S, T, N, N))
+        x = var_index(self.x, (S, T, S, T, N, N))
+        y = var_index(self.y, (S, T, N, N))
+        (n, t) = grid(N, N)
+        v = (n < t).astype(int)
+        pri = np.array([[p or 0 for p in bay.pri[s]] for s in range(S)])
+        # (7)
+        rows = Rows((N, N), 'E', 1 - v)
+        (i, j, n, t) = grid(S, T, N, N)
+        rows.add(b[i, j, n, t], 1, (n, t))
+        rows.post(model)
+        # (8)
+        rows = Rows((S, T, N), 'L', 1)
+        (i, j, t, n) = grid(S, T, N, N)
+        rows.add(b[i, j, n, t], 1, (i, j, t))
+        rows.post(model)
+        # (9)
+        rows = Rows((S, T - 1, N), 'G')
+        (i, j, t, n) = grid(S, T - 1, N, N)
+        rows.add(b[i, j, n, t], 1, (i, j, t))
+        rows.add(b[i, j + 1, n, t], -1, (i, j, t))
+        rows.post(model)
+        # (10)
+        rows = Rows((S, T, N, N - 1), 'E')
+        (i, j, n, t, k, l) = grid(S, T, N, N - 1, S, T)
+        rows.add(b[i, j, n, t + 1], 1, (i, j, n, t))
+        rows.add(b[i, j, n, t], -1, (i, j, n, t))
+        rows.add(x[k, l, i, j, n, t], -1, (i, j, n, t))
+        rows.add(x[i, j, k, l, n, t], 1, (i, j, n, t))
+        rows.add(y[i, j, n, t], 1, (i, j, n, t))
+        rows.post(model)
+        # (11)
+        rows = Rows((N, N), 'E', v)
+        (i, j, n, t, tt) = grid(S, T, N, N, N)
+        rows.add(y[i, j, n, tt], 1, (n, t), tt < t)
+        rows.post(model)
+        # (13)
+        if bug_fixed:
+            rows = Rows((S, N), 'L', T - 1)
+            (i, t, ii, j, k, l, n) = grid(S, N, S, T, S, T, N)
+            rows.add(b[i, j, t, t], T - 1, (i, t))
+            rows.add(x[ii, j, k, l, n, t], 1, (i, t), ii != i)
+            rows.post(model)
+        # (14)
+        rows = Rows((S, T, T, N, N), 'E')
+        (i, j, l, n, t) = grid(S, T, T, N, N)
+        rows.add(x[i, j, i, l, n, t], 1, (i, j, l, n, t))
+        rows.post(model)
+        # (15)
+        rows = Rows((S, T, S, T, N - 1), 'L', T - 1)
+        (i, j, k, l, t, n, jj, ll) = grid(S, T, S, T, N - 1, N, T, T)
+        rows.add(x[i, j, k, l, n, t], T - 1, (i, j, k, l, t))
+        rows.add(x[i, jj, k, ll, n, t], 1, (i, j, k, l, t), (jj > j) & (ll > l))
+        rows.post(model)
+        # (16)
+        rows = Rows((S, T, N), 'L', T - 1)
+        (i, j, t, jj, k, l, n) = grid(S, T, N, T, S, T, N)
+        rows.add(b[i, j, t, t], T - 1, (i, j, t))
+        rows.add(x[i, jj, k, l, n, t], 1, (i, j, t), jj < j)
+        rows.post(model)
+
+        # pre-processing
+        if not template:
+            (i, j, n) = grid(S, T, N)
+            rows = Rows((S, T, N), 'E', pri[i, j] == n + 1)
+            rows.add(b[i, j, n, 0], 1, (i, j, n))
+            rows.post(model)
+
+    @staticmethod
+    def supports_template(flags):
+        # whether a model built with the flags (and template=True) can be moved to another bay by set_bay
+        return True
+
+    def set_bay(self, bay):
+        # moves a model built with template=True to another bay of the same size
+        assert self.template
+        bay.validate_full_distinct()
+        assert (bay.n_stacks, bay.n_tiers, bay.n_blocks) == (self.S, self.T, self.N)
+        keys = list(product(irange(1, self.S), irange(1, self.T), irange(1, self.N)))
+        fix(self.model, [self.b[i, j, n, 1] for i, j, n in keys], [int(bay.pri[i - 1][j - 1] == n) for i, j, n in keys])
 
     def get_bays(self):
         bays = {}
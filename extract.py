@@ -0,0 +1,107 @@
+# Copyright (c) 2021 Bo Jin <jinbostar@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+from collections.abc import Mapping
+
+import numpy as np
+
+from bay import Bay
+from bulk import var_index
+
+# Bulk extraction of solutions: all values are fetched at once into a NumPy array (by column, as var.index), the
+# variable dictionaries are decoded with array operations, plans come out as move lists (src, dst, block, period) with
+# 0-based stacks as in BayState.moves (dst is None for a retrieval), and Bay objects are only built when accessed.
+
+
+def solution_values(model, index=None):
+    # the values of the solution (or of solution index of the CPLEX solution pool) for all columns
+    if hasattr(model, 'get_cplex'):
+        cpx = model.get_cplex()
+        return np.array(cpx.solution.get_values() if index is None else cpx.solution.pool.get_values(index))
+    # stream.StreamModel and backend.HighsModel keep a single solution
+    assert index is None
+    return np.array([var.solution_value for var in model.variables])
+
+
+def var_values(var_dict, shape, values, base=1):
+    # the values of a variable dictionary (1-based keys, or base per axis as in bulk.var_index) as an integer array of
+    # shape, 0 for absent keys
+    index = var_index(var_dict, shape, base)
+    return np.where(index >= 0, np.rint(values[index]), 0).astype(np.int64)
+
+
+def block_grids(b):
+    # (period, stack, tier) -> block of an array b[i, j, n, t] (0-based) of the blocks at the positions by period, with
+    # blocks numbered from 1 and 0 for an empty slot
+    return np.einsum('ijnt,n->tij', b, np.arange(1, b.shape[2] + 1))
+
+
+def block_moves(b, x):
+    # the move list of the models with the variables of Caserta et al. (2012): relocations x[i, j, k, l, n, t] in the
+    # period from the top down, then the retrieval of block t from its position in b[:, :, t, t]
+    (i, j, k, _, n, t) = np.nonzero(x)
+    relocations = [(i, k, n + 1, t + 1, 0, -j) for i, j, k, n, t in zip(i.tolist(), j.tolist(), k.tolist(), n.tolist(), t.tolist())]
+    (i, j, t) = np.nonzero(np.diagonal(b, axis1=2, axis2=3))
+    retrievals = [(i, None, t + 1, t + 1, 1, -j) for i, j, t in zip(i.tolist(), j.tolist(), t.tolist())]
+    return [move[:4] for move in sorted(relocations + retrievals, key=lambda move: move[3:])]
+
+
+def conf_moves(bays):
+    # the move list between consecutive configurations, given as (period, Bay) pairs: the moves between two of them get
+    # the later period, with at most one relocation (first), then the retrievals, each time of the lowest priority on
+    # top of the stacks that lose blocks
+    moves = []
+    bays = iter(bays)
+    (_, bay) = next(bays)
+    for (t, next_bay) in bays:
+        (a, b) = ([bay.pri[s][:bay.h[s]] for s in range(bay.n_stacks)], [next_bay.pri[s][:next_bay.h[s]] for s in range(next_bay.n_stacks)])
+        common = [next((h for h in range(min(len(a[s]), len(b[s]))) if a[s][h] != b[s][h]), min(len(a[s]), len(b[s]))) for s in range(len(a))]
+        lost = [a[s][common[s]:] for s in range(len(a))]
+        gained = [(s, b[s][common[s]:]) for s in range(len(b)) if len(b[s]) > common[s]]
+        assert len(gained) <= 1 and all(len(blocks) == 1 for _, blocks in gained), 'more than one relocation in period {}'.format(t)
+        for (dst, [p]) in gained:
+            src = next(s for s in range(len(a)) if s != dst and lost[s] and lost[s][-1] == p)
+            lost[src].pop()
+            moves.append((src, dst, p, t))
+        while any(lost):
+            (p, src) = min((lost[s][-1], s) for s in range(len(a)) if lost[s])
+            lost[src].pop()
+            moves.append((src, None, p, t))
+        bay = next_bay
+    return moves
+
+
+class Bays(Mapping):
+    # period -> Bay of an array grids[period - first] = (stack, tier) -> priority (0 for an empty slot), building every
+    # Bay on first access
+    def __init__(self, grids, first=1):
+        self.grids = grids
+        self.first = first
+        self.bays = {}
+
+    def __getitem__(self, t):
+        if not self.first <= t < self.first + len(self.grids):
+            raise KeyError(t)
+        if t not in self.bays:
+            grid = self.grids[t - self.first]
+            self.bays[t] = Bay(grid.shape[0], grid.shape[1], [[p or None for p in stack] for stack in grid.tolist()])
+        return self.bays[t]
+
+    def __iter__(self):
+        return iter(range(self.first, self.first + len(self.grids)))
+
+    def __len__(self):
+        return len(self.grids)
@@ -16,16 +16,21 @@
 
 from itertools import product
 
-from docplex.mp.model import Model
+import numpy as np
 
+from backend import new_model
 from bay import Bay
+from bulk import grid, var_index
 from common import irange
+from lazy import add_lazy, gather, row
+from size import Size
+from warm_start import add_mip_start, stages
 
 
 class CRP_I:
-    def __init__(self, bay):
+    def __init__(self, bay, lazy=False, model=None):
         bay.validate_full_distinct()
-        self.model = model = Model()
+        self.model = model = new_model(model)
 
         self.S = S = bay.n_stacks
         self.T = T = bay.n_tiers
@@ -50,10 +55,14 @@ class CRP_I:
         model.add_constraints(a[n, c, c] == 0 for n in irange(2, N) for c in irange(n, C))
         # (4)
         model.add_constraints(a[n, c, d] + a[n, d, c] <= 1 for n in irange(2, N) for c, d in product(irange(n, C), irange(n, C)) if c != d)
-        # (5)
-        model.add_constraints(a[n, c, d] + a[n, d, c] >= a[n, C + s, c] + a[n, C + s, d] - 1 for n, s in product(irange(2, N), irange(1, S)) for c, d in product(irange(n, C), irange(n, C)) if c != d)
-        # (6)
-        model.add_constraints(a[n, c, d] + a[n, d, c] <= 2 - a[n, C + s, c] - model.sum(a[n, C + r, d] for r in irange(1, S) if r != s) for n, s in product(irange(2, N), irange(1, S)) for c, d in product(irange(n, C), irange(n, C)) if c != d)
+        if lazy:
+            # (5), (6) and (12) are separated (see lazy.py)
+            self.add_lazy()
+        else:
+            # (5)
+            model.add_constraints(a[n, c, d] + a[n, d, c] >= a[n, C + s, c] + a[n, C + s, d] - 1 for n, s in product(irange(2, N), irange(1, S)) for c, d in product(irange(n, C), irange(n, C)) if c != d)
+            # (6)
+            model.add_constraints(a[n, c, d] + a[n, d, c] <= 2 - a[n, C + s, c] - model.sum(a[n, C + r, d] for r in irange(1, S) if r != s) for n, s in product(irange(2, N), irange(1, S)) for c, d in product(irange(n, C), irange(n, C)) if c != d)
         # (7)
         model.add(model.sum(a[n, C + s, d] for d in irange(n, C)) <= T for n, s in product(irange(2, N), irange(1, S)))
         # (8)
@@ -64,8 +73,88 @@ class CRP_I:
         model.add_constraints(a[n + 1, d, c] >= a[n, d, c] - a[n, n, c] for n in irange(1, N - 1) for c, d in product(irange(n + 1, C), irange(n + 1, C + S)) if c != d)
         # (11)
         model.add_constraints(a[n, n, c] + a[n, C + s, c] + a[n + 1, C + s, c] <= 2 for n in irange(1, N - 1) for c, s in product(irange(n + 1, C), irange(1, S)))
-        # (12)
-        model.add_constraints(a[n, n, c] + a[n, n, d] + a[n, c, d] + a[n + 1, c, d] <= 3 for n in irange(1, N - 1) for c, d in product(irange(n + 1, C), irange(n + 1, C)) if c != d)
+        if not lazy:
+            # (12)
+            model.add_constraints(a[n, n, c] + a[n, n, d] + a[n, c, d] + a[n + 1, c, d] <= 3 for n in irange(1, N - 1) for c, d in product(irange(n + 1, C), irange(n + 1, C)) if c != d)
+
+    @staticmethod
+    def estimate_size(bay, lazy=False, model=None):
+        # the size of the model, counted from the index sets (see size.py); m blocks are left at stage n, and m - 1 below
+        # block n
+        (S, C) = (bay.n_stacks, bay.n_blocks)
+        N = C - S + 1
+        size = Size(model)
+        size.add_variables('a', sum((C + S - n + 1) * (C - n + 1) for n in irange(1, N)))
+        size.add_variables('b', C - N)
+        later = [C - n + 1 for n in irange(2, N)]
+        size.add_family('(1)', (C + S) * C, (C + S) * C)
+        size.add_family('(2)', sum(later), sum(later) * S)
+        size.add_family('(3)', sum(later), sum(later))
+        size.add_family('(4)', sum(m * (m - 1) for m in later), sum(m * (m - 1) for m in later) * 2)
+        if not lazy:
+            size.add_family('(5)', sum(S * m * (m - 1) for m in later), sum(S * m * (m - 1) for m in later) * 4)
+            size.add_family('(6)', sum(S * m * (m - 1) for m in later), sum(S * m * (m - 1) for m in later) * (S + 2))
+        size.add_family('(7)', (N - 1) * S, sum(later) * S)
+        size.add_family('(8)', sum(d - N for d in irange(N + 1, C)), sum(d - N for d in irange(N + 1, C)) * 2)
+        below = [C - n for n in irange(1, N - 1)]
+        size.add_family('(9)', sum(m * (m + S - 1) for m in below), sum(m * (m + S - 1) for m in below) * 3)
+        size.add_family('(10)', sum(m * (m + S - 1) for m in below), sum(m * (m + S - 1) for m in below) * 3)
+        size.add_family('(11)', sum(below) * S, sum(below) * S * 3)
+        if not lazy:
+            size.add_family('(12)', sum(m * (m - 1) for m in below), sum(m * (m - 1) for m in below) * 4)
+        return size
+
+    def add_lazy(self):
+        # over a[n, c, d] with 0-based indices, where c = C + s for stack s
+        (S, C, N) = (self.S, self.C, self.N)
+        a = var_index(self.a, (N, C + S, C))
+        (n, c, d) = grid(N, C, C)
+        # the rows of (5) and (6) by (n, s, c, d), for blocks c != d in the bay at stage n > 1, and of (12) by (n, c, d), for
+        # blocks c != d below block n
+        pairs = ((c >= n) & (d >= n) & (c != d) & (n >= 1))[:, None]
+        later = ((c > n) & (d > n) & (c != d))[:-1]
+        # (5) is symmetric in c and d
+        halves = pairs & (c < d)[:, None]
+
+        def split(values):
+            v = gather(a, values)
+            return v[:, :C], v[:, C:]
+
+        def separate5(values, tol):
+            (above, on) = split(values)
+            lhs = (above + above.transpose(0, 2, 1))[:, None] - on[:, :, :, None] - on[:, :, None, :]
+            violated = np.argwhere((lhs < -1 - tol) & halves).tolist()
+            return [row([(a[n, c, d], 1), (a[n, d, c], 1), (a[n, C + s, c], -1), (a[n, C + s, d], -1)], 'G', -1) for n, s, c, d in violated]
+
+        def separate6(values, tol):
+            (above, on) = split(values)
+            lhs = (above + above.transpose(0, 2, 1))[:, None] + on[:, :, :, None] + on.sum(axis=1)[:, None, None, :] - on[:, :, None, :]
+            violated = np.argwhere((lhs > 2 + tol) & pairs).tolist()
+            return [row([(a[n, c, d], 1), (a[n, d, c], 1), (a[n, C + s, c], 1), (np.delete(a[n, C:, d], s), 1)], 'L', 2) for n, s, c, d in violated]
+
+        def separate12(values, tol):
+            (above, _) = split(values)
+            top = above[np.arange(N), np.arange(N)]
+            lhs = top[:-1, :, None] + top[:-1, None, :] + above[:-1] + above[1:]
+            violated = np.argwhere((lhs > 3 + tol) & later).tolist()
+            return [row([(a[n, n, c], 1), (a[n, n, d], 1), (a[n, c, d], 1), (a[n + 1, c, d], 1)], 'L', 3) for n, c, d in violated]
+
+        for separate in (separate5, separate6, separate12):
+            add_lazy(self.model, separate)
+
+    def add_mip_start(self, bay, moves):
+        # stage n begins with the configuration before block n is dug out (see warm_start.py); from stage N on, only the
+        # blocks above a smaller block are counted, each with one relocation
+        (C, N) = (self.C, self.N)
+        (a, b) = ({}, {})
+        for n, (conf, _, (c, _)) in zip(irange(1, N), stages(bay, moves)):
+            assert c == n
+            for s, stack in enumerate(conf, 1):
+                a.update(((n, C + s, d), 1) for d in stack)
+                a.update(((n, stack[u], stack[v]), 1) for v in range(len(stack)) for u in range(v))
+                if n == N:
+                    b.update((stack[v], 1) for v in range(len(stack)) if min(stack[:v + 1]) < stack[v])
+        return add_mip_start(self.model, (self.a, a), (self.b, b))
 
     def get_bays(self):
         bays = {}
@@ -0,0 +1,173 @@
+# Copyright (c) 2021 Bo Jin <jinbostar@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+from bay import Bay
+from bay_state import BayState, min_max
+
+# All heuristics below solve the restricted CRP (only blocks above the target are relocated), so their relocation counts
+# are upper bounds for both the restricted and the unrestricted CRP, with distinct or duplicate priorities. They consume
+# the given BayState, return the number of relocations and leave the plan in state.moves. Their effort is counted in
+# simulated retrievals (every rollout of a destination charges the retrievals it simulates), not in time, so that a plan
+# only depends on the bay; once the effort is spent, the remaining decisions fall back to the min-max rule.
+
+# default effort of best_plan, roughly 100 ms
+EFFORT = 10000
+
+
+class Effort:
+    # a budget of simulated retrievals, shared by the heuristics of best_plan
+    def __init__(self, limit):
+        self.left = limit
+
+    def spend(self, n):
+        self.left -= n
+
+    @property
+    def spent(self):
+        return self.left <= 0
+
+
+def run(state, choose_dest, effort=None):
+    while state.n_blocks > 0:
+        (s_target, t_target) = state.target()
+        while t_target < state.h[s_target] - 1:
+            if effort is not None and effort.spent:
+                s_dest = state.min_max_dest(s_target)
+            else:
+                s_dest = choose_dest(state, s_target)
+            state.relocate(s_target, s_dest)
+        state.retrieve(s_target)
+    return state.n_relos
+
+
+def open_stacks(state, src):
+    return [s for s in range(state.n_stacks) if s != src and state.h[s] < state.n_tiers]
+
+
+def min_max_la(state, depth=3, effort=None):
+    # min-max where ties between destinations are broken by the next smallest priorities in each stack: a good move
+    # prefers the tightest fit, a bad move prefers the stack whose blocks are retrieved the latest
+    def choose_dest(state, src):
+        p = state.stacks[src][-1]
+        qlt = state.qlt
+        candidates = open_stacks(state, src)
+        good = [s for s in candidates if p <= qlt[s][-1]]
+        if good:
+            return min(good, key=lambda s: (qlt[s][-1], sorted(state.stacks[s])[:depth], state.h[s]))
+        return max(candidates, key=lambda s: (qlt[s][-1], sorted(state.stacks[s])[:depth], -state.h[s]))
+
+    return run(state, choose_dest, effort)
+
+
+def lookahead(state, n_lookahead=4, effort=None):
+    # look-ahead heuristic in the spirit of Petering & Hussein (2013): every destination of the blocking block is scored
+    # by the relocations the min-max rule needs to retrieve the next n_lookahead targets after the move
+    def choose_dest(state, src):
+        candidates = open_stacks(state, src)
+        if effort is not None:
+            effort.spend(len(candidates) * min(n_lookahead, state.n_blocks))
+        return min(candidates, key=lambda s: truncated_min_max(state, src, s, n_lookahead))
+
+    return run(state, choose_dest, effort)
+
+
+def truncated_min_max(state, src, dst, n_retrievals):
+    state = state.copy()
+    state.relocate(src, dst)
+    n_relos = state.n_relos
+    for _ in range(n_retrievals):
+        if state.n_blocks == 0:
+            break
+        (s_target, t_target) = state.target()
+        while t_target < state.h[s_target] - 1:
+            state.relocate(s_target, state.min_max_dest(s_target))
+        state.retrieve(s_target)
+    # prefer moves after which the remaining blocks are still well placed
+    return state.n_relos - n_relos, blocking(state)
+
+
+def blocking(state):
+    return sum(1 for s in range(state.n_stacks) for t in range(state.h[s]) if state.stacks[s][t] > state.qlt[s][t + 1])
+
+
+def pilot(state, effort=None):
+    # rollout: every destination of the blocking block is scored by completing the plan with the min-max rule
+    def choose_dest(state, src):
+        candidates = open_stacks(state, src)
+        if effort is not None:
+            effort.spend(len(candidates) * state.n_blocks)
+        best = None
+        for s in candidates:
+            rollout = state.copy()
+            rollout.relocate(src, s)
+            n_relos = min_max(rollout)
+            if best is None or n_relos < best[0]:
+                best = (n_relos, s)
+        return best[1]
+
+    return run(state, choose_dest, effort)
+
+
+def best_plan(bay, effort=EFFORT):
+    # returns the finished BayState with the fewest relocations (its plan is in state.moves), within effort simulated
+    # retrievals, so the same bay always gets the same plan
+    effort = Effort(effort)
+    initial = BayState.from_bay(bay)
+    lb = restricted_lower_bound(bay)
+
+    best = initial.copy()
+    min_max(best)
+    for heuristic in [min_max_la, lookahead, pilot]:
+        if best.n_relos <= lb or effort.spent:
+            break
+        state = initial.copy()
+        heuristic(state, effort=effort)
+        if state.n_relos < best.n_relos:
+            best = state
+    return best
+
+
+def best_upper_bound(bay, effort=EFFORT):
+    return best_plan(bay, effort).n_relos
+
+
+def restricted_lower_bound(bay):
+    # a lower bound for the restricted CRP with distinct or duplicate priorities (checked in tests/test_bounds.py)
+    (lb, lb_plus) = bay.compute_lb_lu()
+    return max(bay.compute_lb_kh(), sum(lb.values()) + sum(lb_plus.values()))
+
+
+def bracket(bay, effort=EFFORT, restricted=True):
+    # (lb, ub) on the optimal number of relocations; when lb == ub, ub is optimal and no model has to be solved
+    lb = restricted_lower_bound(bay) if restricted else bay.compute_lb_kh()
+    return lb, best_upper_bound(bay, effort)
+
+
+def test():
+    conf = [[5, 3, 6], [4, 2], [7, 1]]
+    bay = Bay(3, 4, conf)
+    print('bay')
+    print(bay)
+    print()
+    for heuristic in [min_max, min_max_la, lookahead, pilot]:
+        state = BayState.from_bay(bay)
+        print('{}: n_relos = {}'.format(heuristic.__name__, heuristic(state)))
+    print('best_upper_bound: n_relos = {}'.format(best_upper_bound(bay)))
+    print('bracket: (lb, ub) = {}'.format(bracket(bay)))
+
+
+if __name__ == '__main__':
+    test()
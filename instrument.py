@@ -0,0 +1,172 @@
+# Copyright (c) 2021 Bo Jin <jinbostar@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import json
+import linecache
+import os
+import sys
+from time import perf_counter
+
+from backend import new_model
+
+# Build instrumentation: instrument(model) wraps the methods by which the formulations add variables, the objective and
+# constraints to a model (of docplex, backend.py or stream.py, and the CPLEX rows of bulk.py), so that every family of a
+# build is recorded under the comment that leads it in the formulation (e.g., '(6a)' or 'pre-processing'), or under the
+# name of its variables. A record holds the wall time and the growth of the resident memory since the previous record
+# (so that the code preparing a family, such as the NumPy assembly of bulk.py, counts towards it), and the variables,
+# rows and non-zeros that the family adds; the records of a family are merged. The report is model.build_report.
+
+# the modules between a formulation and its model, which are skipped to find the line that adds a family
+HELPERS = {'backend.py', 'bulk.py', 'instrument.py', 'prune.py', 'stream.py'}
+# the methods of the models that are wrapped, by kind of record
+METHODS = {
+    'variables': ['binary_var_dict', 'integer_var_dict', 'continuous_var_dict'],
+    'objective': ['minimize', 'maximize'],
+    'constraints': ['add', 'add_constraint', 'add_constraints', 'add_rows'],
+}
+# (file, line) -> family
+NAMES = {}
+
+
+class BuildReport:
+    def __init__(self):
+        self.records = {}
+        self.closed = False
+        self.last = (perf_counter(), rss())
+
+    def add(self, kind, family, before, after):
+        # a call that took the model from the counts before to the counts after
+        (now, memory) = (perf_counter(), rss())
+        record = self.records.setdefault((kind, family), {'family': family, 'kind': kind, 'calls': 0, 'time': 0.0, 'memory': 0, 'variables': 0, 'rows': 0, 'nonzeros': 0})
+        record['calls'] += 1
+        record['time'] += now - self.last[0]
+        record['memory'] += memory - self.last[1]
+        for key, b, a in zip(['variables', 'rows', 'nonzeros'], before, after):
+            record[key] = None if a is None or record[key] is None else record[key] + a - b
+        self.last = (now, memory)
+
+    def close(self):
+        # stops recording, e.g., before the solve, in which lazy.py adds rows
+        self.closed = True
+
+    def to_list(self):
+        # the records in the order of the build
+        return list(self.records.values())
+
+    def write(self, out=sys.stdout, **fields):
+        # one JSON record per family, with fields (e.g., the formulation and the bay) added to each
+        for record in self.to_list():
+            out.write(json.dumps(dict(fields, **record)) + '\n')
+        out.flush()
+
+
+def rss():
+    # the resident memory in bytes (on Linux), or else the peak resident memory
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+
+
+def counts(model):
+    # (variables, rows, non-zeros) of the model, from CPLEX for docplex (which also holds the rows of bulk.py), and the
+    # rows built by a model of backend.py (or size.py); no non-zeros for a stream.StreamModel, which writes them out
+    if hasattr(model, 'get_cplex'):
+        cpx = model.get_cplex()
+        return cpx.variables.get_num(), cpx.linear_constraints.get_num(), cpx.linear_constraints.get_num_nonzeros()
+    return model.number_of_variables, getattr(model, 'number_of_rows', model.number_of_constraints), getattr(model, 'number_of_nonzeros', None)
+
+
+def family(frame):
+    # the top line of the comments that lead the statement of the first frame outside the helpers, or the function of
+    # a statement without one
+    while os.path.basename(frame.f_code.co_filename) in HELPERS:
+        frame = frame.f_back
+    key = (frame.f_code.co_filename, frame.f_lineno)
+    if key not in NAMES:
+        lines = linecache.getlines(key[0])
+        i = key[1] - 2
+        while i >= 0 and not lines[i].lstrip().startswith(('#', 'def ', 'class ')):
+            i -= 1
+        if i >= 0 and lines[i].lstrip().startswith('#'):
+            while i > 0 and lines[i - 1].lstrip().startswith('#'):
+                i -= 1
+            NAMES[key] = lines[i].strip().lstrip('#').strip()
+        else:
+            NAMES[key] = frame.f_code.co_name
+    return NAMES[key]
+
+
+def instrument(model=None):
+    # the model (or a new model of the backend) with its methods wrapped and an empty model.build_report
+    model = new_model(model)
+    report = model.build_report = BuildReport()
+    depth = [0]
+
+    def wrap(method, kind):
+        def wrapper(*args, **kwargs):
+            # only the outermost call is recorded (a model may add constraints by its own methods)
+            if depth[0] > 0 or report.closed:
+                return method(*args, **kwargs)
+            name = kwargs.get('name') if kind == 'variables' else kind if kind == 'objective' else None
+            name = name or family(sys._getframe(1))
+            before = counts(model)
+            depth[0] += 1
+            try:
+                return method(*args, **kwargs)
+            finally:
+                depth[0] -= 1
+                report.add(kind, name, before, counts(model))
+
+        return wrapper
+
+    for kind, methods in METHODS.items():
+        for method in methods:
+            if hasattr(model, method):
+                setattr(model, method, wrap(getattr(model, method), kind))
+    if hasattr(model, 'get_cplex'):
+        # the rows of bulk.py
+        lc = model.get_cplex().linear_constraints
+        lc.add = wrap(lc.add, 'constraints')
+    return model
+
+
+def build(cls, bay, model=None, **flags):
+    # an instance of the formulation cls (with its flags) built into an instrumented model, whose report is closed
+    model = instrument(model)
+    instance = cls(bay, model=model, **flags)
+    model.build_report.close()
+    return instance
+
+
+def test():
+    from benchmark.generator import random_bay
+    from zehendner2015.BRP_II_A import BRP_II_A
+
+    bay = random_bay(4, 4, 12, 0)
+    for bulk in [False, True]:
+        instance = build(BRP_II_A, bay, bulk=bulk)
+        records = sorted(instance.model.build_report.to_list(), key=lambda record: -record['time'])
+        print('BRP_II_A, bulk = {}'.format(bulk))
+        for record in records:
+            print('{:>20} {:8.3f} s {:8} rows {:9} non-zeros {:8.1f} MB'.format(record['family'], record['time'], record['rows'], record['nonzeros'] or 0, record['memory'] / 2 ** 20))
+    instance.model.build_report.write(model='BRP_II_A', bulk=True)
+
+
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,113 @@
+# Copyright (c) 2021 Bo Jin <jinbostar@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import numpy as np
+
+# Lazy constraint families: a family is not added to the model but separated by a function separate(values, tol) of
+# the values of all columns (as var.index) that returns the rows violated by more than tol as (cols, vals, sense, rhs),
+# as bulk.Rows posts them. With CPLEX, the separators run in a lazy-constraint callback at integer solutions and, for
+# families with cuts, in a user-cut callback at fractional nodes; backend.HighsModel solves, adds the violated rows and
+# solves again until no row is violated. The separators below take the column arrays of bulk.var_index (0-based).
+LAZY_TOL = 1e-6
+CUT_TOL = 1e-3
+
+
+def add_lazy(model, separate, cuts=True):
+    if not hasattr(model, 'lazy'):
+        register_callbacks(model)
+    model.lazy.append((separate, cuts))
+
+
+def register_callbacks(model):
+    assert hasattr(model, 'get_cplex'), 'lazy constraints need CPLEX or backend.HighsModel'
+    from cplex import SparsePair
+    from cplex.callbacks import LazyConstraintCallback, UserCutCallback
+
+    class Lazy(LazyConstraintCallback):
+        def __call__(self):
+            for (cols, vals, sense, rhs) in separate_all(self.separators, self.get_values(), LAZY_TOL):
+                self.add(constraint=SparsePair(cols, vals), sense=sense, rhs=rhs)
+
+    class Cuts(UserCutCallback):
+        def __call__(self):
+            for (cols, vals, sense, rhs) in separate_all(self.separators, self.get_values(), CUT_TOL, cuts=True):
+                self.add(cut=SparsePair(cols, vals), sense=sense, rhs=rhs, use=self.use_cut.purge)
+
+    model.lazy = []
+    for cls in (Lazy, Cuts):
+        model.register_callback(cls).separators = model.lazy
+    # dual reductions may cut off solutions that only the lazy rows exclude
+    model.parameters.preprocessing.reduce = 1
+
+
+def separate_all(separators, values, tol, cuts=False):
+    values = np.asarray(values, dtype=float)
+    return [row for (separate, with_cuts) in separators if with_cuts or not cuts for row in separate(values, tol)]
+
+
+def gather(index, values):
+    # the values of the columns of an index array of bulk.var_index, 0 for absent keys
+    return np.where(index >= 0, values[index], 0)
+
+
+def greater(array, axis):
+    # the sums over the indices above each index along axis
+    return np.flip(np.cumsum(np.flip(array, axis), axis), axis) - array
+
+
+def less(array, axis):
+    # the sums over the indices below each index along axis
+    return np.cumsum(array, axis) - array
+
+
+def row(parts, sense, rhs):
+    # a row of (column array, coefficient) parts, without absent columns
+    cols = np.concatenate([np.ravel(c) for c, _ in parts])
+    vals = np.concatenate([np.full(np.size(c), v, dtype=float) for c, v in parts])
+    keep = cols >= 0
+    return cols[keep].tolist(), vals[keep].tolist(), sense, rhs
+
+
+def relocation_rows(x, coef, rhs):
+    # (8) of Caserta et al. (2012), (9) of BRP2c: for i, j, k, l and t < N - 1,
+    # coef * sum_n x[i, j, k, l, n, t] + sum_{n, jj > j, ll > l} x[i, jj, k, ll, n, t] <= rhs
+    def separate(values, tol):
+        s = gather(x, values).sum(axis=4)[..., :-1]
+        lhs = coef * s + greater(greater(s, 1), 3)
+        return [row([(x[i, j, k, l, :, t], coef), (x[i, j + 1:, k, l + 1:, :, t], 1)], 'L', rhs) for i, j, k, l, t in np.argwhere(lhs > rhs + tol).tolist()]
+    return separate
+
+
+def retrieval_rows(b, x, fixed):
+    # (9) of Caserta et al. (2012), (7) of BRP2c, with H - 1 = rhs: if fixed, for i, j and t,
+    # (H - 1) * b[i, j, t, t] + sum_{ii != i, jj < W} x[ii, jj, ., ., ., t] + sum_{jj < j} x[i, jj, ., ., ., t] <= H - 1
+    # (jj < W as in the models), otherwise for i and t,
+    # (H - 1) * sum_j b[i, j, t, t] + sum_{ii != i} x[ii, ., ., ., ., t] <= H - 1
+    (W, H) = b.shape[:2]
+    d = np.diagonal(b, axis1=2, axis2=3)
+
+    def separate(values, tol):
+        p = gather(x, values).sum(axis=(2, 3, 4))
+        q = gather(d, values)
+        if fixed:
+            others = p[:, :W].sum(axis=(0, 1)) - p[:, :W].sum(axis=1)
+            lhs = (H - 1) * q + others[:, None, :] + less(p, 1)
+            violated = np.argwhere(lhs > H - 1 + tol).tolist()
+            return [row([(d[i, j, t], H - 1), (x[:i, :W, ..., t], 1), (x[i + 1:, :W, ..., t], 1), (x[i, :j, ..., t], 1)], 'L', H - 1) for i, j, t in violated]
+        lhs = (H - 1) * q.sum(axis=1) + p.sum(axis=(0, 1)) - p.sum(axis=1)
+        violated = np.argwhere(lhs > H - 1 + tol).tolist()
+        return [row([(d[i, :, t], H - 1), (x[:i, ..., t], 1), (x[i + 1:, ..., t], 1)], 'L', H - 1) for i, t in violated]
+    return separate
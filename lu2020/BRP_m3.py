@@ -17,20 +17,25 @@
 from copy import copy
 from itertools import product, groupby
 
-from docplex.mp.model import Model
-
+from backend import new_model
 from bay import Bay
 from common import irange
+from extract import conf_moves
+from heuristics import best_plan
+from size import Size
+from warm_start import add_mip_start, replay
 
 
 class BRP_m3:
-    def __init__(self, bay, bug_fixed=True, restricted=False):
-        self.model = model = Model()
+    def __init__(self, bay, bug_fixed=True, restricted=False, horizon=None, model=None):
+        self.model = model = new_model(model)
 
         self.S = S = bay.n_stacks
         self.H = H = bay.n_tiers
         self.B = B = bay.n_blocks
-        self.T = T = bay.brp_min_max()
+        # the horizon fits the best heuristic plan, which add_mip_start takes as a start, or horizon relocations
+        self.plan = plan = best_plan(bay)
+        self.T = T = plan.n_relos if horizon is None else horizon
         self.stack = stack = dict(zip(irange(1, B), (s + 1 for s in range(bay.n_stacks) for _ in range(bay.h[s]))))
         self.tier = tier = dict(zip(irange(1, B), (t + 1 for s in range(bay.n_stacks) for t in range(bay.h[s]))))
         self.p = p = dict(zip(irange(1, B), (bay.pri[s][t] for s in range(bay.n_stacks) for t in range(bay.h[s]))))
@@ -107,17 +112,114 @@ class BRP_m3:
             # (yout7)
             model.add_constraints(yout[t, t, B + 1] == 0 for i, t in product(irange(1, B), irange(1, T)))
 
+    @staticmethod
+    def estimate_size(bay, bug_fixed=True, restricted=False, horizon=None, model=None):
+        # the size of the model, counted from the index sets (see size.py)
+        (S, B) = (bay.n_stacks, bay.n_blocks)
+        T = best_plan(bay).n_relos if horizon is None else horizon
+        p = [bay.pri[s][t] for s in range(S) for t in range(bay.h[s])]
+        # the blocks with a block on top, and the number of blocks j != i with p[j] >= p[i] (and the ground) per block i
+        covered = [bay.h[s] > t + 1 for s in range(S) for t in range(bay.h[s])]
+        above = [p[i + 1] if covered[i] else None for i in range(B)]
+        zs = [sum(1 for j in range(B) if j != i and p[j] >= p[i]) + 1 for i in range(B)]
+        Z = sum(zs)
+        groups = {}
+        for i in range(B):
+            groups.setdefault(p[i], []).append(i)
+        G1 = groups.get(1, [])
+        L = bay.compute_lb_kh()
+        size = Size(model)
+        size.add_variables('x', (T + 1) * B * B)
+        size.add_variables('yout', T * B * B)
+        size.add_variables('yin', T * B * B)
+        size.add_variables('z', (T + 1) * Z)
+        size.add_variables('u', T * B)
+        if bug_fixed:
+            size.add_family('(x1)', B * B, B * B + Z)
+        else:
+            size.add_family('(x1)', 2 * B * B, 2 * B * B)
+        size.add_family('(x2*)', T * (B * B - Z), T * (B * B - Z) * 4)
+        size.add_family('(x3*)', T * Z, T * Z * 5)
+        size.add_family('(x4)', B * B, B * B)
+        size.add_family('(yout1)', L, L * B * B)
+        n = max(0, T - max(2, L + 1) + 1)
+        size.add_family('(yout2)', n, n * 2 * B * B)
+        size.add_family('(yout4)', B * T, B * T * (3 * B - 1))
+        size.add_family('(yin1)', B * T, B * T * 2 * B)
+        size.add_family('(yin2)', B * T, B * T * (3 * B - 2))
+        size.add_family('(yin3)', T, T * 2 * B)
+        size.add_family('(yin4)', B * T, B * T * (3 * B - 2))
+        size.add_family('(yin5)', T, T * 2 * B)
+        # (z3*) sums over the periods up to t, with no terms on the left without blocks of the priority before
+        periods = irange(0, T) if bug_fixed else irange(1, T)
+        size.add_rows('(z3*)', ((t + int(bug_fixed)) * ((zs[i] if groups.get(p[i] - 1) else 0) + sum(zs[k] for k in groups.get(p[i] - 1, []))) for i in range(B) if p[i] >= 2 for t in periods))
+        size.add_family('(u1)', T * B * (B - 1), T * B * (B - 1) * 5)
+        size.add_rows('(e1*)', (1 + int(t > 0) + int(above[k] == 1) for k in G1 if covered[k] for t in irange(0, T)))
+        size.add_rows('(e2*)', (T + (T + 1) * int(above[k] == 1) for k in G1 if covered[k]))
+        size.add_family('(e3*)', len(G1) * (B - 1) * T, len(G1) * (B - 1) * T)
+        n = sum(B - 1 - int(covered[k]) for k in G1)
+        size.add_family('(e4*)', n * (2 * T + 1), n * (2 * T + 1))
+        size.add_family('(e5*)', len(G1) * B * T * 2, len(G1) * B * T * 2)
+        size.add_family('(e6*)', len(G1) * (B - 1) * (T + 1) * 2, len(G1) * (B - 1) * (T + 1) * 2)
+        size.add_family('(e7*)', len(G1) * T, len(G1) * T)
+        if restricted:
+            size.add_family('(yout6)', B * max(T - 1, 0), max(T - 1, 0) * ((2 * B - 1) * B + Z))
+            size.add_family('(yout7)', B * T, B * T)
+        return size
+
+    def add_mip_start(self, bay, moves):
+        # relocation t at time t (yout, yin), followed by the retrievals (z) up to the next relocation, and those before
+        # the first relocation at time 0; x[t] relates every block to the one below it (B + 1 for the ground) after time
+        # t, and u[t] holds the tiers after relocation t, the last tier for retrieved blocks (see warm_start.py)
+        B = self.B
+        ids = [[] for _ in range(self.S)]
+        for i in irange(1, B):
+            ids[self.stack[i] - 1].append(i)
+        tier = copy(self.tier)
+
+        def below(s):
+            return ids[s - 1][-1] if ids[s - 1] else B + 1
+
+        def relation():
+            return {(j, stack[h - 1] if h > 0 else B + 1): 1 for stack in ids for h, j in enumerate(stack)}
+
+        (yout, yin, z, u) = ({}, {}, {}, {})
+        relations = {0: relation()}
+        t = 0
+        for g, (s, _), after, _ in replay(bay, moves):
+            i = ids[s - 1].pop()
+            assert self.p[i] == g
+            if after is None:
+                z[t, i, below(s)] = 1
+            else:
+                t += 1
+                assert t <= self.T, 'the plan does not fit into the horizon'
+                yout[t, i, below(s)] = 1
+                yin[t, i, below(after[0])] = 1
+                ids[after[0] - 1].append(i)
+                tier[i] = after[1]
+                u.update(((t, j), tier[j]) for j in irange(1, B))
+            relations[t] = relation()
+        u.update(((tt, j), tier[j]) for tt in irange(t + 1, self.T) for j in irange(1, B))
+        x = {(t, i, j): 1 for t, rel in relations.items() for i, j in rel}
+        return add_mip_start(self.model, (self.x, x), (self.yout, yout), (self.yin, yin), (self.z, z), (self.u, u))
+
+    def get_moves(self):
+        # the plan as (src, dst, block, period), decoded from the configurations (see extract.conf_moves): relocation t
+        # in period t, then the retrievals of period t
+        (before, after) = self.get_bays()
+        return conf_moves((t, bays[t]) for t in irange(0, self.T) for bays in (before, after))
+
     def get_bays(self):
         stack = copy(self.stack)
         tier = copy(self.tier)
-        h = {s: 0 for s in irange(1, self.S)}
-        for i in irange(1, self.B):
-            h[stack[i]] += 1
 
         before = {}
         after = {}
         for t in irange(0, self.T):
             if t != 0:
+                # a block relocated to the ground goes to the first stack that is empty after the retrievals of t - 1
+                h = {s: after[t - 1].h[s - 1] for s in irange(1, self.S)}
                 for i, j in product(irange(1, self.B), irange(1, self.B + 1)):
                     if j != i and round(self.yin[t, i, j].solution_value) == 1:
                         if j <= self.B:
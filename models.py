@@ -0,0 +1,99 @@
+# Copyright (c) 2021 Bo Jin <jinbostar@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+from importlib import import_module
+
+# name -> (module, class); the modules are only imported when a formulation is loaded, so that docplex is not needed to
+# list them
+FORMULATIONS = {
+    'BRP_I': ('caserta2012.BRP_I', 'BRP_I'),
+    'BRP_II': ('caserta2012.BRP_II', 'BRP_II'),
+    'BRP_m1': ('demelodasilva2018.BRP_m1', 'BRP_m1'),
+    'BRP_m2': ('demelodasilva2018.BRP_m2', 'BRP_m2'),
+    'BRP2c': ('eskandari2015.BRP2c', 'BRP2c'),
+    'BRP2ci': ('eskandari2015.BRP2ci', 'BRP2ci'),
+    'BRP_II_X': ('expositoizquierdo2015.BRP_II_X', 'BRP_II_X'),
+    'CRP_I': ('galle2018.CRP_I', 'CRP_I'),
+    'BRP_m3': ('lu2020.BRP_m3', 'BRP_m3'),
+    'BRP_III': ('petering2013.BRP_III', 'BRP_III'),
+    'ILP': ('tang2015.ILP', 'MRIP'),
+    'MRIP': ('wan2009.MRIP', 'MRIP'),
+    'BRP_II_A': ('zehendner2015.BRP_II_A', 'BRP_II_A'),
+    'BRP_II_C': ('zehendner2015.BRP_II_C', 'BRP_II_C'),
+    'RestrictedSearch': ('search', 'RestrictedSearch'),
+}
+
+# name -> (restricted, priorities, counts) of the problem that a formulation solves without flags: whether the CRP is
+# restricted, whether the priorities must be 'full' (1..n_blocks), 'distinct' or may be 'duplicate', and whether the
+# objective value is the number of relocations
+PROBLEMS = {
+    'BRP_I': (False, 'full', False),
+    'BRP_II': (True, 'full', True),
+    'BRP_m1': (False, 'duplicate', True),
+    'BRP_m2': (False, 'duplicate', True),
+    'BRP2c': (True, 'full', True),
+    'BRP2ci': (True, 'full', True),
+    'BRP_II_X': (True, 'full', True),
+    'CRP_I': (True, 'full', True),
+    'BRP_m3': (False, 'duplicate', True),
+    'BRP_III': (False, 'full', False),
+    'ILP': (True, 'full', True),
+    'MRIP': (True, 'full', True),
+    'BRP_II_A': (True, 'full', True),
+    'BRP_II_C': (True, 'full', True),
+    'RestrictedSearch': (True, 'duplicate', True),
+}
+
+# name -> alternatives (name, flags) with smaller models, in order of preference, to which size.fit downgrades a
+# formulation that does not fit into a memory budget; flags of the same formulation are added to its own
+SMALLER = {
+    'BRP_I': [('BRP_III', {})],
+    'BRP_II': [('BRP_II', {'prune': True}), ('BRP_II_A', {}), ('CRP_I', {})],
+    'BRP_II_C': [('BRP_II_A', {}), ('CRP_I', {})],
+    'BRP2c': [('BRP_II', {'prune': True}), ('BRP_II_A', {}), ('CRP_I', {})],
+    'BRP2ci': [('BRP_II', {'prune': True}), ('BRP_II_A', {}), ('CRP_I', {})],
+    'BRP_II_X': [('BRP_II_A', {}), ('CRP_I', {})],
+    'BRP_II_A': [('CRP_I', {})],
+    'BRP_m1': [('BRP_m3', {})],
+    'BRP_m2': [('BRP_m3', {})],
+}
+
+
+def load(name):
+    (module, cls) = FORMULATIONS[name]
+    return getattr(import_module(module), cls)
+
+
+def problem(name, flags):
+    # PROBLEMS of a formulation with its flags
+    (restricted, priorities, counts) = PROBLEMS[name]
+    if name == 'BRP_m1' and flags.get('restricted_distinct'):
+        (restricted, priorities) = (True, 'distinct')
+    elif name == 'BRP_m2' and (flags.get('restricted') or flags.get('distinct')):
+        (restricted, priorities) = (bool(flags.get('restricted')), 'distinct')
+    elif name == 'BRP_m3' and flags.get('restricted'):
+        restricted = True
+    return restricted, priorities, counts
+
+
+def accepts(name, flags, bay, restricted):
+    # whether a formulation with its flags solves the restricted (or unrestricted) CRP for the priorities of a bay
+    (problem_restricted, priorities, _) = problem(name, flags)
+    if problem_restricted != restricted:
+        return False
+    if priorities == 'full':
+        return sorted(bay.values) == list(range(1, bay.n_blocks + 1))
+    return priorities == 'duplicate' or len(set(bay.values)) == bay.n_blocks
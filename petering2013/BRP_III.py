@@ -16,21 +16,26 @@
 
 from itertools import product
 
-from docplex.mp.model import Model
-
+from backend import new_model
 from bay import Bay
 from common import irange
+from extract import conf_moves
+from heuristics import best_plan
+from size import Size
+from warm_start import add_mip_start, replay
 
 
 class BRP_III:
-    def __init__(self, bay):
+    def __init__(self, bay, horizon=None, model=None):
         bay.validate_full_distinct()
-        self.model = model = Model()
+        self.model = model = new_model(model)
 
         self.S = S = bay.n_stacks
         self.mxHeight = mxHeight = bay.n_tiers
         self.C = C = bay.n_blocks
-        self.W = W = C + bay.brp_min_max()
+        # the horizon fits the best heuristic plan, which add_mip_start takes as a start, or horizon relocations
+        self.plan = plan = best_plan(bay)
+        self.W = W = C + (plan.n_relos if horizon is None else horizon)
 
         self.X3 = X3 = model.continuous_var_dict(product(irange(1, C), irange(1, S), irange(1, W + 1)), lb=0, ub=1, name='X')
         self.B2 = B2 = model.continuous_var_dict(product(irange(1, C), irange(1, W + 1)), lb=0, ub=mxHeight, name='B')
@@ -134,6 +139,79 @@ class BRP_III:
         # (29c)
         model.add_constraints(F2[c, t] >= P2[s, t] + X3[c, s, t + 1] - 1 for c, s, t in product(irange(1, C), irange(1, S), irange(1, W)))
 
+    @staticmethod
+    def estimate_size(bay, horizon=None, model=None):
+        # the size of the model, counted from the index sets (see size.py)
+        (S, C) = (bay.n_stacks, bay.n_blocks)
+        W = C + (best_plan(bay).n_relos if horizon is None else horizon)
+        size = Size(model)
+        size.add_variables('X', C * S * (W + 1))
+        size.add_variables('B', C * (W + 1))
+        for name in ['M', 'C', 'F', 'T']:
+            size.add_variables(name, C * W)
+        for name in ['R', 'P']:
+            size.add_variables(name, S * W)
+            size.add_variables(name, C * S * W)
+        for name in ['1', '2']:
+            size.add_family('({}a)'.format(name), C * S * W, C * S * W * 2)
+            size.add_family('({}b)'.format(name), C * S * W, C * S * W * 2)
+            size.add_family('({}c)'.format(name), C * S * W, C * S * W * 3)
+            size.add_family('({}e)'.format(name), S * W, S * W * (C + 1))
+            size.add_family('({}f)'.format(name), C * W, C * W * (S + 1))
+        size.add_family('(3a)', C * S, C * S)
+        size.add_family('(3b)', C * S * W, C * S * W * 4)
+        size.add_family('(4a)', C, C)
+        size.add_family('(4b)', C * W, C * W * 4)
+        size.add_family('(5)', C * (W + 1), C * (W + 1) * S)
+        size.add_family('(6)', S * (W + 1), S * (W + 1) * C)
+        size.add_family('(10)', C, C * W)
+        size.add_family('(11)', W, W * C)
+        size.add_family('(12)', C, C * C)
+        size.add_family('(13)', W, W * C)
+        size.add_family('(14)', W, W * C)
+        size.add_family('(15)', C, C * 2 * W)
+        size.add_family('(16)', W, W * C)
+        size.add_family('(17)', C, C * W)
+        size.add_family('(18)', C - 1, (C - 1) * 2 * W)
+        size.add_family('(19)', W, W * S)
+        size.add_family('(20)', C, C * S)
+        size.add_family('(21)', W, W * 2 * S)
+        size.add_family('(22)', S * W, S * W * 2)
+        size.add_family('(23)', C * W, C * W * 2 * S)
+        size.add_family('(24)', C * S * W, C * S * W * 2)
+        size.add_family('(25)', C * W, C * W * 2)
+        size.add_family('(26)', C * W, C * W * 2)
+        size.add_family('(27)', C * W, C * W * (1 + 2 * S))
+        for name in ['(28a)', '(28b)', '(28c)', '(29a)', '(29b)', '(29c)']:
+            size.add_family(name, C * S * W, C * S * W * 3)
+        return size
+
+    def add_mip_start(self, bay, moves):
+        # one move per time step; X3 and B2 (1 for the top block) describe the configuration at the start of step t
+        # (see warm_start.py)
+        conf = [bay.pri[s][:bay.h[s]] for s in range(self.S)]
+        (X3, B2, M2, C2, F2, T2, R2, P2, R3, P3) = ({}, {}, {}, {}, {}, {}, {}, {}, {}, {})
+        X3.update(((c, s, 1), 1) for s, stack in enumerate(conf, 1) for c in stack)
+        B2.update(((c, 1), len(stack) - h) for stack in conf for h, c in enumerate(stack))
+        for t, (c, (s, _), after, state) in enumerate(replay(bay, moves), 1):
+            assert t <= self.W, 'the plan does not fit into the horizon'
+            (M2[c, t], R2[s, t], R3[c, s, t]) = (1, 1, 1)
+            C2.update(((d, t), 1) for d in conf[s - 1])
+            conf = state.conf()
+            if after is None:
+                T2[c, t] = 1
+            else:
+                (P2[after[0], t], P3[c, after[0], t]) = (1, 1)
+                F2.update(((d, t), 1) for d in conf[after[0] - 1])
+            X3.update(((d, r, t + 1), 1) for r, stack in enumerate(conf, 1) for d in stack)
+            B2.update(((d, t + 1), len(stack) - h) for stack in conf for h, d in enumerate(stack))
+        return add_mip_start(self.model, (self.X3, X3), (self.B2, B2), (self.M2, M2), (self.C2, C2), (self.F2, F2), (self.T2, T2), (self.R2, R2), (self.P2, P2), (self.R3, R3), (self.P3, P3))
+
+    def get_moves(self):
+        # the plan as (src, dst, block, period), decoded from the configurations (see extract.conf_moves)
+        bays = self.get_bays()
+        return conf_moves((t, bays[t]) for t in irange(1, self.W + 1))
+
     def get_bays(self):
         bays = {}
         for t in irange(1, self.W + 1):
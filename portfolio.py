@@ -0,0 +1,236 @@
+# Copyright (c) 2021 Bo Jin <jinbostar@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import os
+from math import ceil, floor
+from multiprocessing import get_context
+from queue import Empty
+from time import perf_counter
+
+from batch import thread_limits
+from bay_state import BayState, play
+from heuristics import best_plan, restricted_lower_bound
+from models import accepts, load, problem
+
+# A portfolio solves one bay with several formulations at once, one process each with an equal share of the threads.
+# The processes share the best number of relocations found so far (starting from the best heuristic plan) and the best
+# lower bound: with CPLEX, a member starts with the incumbent as an upper cutoff and, from an info callback, publishes
+# its incumbents and bounds and stops as soon as the shared bound reaches the shared incumbent. The first member that
+# proves optimality (or the shared bounds) ends the portfolio; the other members are stopped and terminated after a
+# grace period. Members whose objective is not the number of relocations (BRP_I, BRP_III) and RestrictedSearch only
+# report at the end, as do the members on backend.HighsModel, which has no callbacks. The plan of a member is replayed
+# (bay_state.play) before it is accepted, and a bound above the best plan is reported as a conflict.
+DEFAULT = {
+    True: ['CRP_I', 'BRP_II_A', ('BRP_m3', {'restricted': True}), 'RestrictedSearch'],
+    False: ['BRP_m3', 'BRP_m2', 'BRP_III'],
+}
+GRACE = 1.0
+
+
+def compatible(bay, formulations, restricted=True):
+    # the formulations (name, flags) that solve the restricted (or unrestricted) CRP for the priorities of the bay
+    formulations = [(f, {}) if isinstance(f, str) else f for f in formulations]
+    return [(name, flags) for (name, flags) in formulations if accepts(name, flags, bay, restricted)]
+
+
+def solve_portfolio(bay, formulations=None, restricted=True, time_limit=None, threads=None):
+    # a record with the best plan (moves as in BayState.moves) and its number of relocations, the best bound, whether
+    # it is optimal, the member that found it and the records of all members
+    formulations = compatible(bay, DEFAULT[restricted] if formulations is None else formulations, restricted)
+    assert formulations, 'no formulation solves this bay'
+    threads = (os.cpu_count() or 1) if threads is None else threads
+    start = perf_counter()
+
+    plan = best_plan(bay)
+    best = {'model': 'heuristic', 'flags': {}, 'n_relos': plan.n_relos, 'moves': plan.moves}
+    # spawned members, which start NumPy with the thread limits of their environment (see batch.thread_limits)
+    context = get_context('spawn')
+    incumbent = context.Value('d', plan.n_relos)
+    initial_bound = restricted_lower_bound(bay) if restricted else bay.compute_lb_kh()
+    bound = context.Value('d', initial_bound)
+    stop = context.Event()
+    results = context.Queue()
+    member_threads = max(1, threads // len(formulations))
+    members = [context.Process(target=run_member, args=(i, bay, name, flags, time_limit, member_threads, incumbent, bound, stop, results), daemon=True) for i, (name, flags) in enumerate(formulations)]
+    with thread_limits(member_threads):
+        for member in members:
+            member.start()
+
+    records = []
+    # index -> process of the members that have not reported yet
+    pending = dict(enumerate(members))
+    while pending and read(bound) < best['n_relos']:
+        if time_limit is not None and perf_counter() - start > time_limit + GRACE:
+            break
+        record = collect(results, pending, formulations)
+        if record is None:
+            continue
+        records.append(record)
+        if verify(bay, record, restricted) and record['n_relos'] < best['n_relos']:
+            best = record
+        if record.get('moves') is not None and record.get('status') == 'optimal' and record['n_relos'] == best['n_relos']:
+            break
+
+    # stop the other members, collect what they report within the grace period and terminate the rest
+    stop.set()
+    deadline = perf_counter() + GRACE
+    while pending and perf_counter() < deadline:
+        record = collect(results, pending, formulations)
+        if record is None:
+            continue
+        records.append(record)
+        if verify(bay, record, restricted) and record['n_relos'] < best['n_relos']:
+            best = record
+    shared_bound = read(bound)
+    for member in members:
+        member.terminate()
+        member.join()
+
+    # a bound above the best plan (which has been replayed) is wrong, as is the claim of the member (or of a member
+    # that shared it): the result is then a conflict, never optimal, with the bounds that are not above the plan
+    bounds = [(r, ceil(r['bound'] - 1e-6)) for r in records if r.get('bound') is not None]
+    conflicts = [{'model': r['model'], 'flags': r['flags']} for (r, b) in bounds if b > best['n_relos']]
+    conflict = bool(conflicts) or ceil(shared_bound - 1e-6) > best['n_relos']
+    if conflict:
+        lb = max([initial_bound] + [b for (r, b) in bounds if b <= best['n_relos']])
+    else:
+        lb = max([ceil(shared_bound - 1e-6)] + [b for (r, b) in bounds])
+    optimal = not conflict and (lb == best['n_relos'] or any(r.get('moves') is not None and r.get('status') == 'optimal' and r['n_relos'] == best['n_relos'] for r in records))
+    return {'model': best['model'], 'flags': best['flags'], 'n_relos': best['n_relos'], 'bound': best['n_relos'] if optimal else lb, 'optimal': optimal, 'conflict': conflicts if conflict else None, 'moves': best['moves'], 'time': perf_counter() - start, 'members': [{k: v for k, v in r.items() if k != 'moves'} for r in records]}
+
+
+def verify(bay, record, restricted):
+    # whether the record of a member has a plan that replays on the bay with its number of relocations (its moves are
+    # then the replayed plan); an invalid plan is dropped and recorded as an error
+    if record.get('moves') is None or record.get('n_relos') is None:
+        return False
+    state = BayState.from_bay(bay)
+    try:
+        n_relos = play(state, record['moves'], restricted)
+        if n_relos != record['n_relos']:
+            raise ValueError('{} relocations, not {}'.format(n_relos, record['n_relos']))
+    except ValueError as e:
+        record['error'] = 'invalid plan: {}'.format(e)
+        record['moves'] = None
+        return False
+    record['moves'] = state.moves
+    return True
+
+
+def read(value):
+    # a shared value, read without its lock, which a member may hold when it is killed
+    return value.get_obj().value
+
+
+def collect(results, pending, formulations):
+    # the next record of a member (within 0.1 s), an error record for a member that died without reporting (e.g.,
+    # killed for lack of memory), or None; the member is no longer pending
+    dead = [i for i, member in pending.items() if member.exitcode is not None]
+    try:
+        (i, record) = results.get(timeout=0.1)
+    except Empty:
+        # the record of a member that exited normally is in the queue before its exit code is set
+        if not dead:
+            return None
+        i = dead[0]
+        (name, flags) = formulations[i]
+        record = {'model': name, 'flags': flags, 'error': 'the member exited with code {} without a record'.format(pending[i].exitcode)}
+    del pending[i]
+    return record
+
+
+def run_member(index, bay, name, flags, time_limit, threads, incumbent, bound, stop, results):
+    record = {'model': name, 'flags': flags}
+    try:
+        counts = problem(name, flags)[2]
+        instance = load(name)(bay, **flags)
+        start = perf_counter()
+        if hasattr(instance, 'model'):
+            model = instance.model
+            model.parameters.threads = threads
+            if time_limit is not None:
+                model.parameters.timelimit = time_limit
+            # the model only admits plans with fewer relocations than cutoff (BRP_II_A, with its ub, and with CPLEX all
+            # models with the incumbent as an upper cutoff), so its bounds only hold up to cutoff
+            cutoff = getattr(instance, 'ub', None)
+            if counts and hasattr(model, 'get_cplex'):
+                cutoff = incumbent.value if cutoff is None else min(incumbent.value, cutoff)
+                model.parameters.mip.tolerances.uppercutoff = incumbent.value - 0.5
+                share(model, cutoff, incumbent, bound, stop)
+            solution = model.solve()
+            details = model.solve_details
+            record['status'] = details.status
+            record['n_relos'] = round(instance.get_n_relos()) if solution else None
+            record['bound'] = details.best_bound if solution and counts else None
+            if cutoff is not None and not solution and 'infeasible' in details.status:
+                # no plan below the cutoff
+                record['bound'] = cutoff
+            elif cutoff is not None and record['bound'] is not None:
+                record['bound'] = min(record['bound'], cutoff)
+            if record['bound'] is not None and record['n_relos'] is not None and record['n_relos'] <= ceil(record['bound'] - 1e-6):
+                record['status'] = 'optimal'
+            record['moves'] = [move[:3] for move in instance.get_moves()] if solution and hasattr(instance, 'get_moves') else None
+        else:
+            # RestrictedSearch
+            instance.time_limit = time_limit
+            record['status'] = 'optimal' if instance.solve() else 'feasible'
+            record['n_relos'] = instance.get_n_relos()
+            record['bound'] = instance.lb
+            record['moves'] = instance.get_moves()
+        record['solve_time'] = perf_counter() - start
+        if counts and record['bound'] is not None:
+            with bound.get_lock():
+                bound.value = max(bound.value, record['bound'])
+    except Exception as e:
+        record['error'] = '{}: {}'.format(type(e).__name__, e)
+    results.put((index, record))
+
+
+def share(model, cutoff, incumbent, bound, stop):
+    from cplex.callbacks import MIPInfoCallback
+
+    class Share(MIPInfoCallback):
+        def __call__(self):
+            if self.has_incumbent():
+                with self.incumbent.get_lock():
+                    self.incumbent.value = min(self.incumbent.value, round(self.get_incumbent_objective_value()))
+            # the bound holds for the plans below the cutoff
+            with self.bound.get_lock():
+                self.bound.value = max(self.bound.value, min(ceil(self.get_best_objective_value() - 1e-6), self.cutoff))
+            if self.stop.is_set() or floor(self.incumbent.value) <= self.bound.value:
+                self.abort()
+
+    callback = model.register_callback(Share)
+    (callback.cutoff, callback.incumbent, callback.bound, callback.stop) = (cutoff, incumbent, bound, stop)
+
+
+def test():
+    from benchmark.generator import random_bay
+
+    bay = random_bay(3, 4, 8, 0)
+    print('bay')
+    print(bay)
+
+    print()
+    print('compatible: {}'.format(compatible(bay, ['BRP_II', 'BRP_III', 'BRP_m3', ('BRP_m3', {'restricted': True}), 'RestrictedSearch'])))
+    result = solve_portfolio(bay, time_limit=60, threads=4)
+    print('n_relos = {} ({}), bound = {}, optimal = {}'.format(result['n_relos'], result['model'], result['bound'], result['optimal']))
+    for record in result['members']:
+        print(record)
+
+
+if __name__ == '__main__':
+    test()
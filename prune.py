@@ -0,0 +1,32 @@
+# Copyright (c) 2021 Bo Jin <jinbostar@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+# Pruned formulations create only the variables that are not fixed to 0 by their constraints or pre-processing. The
+# constraint generators stay as they are: absent variables read as the constant 0, and constraints that become constant
+# are dropped (or, if violated, replaced by a trivially infeasible row).
+
+
+class Pruned(dict):
+    # a variable dictionary of a pruned formulation
+    def __missing__(self, key):
+        return 0
+
+
+def adder(model, prune):
+    # model.add_constraints, for constraints over pruned variables if prune
+    if not prune:
+        return model.add_constraints
+    return lambda cts: model.add_constraints(model.linear_expr() == 1 if ct is False else ct for ct in cts if ct is not True and (ct is False or not ct.is_trivial_feasible()))
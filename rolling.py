@@ -0,0 +1,181 @@
+# Copyright (c) 2021 Bo Jin <jinbostar@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+from math import ceil
+
+from bay import Bay
+from bay_state import BayState
+from common import irange
+from heuristics import best_plan, restricted_lower_bound
+from models import PROBLEMS
+
+# Rolling horizon for the time-indexed models (BRP_m1, BRP_m2, BRP_m3, BRP_III), whose size grows with the horizon. A
+# window holds the blocks of the first window priorities of the remaining bay (by rank); all later blocks get one
+# priority window + 1, so the truncated model only orders the window. Its plan is committed up to the retrieval of the
+# first window - overlap priorities, and the next window starts from the resulting bay; the last window, with at most
+# window priorities left, is solved in full. Merging priorities relaxes the problem, so the bound of the first window
+# is a lower bound for the whole bay. The models that require distinct priorities (BRP_III, and BRP_m1 and BRP_m2 with
+# restricted_distinct, distinct or restricted) give the later blocks distinct priorities from the top tier down instead,
+# which is no relaxation. The best heuristic completion of every committed prefix is kept as well, so that the plan is
+# never worse than the heuristics.
+
+
+def needs_distinct(cls, flags):
+    return cls.__name__ == 'BRP_III' or any(flags.get(flag) for flag in ['restricted_distinct', 'distinct']) or cls.__name__ == 'BRP_m2' and flags.get('restricted')
+
+
+def truncate(conf, n_tiers, window, distinct):
+    # the window bay of a configuration: the first window priorities by rank, then window + 1 for all later blocks (or,
+    # if distinct, window + 1, window + 2, ... by tier from the top down, then by stack); also whether it is truncated
+    rank = {p: r for r, p in enumerate(sorted(set(p for stack in conf for p in stack)), 1)}
+    if distinct:
+        later = sorted((-h, s) for s, stack in enumerate(conf) for h, p in enumerate(stack) if rank[p] > window)
+        rank_of = {key: r for r, key in enumerate(later, window + 1)}
+        stacks = [[rank[p] if rank[p] <= window else rank_of[-h, s] for h, p in enumerate(stack)] for s, stack in enumerate(conf)]
+    else:
+        stacks = [[min(rank[p], window + 1) for p in stack] for stack in conf]
+    return Bay(len(conf), n_tiers, stacks), len(rank) > window
+
+
+def plan_bays(bay, moves):
+    # retrieval t -> Bay before the relocations of stage t, replayed from moves as in BayState.moves
+    state = BayState.from_bay(bay)
+    bays = {}
+    t = 1
+    for (src, dst, p) in moves:
+        if t not in bays:
+            bays[t] = Bay(state.n_stacks, state.n_tiers, state.conf())
+        if dst is None:
+            state.retrieve(src)
+            t += 1
+        else:
+            state.relocate(src, dst)
+    return bays
+
+
+class RollingHorizon:
+    # solves a bay with a time-indexed model cls (and its flags) window by window, committing the moves of the first
+    # window - overlap priorities of every window on a BayState
+    def __init__(self, cls, bay, window=5, overlap=1, time_limit=None, **flags):
+        assert 0 <= overlap < window
+        self.cls = cls
+        self.bay = bay
+        self.window = window
+        self.overlap = overlap
+        self.time_limit = time_limit
+        self.flags = flags
+        self.distinct = needs_distinct(cls, flags)
+        # whether the objective value is the number of relocations, so that the bound of the first window counts
+        self.counts = PROBLEMS[cls.__name__][2]
+        # the committed moves, and the best complete plan
+        self.state = BayState.from_bay(bay)
+        self.best = best_plan(bay)
+        restricted = any(flags.get(flag) for flag in ['restricted', 'restricted_distinct'])
+        self.lb = restricted_lower_bound(bay) if restricted else bay.compute_lb_kh()
+        self.n_windows = 0
+        self.optimal = False
+
+    def solve(self):
+        state = self.state
+        while state.n_blocks > 0:
+            conf = state.conf()
+            completion = best_plan(Bay(state.n_stacks, state.n_tiers, conf)) if state.moves else None
+            if completion is not None and state.n_relos + completion.n_relos < self.best.n_relos:
+                self.best = state.copy()
+                for (src, dst, _) in completion.moves:
+                    self.best.retrieve(src) if dst is None else self.best.relocate(src, dst)
+            (bay, truncated) = truncate(conf, state.n_tiers, self.window, self.distinct)
+            instance = self.cls(bay, **self.flags)
+            instance.add_mip_start(bay, instance.plan.moves)
+            if self.time_limit is not None:
+                instance.model.parameters.timelimit = self.time_limit
+            if instance.model.solve():
+                moves = [move[:3] for move in instance.get_moves()]
+                bound = instance.model.solve_details.best_bound
+            else:
+                moves = instance.plan.moves
+                bound = None
+            if self.n_windows == 0 and self.counts and bound is not None and not (truncated and self.distinct):
+                self.lb = max(self.lb, ceil(bound - 1e-6))
+            self.n_windows += 1
+
+            # the moves up to the retrieval of the blocks of the first window - overlap ranks (of all, in the last window);
+            # a block of minimum priority on top is retrieved before the next relocation, which keeps the plans of the
+            # restricted models restricted, and the later moves of the plan with it (gone[s] such blocks on top of stack
+            # s in the plan) are skipped
+            committed = set(sorted(set(p for stack in conf for p in stack))[:self.window - self.overlap] if truncated else [p for stack in conf for p in stack])
+            n_commit = sum(1 for stack in conf for p in stack if p in committed)
+            gone = [0] * state.n_stacks
+            for (src, dst, _) in moves:
+                if n_commit == 0:
+                    break
+                if gone[src] > 0:
+                    gone[src] -= 1
+                    if dst is not None:
+                        gone[dst] += 1
+                elif dst is None:
+                    assert state.top(src) == state.p_min
+                    state.retrieve(src)
+                    n_commit -= 1
+                else:
+                    while n_commit > 0:
+                        s = next((s for s in state.where[state.p_min] if state.top(s) == state.p_min), None)
+                        if s is None:
+                            break
+                        state.retrieve(s)
+                        gone[s] += 1
+                        n_commit -= 1
+                    if n_commit > 0 and gone[src] == 0:
+                        state.relocate(src, dst)
+                    elif n_commit > 0:
+                        gone[src] -= 1
+                        gone[dst] += 1
+        if state.n_relos <= self.best.n_relos:
+            self.best = state
+        self.optimal = self.lb == self.best.n_relos
+        return self.optimal
+
+    def get_moves(self):
+        # (src, dst, p) for a relocation and (src, None, p) for a retrieval, with 0-based stacks as in BayState
+        return self.best.moves
+
+    def get_bays(self):
+        return plan_bays(self.bay, self.best.moves)
+
+    def get_n_relos(self):
+        return self.best.n_relos
+
+
+def test():
+    from benchmark.generator import random_bay
+    from demelodasilva2018.BRP_m2 import BRP_m2
+
+    bay = random_bay(4, 5, 14, 0)
+    print('bay')
+    print(bay)
+
+    rolling = RollingHorizon(BRP_m2, bay, window=5, overlap=2, time_limit=60)
+    rolling.solve()
+    print()
+    print('n_relos = {} ({} windows), lb = {}'.format(rolling.get_n_relos(), rolling.n_windows, rolling.lb))
+    bays = rolling.get_bays()
+    for t in irange(1, bay.n_blocks):
+        print('t = {}'.format(t))
+        print(bays[t])
+
+
+if __name__ == '__main__':
+    test()
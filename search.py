@@ -0,0 +1,160 @@
+# Copyright (c) 2021 Bo Jin <jinbostar@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+from time import perf_counter
+
+from bay import Bay
+from bay_state import BayState
+from common import irange
+from heuristics import EFFORT, best_plan, restricted_lower_bound
+from zobrist import TranspositionTable
+
+
+class RestrictedSearch:
+    # IDA* for the restricted CRP with distinct or duplicate priorities. A node is a BayState in which every block of
+    # minimum priority is blocked; its children relocate the topmost block above a block of minimum priority. Blocks on
+    # top are retrieved at once, and of several destination stacks with the same contents only the first is tried. A
+    # transposition table keeps the best lower bound on the remaining relocations of every state seen.
+    def __init__(self, bay, node_limit=None, time_limit=None, effort=EFFORT, tt_capacity=1 << 20):
+        self.bay = bay
+        self.W = bay.n_stacks
+        self.H = bay.n_tiers
+        self.N = bay.n_blocks
+        self.node_limit = node_limit
+        self.time_limit = time_limit
+
+        # incumbent: the best heuristic plan, starting from min-max
+        self.best = best_plan(bay, effort)
+        self.lb = restricted_lower_bound(bay)
+        self.tt = TranspositionTable(tt_capacity)
+        self.n_nodes = 0
+        self.optimal = False
+
+    def solve(self):
+        self.deadline = perf_counter() + self.time_limit if self.time_limit is not None else None
+        self.stopped = False
+
+        root = BayState.from_bay(self.bay)
+        settle(root)
+        bound = max(self.lb, root.n_relos + self.remaining_lb(root))
+        while bound < self.best.n_relos:
+            self.next_bound = self.best.n_relos
+            found = self.dfs(root, bound)
+            if self.stopped:
+                break
+            if found is not None:
+                self.best = found
+                break
+            # no plan with at most bound relocations exists
+            bound = self.next_bound
+        self.lb = min(bound, self.best.n_relos)
+        self.optimal = self.lb == self.best.n_relos
+        return self.optimal
+
+    def dfs(self, state, bound):
+        if state.n_blocks == 0:
+            return state
+        self.n_nodes += 1
+        if self.node_limit is not None and self.n_nodes > self.node_limit or self.deadline is not None and perf_counter() >= self.deadline:
+            self.stopped = True
+            return None
+
+        for (f, child) in sorted(((child.n_relos + self.remaining_lb(child), child) for child in children(state)), key=lambda c: c[0]):
+            if f > bound:
+                self.next_bound = min(self.next_bound, f)
+                break
+            found = self.dfs(child, bound)
+            if found is not None or self.stopped:
+                return found
+        # no plan from this state finishes within bound
+        self.tt.store(state.hash, bound - state.n_relos + 1, depth=state.n_relos)
+        return None
+
+    def remaining_lb(self, state):
+        entry = self.tt.lookup(state.hash)
+        if entry is not None:
+            return entry[0]
+        lb = lower_bound(state)
+        self.tt.store(state.hash, lb, depth=state.n_relos)
+        return lb
+
+    def get_moves(self):
+        # (src, dst, p) for a relocation and (src, None, p) for a retrieval, with 0-based stacks as in BayState
+        return self.best.moves
+
+    def get_bays(self):
+        state = BayState.from_bay(self.bay)
+        bays = {}
+        t = 1
+        for (src, dst, p) in self.best.moves:
+            if t not in bays:
+                bays[t] = Bay(self.W, self.H, state.conf())
+            if dst is None:
+                state.retrieve(src)
+                t += 1
+            else:
+                state.relocate(src, dst)
+        return bays
+
+    def get_n_relos(self):
+        return self.best.n_relos
+
+
+def settle(state):
+    # retrieve blocks of minimum priority as long as one of them is on top
+    while state.n_blocks > 0:
+        s = next((s for s in state.where[state.p_min] if state.stacks[s][-1] == state.p_min), None)
+        if s is None:
+            break
+        state.retrieve(s)
+
+
+def children(state):
+    for src in sorted(state.where[state.p_min]):
+        tried = []
+        for dst in range(state.n_stacks):
+            if dst == src or state.h[dst] >= state.n_tiers or state.stacks[dst] in tried:
+                continue
+            tried.append(state.stacks[dst])
+            child = state.copy()
+            child.relocate(src, dst)
+            settle(child)
+            yield child
+
+
+def lower_bound(state):
+    return restricted_lower_bound(Bay(state.n_stacks, state.n_tiers, state.conf()))
+
+
+def test():
+    conf = [[5, 3, 6], [4, 2], [7, 1]]
+    bay = Bay(3, 4, conf)
+    print('bay')
+    print(bay)
+
+    search = RestrictedSearch(bay)
+    print()
+    print('n_relos (heuristic) = {}'.format(search.get_n_relos()))
+    if search.solve():
+        print('n_relos = {} ({} nodes)'.format(search.get_n_relos(), search.n_nodes))
+        bays = search.get_bays()
+        for t in irange(1, search.N):
+            print('t = {}'.format(t))
+            print(bays[t])
+
+
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,189 @@
+# Copyright (c) 2021 Bo Jin <jinbostar@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+from backend import default_backend
+from instrument import instrument
+from models import SMALLER, accepts, load, problem
+from stream import StreamModel
+
+# Model sizes: every formulation has a static estimate_size(bay, **flags), with the flags of its constructor, that counts
+# the variables, the constraints and the non-zeros of its model family by family from the index sets, without building
+# it. The counts are those of the model as built by backend.HighsModel (rows without variables that hold are not built,
+# repeated variables of a row count once). A formulation whose pruned variables depend on the bay beyond its
+# dimensions (BRP_II_A with prune) is counted by a dry run of its build (dry_run), which runs the same generators into a
+# model that only counts the rows. The memory of a model is projected from the counts by rough costs per object of the
+# backend, plus, with bulk, the peak of the transient arrays of the largest family built by bulk.Rows; fit picks the
+# first of a formulation and its smaller alternatives (models.SMALLER) that fits into a memory budget.
+
+# bytes per variable, constraint and non-zero: docplex objects together with their copy in CPLEX (with bulk, the rows
+# only live in CPLEX), and the objects and CSR arrays of backend.HighsModel, which are copied once more for the solve
+BYTES = {
+    'cplex': (600, 1000, 150),
+    'cplex-bulk': (600, 40, 16),
+    'highs': (250, 40, 32),
+}
+# bytes of the transient arrays of a family built by bulk.Rows, per element of its largest index grid (the column
+# indices of a term broadcast over the grid, its mask and the selection of the present variables) and per non-zero (the
+# COO arrays, their sorted copies and the lists of the rows handed to CPLEX, or to backend.HighsModel, which turns them
+# into expressions)
+PEAK = {
+    'cplex-bulk': (10, 120),
+    'highs': (10, 150),
+}
+
+
+class Size:
+    def __init__(self, model=None, bulk=False):
+        # model as for the formulations: a backend name, None for the default backend, or a model object (costed as the
+        # expression layer of stream.py)
+        backend = default_backend() if model is None else model if isinstance(model, str) else 'highs'
+        self.backend = backend + '-bulk' if backend == 'cplex' and bulk else backend
+        self.bulk = bulk
+        self.variables = {}
+        self.families = {}
+        self.grids = {}
+
+    def add_variables(self, name, n):
+        self.variables[name] = self.variables.get(name, 0) + n
+
+    def add_family(self, name, rows, nonzeros, grid=None):
+        # a constraint family (or a part of it, added under the same name); grid is the number of elements of the
+        # largest index grid of its bulk assembly (None for a family that is not built by bulk.Rows)
+        (n_rows, n_nonzeros) = self.families.get(name, (0, 0))
+        self.families[name] = (n_rows + rows, n_nonzeros + nonzeros)
+        if grid is not None:
+            self.grids[name] = max(self.grids.get(name, 0), grid)
+
+    def add_rows(self, name, nonzeros, grid=None):
+        # a family given by the number of non-zeros of each row
+        (rows, total) = (0, 0)
+        for n in nonzeros:
+            rows += 1
+            total += n
+        self.add_family(name, rows, total, grid)
+
+    @property
+    def n_variables(self):
+        return sum(self.variables.values())
+
+    @property
+    def n_constraints(self):
+        return sum(rows for rows, _ in self.families.values())
+
+    @property
+    def n_nonzeros(self):
+        return sum(nonzeros for _, nonzeros in self.families.values())
+
+    @property
+    def peak(self):
+        # projected bytes of the transient arrays of the largest family built in bulk, on top of the model
+        if not self.bulk or self.backend not in PEAK:
+            return 0
+        (per_grid, per_nonzero) = PEAK[self.backend]
+        return max((per_grid * grid + per_nonzero * self.families.get(name, (0, 0))[1] for name, grid in self.grids.items()), default=0)
+
+    @property
+    def memory(self):
+        # projected bytes, at the peak of the build
+        (var, row, nonzero) = BYTES[self.backend]
+        return var * self.n_variables + row * self.n_constraints + nonzero * self.n_nonzeros + self.peak
+
+    def to_dict(self):
+        return {'n_variables': self.n_variables, 'n_constraints': self.n_constraints, 'n_nonzeros': self.n_nonzeros, 'memory': self.memory, 'peak': self.peak, 'backend': self.backend, 'variables': self.variables, 'families': {name: list(counts) for name, counts in self.families.items()}}
+
+
+class Counter:
+    # a writer of stream.py that only counts the rows and their non-zeros
+    def __init__(self):
+        self.rows = 0
+        self.nonzeros = 0
+
+    def write_objective(self, sense, objective):
+        pass
+
+    def write_row(self, name, terms, sense, rhs):
+        self.rows += 1
+        self.nonzeros += len(terms)
+
+    def close(self, sense, objective):
+        pass
+
+
+class CountingModel(StreamModel):
+    # the expression layer of stream.py with the rows counted instead of kept: the rows without variables that hold are
+    # dropped, as by backend.HighsModel
+    def __init__(self):
+        super().__init__()
+        self.writer = self.counter = Counter()
+
+    @property
+    def number_of_rows(self):
+        return self.counter.rows
+
+    @property
+    def number_of_nonzeros(self):
+        return self.counter.nonzeros
+
+
+def dry_run(cls, bay, size, **flags):
+    # size with its variables and families replaced by those of a build of the formulation cls (with its flags, but not
+    # in bulk, whose transient arrays are those of the full index grids kept in size) into a CountingModel
+    model = instrument(CountingModel())
+    cls(bay, model=model, **dict(flags, bulk=False))
+    (size.variables, size.families) = ({}, {})
+    for record in model.build_report.to_list():
+        if record['kind'] == 'variables':
+            size.add_variables(record['family'], record['variables'])
+        elif record['kind'] == 'constraints':
+            size.add_family(record['family'], record['rows'], record['nonzeros'])
+    return size
+
+
+def estimate(name, flags, bay):
+    # the Size of a formulation with its flags for a bay; None for a formulation without a model (RestrictedSearch)
+    cls = load(name)
+    return cls.estimate_size(bay, **flags) if hasattr(cls, 'estimate_size') else None
+
+
+def fit(name, flags, bay, budget):
+    # (name, flags, size) of the first of the formulation and its alternatives in models.SMALLER that solve the same
+    # problem for the bay and fit into budget bytes; MemoryError if none does
+    (restricted, _, counts) = problem(name, flags)
+    sizes = []
+    for (alt_name, alt_flags) in [(name, flags)] + SMALLER.get(name, []):
+        if alt_name == name:
+            alt_flags = dict(flags, **alt_flags)
+        if (alt_name, alt_flags) != (name, flags) and not (accepts(alt_name, alt_flags, bay, restricted) and problem(alt_name, alt_flags)[2] == counts):
+            continue
+        size = estimate(alt_name, alt_flags, bay)
+        if size is None or size.memory <= budget:
+            return alt_name, alt_flags, size
+        sizes.append('{} {} ({:.0f} MB)'.format(alt_name, alt_flags, size.memory / 2 ** 20))
+    raise MemoryError('no formulation fits into {:.0f} MB: {}'.format(budget / 2 ** 20, ', '.join(sizes)))
+
+
+def test():
+    from bay import Bay
+
+    bay = Bay(6, 6, [[25, 3, 14, 9], [1, 20, 7, 16], [11, 5, 22, 18], [2, 24, 13], [10, 17, 6, 21], [8, 23, 15, 4, 19, 12]])
+    for name in ['BRP_II', 'BRP_II_A', 'BRP2c', 'CRP_I', 'BRP_m3']:
+        size = estimate(name, {}, bay)
+        print('{}: {} variables, {} constraints, {} non-zeros, {:.0f} MB'.format(name, size.n_variables, size.n_constraints, size.n_nonzeros, size.memory / 2 ** 20))
+    print(fit('BRP_II', {}, bay, 2 ** 30)[:2])
+
+
+if __name__ == '__main__':
+    test()
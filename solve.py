@@ -0,0 +1,194 @@
+# Copyright (c) 2021 Bo Jin <jinbostar@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import argparse
+import json
+import os
+import sys
+from time import perf_counter
+
+from bay import Bay
+from benchmark.datasets import FORMATS, parse_all
+from models import FORMULATIONS, load
+
+# Command line: python -m solve FORMULATION [PATH ...] [-f FLAG[=VALUE] ...] solves every bay of the instance files (of
+# the files of a directory, or of stdin) with a formulation and writes one JSON record per bay: the status, the
+# objective value, the number of relocations, the bound and the gap, the build and solve times, and the plan as moves
+# (src, dst, block[, period]) with 0-based stacks and dst null for a retrieval (for the formulations without get_moves,
+# the configuration of every period as bays). An instance file holds one or more instances in a format of
+# benchmark/datasets.py, one JSON object {"n_tiers": ..., "conf": [[...], ...]} per line with --format json, or the
+# bays of a file of benchmark/packed.py with --format packed; an instance that cannot be read ends the run with an
+# error that names its source. The formulations are imported on demand, so that only a MIP formulation (on the CPLEX
+# backend) imports docplex.
+
+
+def parse_flag(text):
+    # KEY for KEY=true, or KEY=VALUE with VALUE as JSON (false, 3, "highs") or else as a string
+    (key, sep, value) = text.partition('=')
+    if not sep:
+        return key, True
+    try:
+        return key, json.loads(value.lower() if value in ['True', 'False'] else value)
+    except ValueError:
+        return key, value
+
+
+def read_bays(paths, fmt='caserta', n_tiers=None):
+    # (name, bay) for every instance of the files, of the files of the directories in name order, or of stdin for -;
+    # the instances of a source with several are named source:index
+    for path in paths or ['-']:
+        if path == '-':
+            if fmt == 'packed':
+                raise OSError('packed instances are memory-mapped and cannot be read from stdin')
+            yield from parsed('stdin', named('stdin', sys.stdin.read(), fmt, n_tiers))
+        elif os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if os.path.isfile(os.path.join(path, name)) and not name.startswith('.'):
+                    yield from parsed(os.path.join(path, name), from_file(os.path.join(path, name), fmt, n_tiers))
+        else:
+            yield from parsed(path, from_file(path, fmt, n_tiers))
+
+
+def parsed(source, bays):
+    # the bays of a source; an instance that cannot be read (a truncated file, a wrong count, not a packed file) raises
+    # a ValueError that names the source
+    try:
+        yield from bays
+    except (AssertionError, KeyError, RuntimeError, TypeError, ValueError) as e:
+        if isinstance(e.__cause__, StopIteration):
+            reason = 'unexpected end of the instances'
+        elif isinstance(e, AssertionError):
+            reason = 'the blocks do not match the header'
+        else:
+            reason = '{}: {}'.format(type(e).__name__, e)
+        raise ValueError('{}: {}'.format(source, reason)) from e
+
+
+def from_file(path, fmt, n_tiers):
+    if fmt == 'packed':
+        # imported here, as it imports NumPy
+        from benchmark.packed import read
+        for index, bay in enumerate(read(path)):
+            yield '{}:{}'.format(path, index), bay
+    else:
+        with open(path) as f:
+            yield from named(path, f.read(), fmt, n_tiers)
+
+
+def named(source, text, fmt, n_tiers):
+    if fmt == 'json':
+        objects = [json.loads(line) for line in text.splitlines() if line.strip()]
+        bays = [Bay(len(obj['conf']), obj.get('n_tiers', n_tiers), obj['conf']) for obj in objects]
+    else:
+        bays = list(parse_all(text, fmt, n_tiers))
+    for index, bay in enumerate(bays):
+        yield (source if len(bays) == 1 else '{}:{}'.format(source, index)), bay
+
+
+def solve(name, flags, bay, time_limit=None, threads=None):
+    # the record of a bay solved with a formulation and its flags
+    record = {'model': name, 'flags': flags}
+    try:
+        cls = load(name)
+        start = perf_counter()
+        instance = cls(bay, **flags)
+        record['build_time'] = perf_counter() - start
+        start = perf_counter()
+        if hasattr(instance, 'model'):
+            model = instance.model
+            if threads is not None:
+                model.parameters.threads = threads
+            if time_limit is not None:
+                model.parameters.timelimit = time_limit
+            solution = model.solve()
+            record['solve_time'] = perf_counter() - start
+            details = model.solve_details
+            record['status'] = details.status
+            record['objective'] = model.objective_value if solution else None
+            record['n_relos'] = round(instance.get_n_relos()) if solution else None
+            record['bound'] = details.best_bound if solution else None
+            record['gap'] = details.mip_relative_gap if solution else None
+            if not solution and hasattr(instance, 'ub') and 'infeasible' in details.status:
+                # BRP_II_A only admits plans better than its heuristic upper bound, whose plan is thus optimal
+                record['n_relos'] = record['bound'] = instance.ub
+                record['gap'] = 0.0
+                record['moves'] = [list(move) for move in instance.plan.moves]
+        else:
+            # RestrictedSearch
+            instance.time_limit = time_limit
+            optimal = instance.solve()
+            record['solve_time'] = perf_counter() - start
+            record['status'] = 'optimal' if optimal else 'feasible'
+            record['objective'] = record['n_relos'] = instance.get_n_relos()
+            record['bound'] = instance.lb
+            record['gap'] = (instance.get_n_relos() - instance.lb) / max(1, instance.get_n_relos())
+        if record['objective'] is not None:
+            record.update(plan(instance))
+    except Exception as e:
+        record['error'] = '{}: {}'.format(type(e).__name__, e)
+    return record
+
+
+def plan(instance):
+    if hasattr(instance, 'get_moves'):
+        return {'moves': [[None if v is None else int(v) for v in move] for move in instance.get_moves()]}
+    bays = instance.get_bays()
+    return {'bays': {t: [[int(p) for p in bay.pri[s][:bay.h[s]]] for s in range(bay.n_stacks)] for t, bay in sorted(bays.items())}}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m solve', description='Solves bays with a formulation and writes one JSON record per bay.')
+    parser.add_argument('formulation', choices=sorted(FORMULATIONS))
+    parser.add_argument('paths', nargs='*', metavar='PATH', help='instance files or directories (default: stdin, also as -)')
+    parser.add_argument('-f', '--flag', action='append', type=parse_flag, default=[], metavar='FLAG[=VALUE]', help='a flag of the formulation, e.g., -f restricted -f bug_fixed=false -f model=highs')
+    parser.add_argument('--format', choices=sorted(FORMATS) + ['json', 'packed'], default='caserta', help='the format of the instances (default: caserta)')
+    parser.add_argument('--tiers', type=int, help='the number of tiers, if the instances do not give it')
+    parser.add_argument('-t', '--time-limit', type=float, help='seconds per bay')
+    parser.add_argument('-j', '--threads', type=int, help='solver threads (default: the solver default)')
+    parser.add_argument('-o', '--output', help='the file of the records (default: stdout)')
+    parser.add_argument('--indent', type=int, help='pretty-print the records with this indent')
+    args = parser.parse_intermixed_args(argv)
+
+    flags = dict(args.flag)
+    out = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        for name, bay in read_bays(args.paths, args.format, args.tiers):
+            record = dict({'instance': name}, **solve(args.formulation, flags, bay, args.time_limit, args.threads))
+            out.write(json.dumps(record, indent=args.indent) + '\n')
+            out.flush()
+    except (OSError, ValueError) as e:
+        parser.exit(1, '{}: error: {}\n'.format(parser.prog, e))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+def test():
+    import tempfile
+
+    from benchmark.datasets import dump
+    from benchmark.generator import random_bays
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bays.txt')
+        with open(path, 'w') as f:
+            f.write(''.join(dump(bay, 'zhu') for bay in random_bays(3, 4, 7, 2)))
+        main(['RestrictedSearch', path, '--format', 'zhu', '-t', '10'])
+        main(['BRP_II_A', path, '--format', 'zhu', '-t', '60', '-f', 'bulk'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,448 @@
+# Copyright (c) 2021 Bo Jin <jinbostar@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import gzip
+import os
+import tempfile
+from math import inf
+from xml.etree.ElementTree import iterparse
+
+# Streaming export of the formulations to .lp or .mps files (optionally gzip-compressed as .lp.gz or .mps.gz), for
+# solvers that run outside this process. StreamModel stands in for the docplex Model of a formulation (pass it as
+# model=...): it keeps the variables and the objective, but writes every constraint to the file as soon as it is added,
+# so that no constraint is held in memory. read_solution maps a .sol file of the solver back onto the variables, after
+# which get_bays and get_n_relos of the formulation work as with docplex. In another process, the variables can be
+# rebuilt on a StreamModel without a path, which discards the constraints.
+#
+# Only the modeling calls of the formulations (and the rows of bulk.Rows) are supported; backend.HighsModel adds solve.
+
+
+def open_text(path, mode):
+    return gzip.open(path, mode + 't') if path.endswith('.gz') else open(path, mode)
+
+
+def number(value):
+    return str(int(value)) if value == int(value) else repr(float(value))
+
+
+class Linear:
+    # arithmetic and comparisons shared by variables and expressions
+    def __add__(self, other):
+        return self.to_expr().copy().add(other, 1)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        return self.to_expr().copy().add(other, -1)
+
+    def __rsub__(self, other):
+        return Expr({}, other).add(self, -1)
+
+    def __neg__(self):
+        return Expr({}).add(self, -1)
+
+    def __mul__(self, other):
+        assert isinstance(other, (int, float)), 'not linear'
+        return Expr({}).add(self, other)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        return self * (1 / other)
+
+    def __le__(self, other):
+        return Constraint(self - other, 'L')
+
+    def __ge__(self, other):
+        return Constraint(self - other, 'G')
+
+    def __eq__(self, other):
+        return Constraint(self - other, 'E')
+
+    __hash__ = object.__hash__
+
+
+class Var(Linear):
+    __slots__ = ['index', 'name', 'lb', 'ub', 'vtype', 'solution_value']
+
+    def __init__(self, index, name, lb, ub, vtype):
+        self.index = index
+        self.name = name
+        self.lb = lb
+        self.ub = ub
+        self.vtype = vtype
+        self.solution_value = None
+
+    def to_expr(self):
+        return Expr({self.index: 1})
+
+
+class Expr(Linear):
+    __slots__ = ['terms', 'constant']
+
+    def __init__(self, terms, constant=0):
+        self.terms = terms
+        self.constant = constant
+
+    def to_expr(self):
+        return self
+
+    def copy(self):
+        return Expr(dict(self.terms), self.constant)
+
+    def add(self, other, coef):
+        # in place: self += coef * other
+        terms = self.terms
+        if isinstance(other, Var):
+            terms[other.index] = terms.get(other.index, 0) + coef
+        elif isinstance(other, Expr):
+            for i, c in other.terms.items():
+                terms[i] = terms.get(i, 0) + coef * c
+            self.constant += coef * other.constant
+        else:
+            self.constant += coef * other
+        return self
+
+    def value(self, variables):
+        return self.constant + sum(c * variables[i].solution_value for i, c in self.terms.items())
+
+
+class Constraint:
+    # expr <sense> 0, with sense 'L', 'E' or 'G'
+    __slots__ = ['expr', 'sense']
+
+    def __init__(self, expr, sense):
+        self.expr = expr
+        self.sense = sense
+
+    def is_trivial_feasible(self):
+        if any(self.expr.terms.values()):
+            return False
+        return {'L': self.expr.constant <= 0, 'E': self.expr.constant == 0, 'G': self.expr.constant >= 0}[self.sense]
+
+
+class StreamModel:
+    def __init__(self, path=None):
+        self.variables = []
+        self.objective = None
+        self.objective_sense = None
+        self.objective_value = None
+        self.number_of_constraints = 0
+        self.mip_starts = []
+        if path is None:
+            self.writer = None
+        elif path.endswith('.lp') or path.endswith('.lp.gz'):
+            self.writer = LPWriter(path, self.variables)
+        elif path.endswith('.mps') or path.endswith('.mps.gz'):
+            self.writer = MPSWriter(path, self.variables)
+        else:
+            raise ValueError('unknown file format: {}'.format(path))
+
+    def var_dict(self, keys, lb, ub, vtype, name):
+        variables = {}
+        for key in keys:
+            suffix = '_'.join(str(k) for k in key) if isinstance(key, tuple) else str(key)
+            variables[key] = var = Var(len(self.variables), '{}_{}'.format(name or 'x', suffix), lb, ub, vtype)
+            self.variables.append(var)
+        return variables
+
+    def binary_var_dict(self, keys, name=None):
+        return self.var_dict(keys, 0, 1, 'B', name)
+
+    def integer_var_dict(self, keys, lb=0, ub=inf, name=None):
+        return self.var_dict(keys, lb, ub, 'I', name)
+
+    def continuous_var_dict(self, keys, lb=0, ub=inf, name=None):
+        return self.var_dict(keys, lb, ub, 'C', name)
+
+    def sum(self, args):
+        expr = Expr({})
+        for arg in args:
+            expr.add(arg, 1)
+        return expr
+
+    def linear_expr(self):
+        return Expr({})
+
+    def minimize(self, expr):
+        self.set_objective('min', expr)
+
+    def maximize(self, expr):
+        self.set_objective('max', expr)
+
+    def set_objective(self, sense, expr):
+        # the objective leads the file, so it has to be set before the constraints
+        assert self.number_of_constraints == 0 and self.objective is None
+        self.objective = Expr({}).add(expr, 1)
+        self.objective_sense = sense
+        if self.writer is not None:
+            self.writer.write_objective(sense, self.objective)
+
+    @property
+    def number_of_variables(self):
+        return len(self.variables)
+
+    def add_constraint(self, ct):
+        assert isinstance(ct, Constraint), 'expecting a constraint, got: {!r}'.format(ct)
+        self.number_of_constraints += 1
+        if self.writer is not None and not ct.is_trivial_feasible():
+            terms = {i: c for i, c in ct.expr.terms.items() if c != 0}
+            self.writer.write_row('c{}'.format(self.number_of_constraints), terms, ct.sense, -ct.expr.constant)
+
+    def add_rows(self, lin_expr, senses, rhs):
+        # rows given as for linear_constraints.add of CPLEX, as bulk.Rows posts them
+        for ((cols, vals), sense, b) in zip(lin_expr, senses, rhs):
+            self.add_constraint(Constraint(Expr(dict(zip(cols, vals)), -b), sense))
+
+    def add_constraints(self, cts):
+        for ct in cts:
+            self.add_constraint(ct)
+
+    def add(self, cts):
+        if isinstance(cts, Constraint):
+            self.add_constraint(cts)
+        else:
+            self.add_constraints(cts)
+
+    def new_solution(self, var_value_dict):
+        # as docplex, for add_mip_start
+        return dict(var_value_dict)
+
+    def add_mip_start(self, solution):
+        # the starts are not written to the file; backend.HighsModel falls back on the best of them
+        self.mip_starts.append(solution)
+
+    def clear_mip_starts(self):
+        self.mip_starts.clear()
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close(self.objective_sense, self.objective)
+            self.writer = None
+
+    def read_solution(self, path):
+        # sets solution_value of every variable (0 if absent from the file) and objective_value; False if the file has
+        # no values
+        values = read_sol(path)
+        for var in self.variables:
+            var.solution_value = values.get(var.name, 0.0)
+        self.objective_value = self.objective.value(self.variables) if self.objective is not None else 0
+        return bool(values)
+
+
+class LPWriter:
+    def __init__(self, path, variables):
+        self.f = open_text(path, 'w')
+        self.variables = variables
+        self.header = False
+
+    def write_terms(self, terms):
+        # LP lines are limited in length, so that terms are wrapped
+        f = self.f
+        for n, (i, c) in enumerate(terms.items()):
+            if n > 0 and n % 8 == 0:
+                f.write('\n')
+            f.write(' {} {} {}'.format('-' if c < 0 else '+', number(abs(c)), self.variables[i].name))
+
+    def write_objective(self, sense, objective):
+        self.f.write('Minimize\n' if sense == 'min' else 'Maximize\n')
+        self.f.write(' obj:')
+        self.write_terms({i: c for i, c in objective.terms.items() if c != 0})
+        if objective.constant != 0:
+            self.f.write(' {} {}'.format('-' if objective.constant < 0 else '+', number(abs(objective.constant))))
+        self.f.write('\nSubject To\n')
+        self.header = True
+
+    def write_row(self, name, terms, sense, rhs):
+        if not self.header:
+            self.f.write('Minimize\n obj:\nSubject To\n')
+            self.header = True
+        self.f.write(' {}:'.format(name))
+        # a violated row without variables still needs a term
+        self.write_terms(terms or {0: 0})
+        self.f.write(' {} {}\n'.format({'L': '<=', 'E': '=', 'G': '>='}[sense], number(rhs)))
+
+    def close(self, sense, objective):
+        f = self.f
+        if not self.header:
+            f.write('Minimize\n obj:\nSubject To\n')
+        f.write('Bounds\n')
+        for var in self.variables:
+            if var.vtype == 'B':
+                continue
+            if var.lb == -inf and var.ub == inf:
+                f.write(' {} free\n'.format(var.name))
+            elif var.lb != 0 or var.ub != inf:
+                f.write(' {} <= {} <= {}\n'.format('-inf' if var.lb == -inf else number(var.lb), var.name, '+inf' if var.ub == inf else number(var.ub)))
+        for (section, vtype) in [('Binaries', 'B'), ('Generals', 'I')]:
+            names = (var.name for var in self.variables if var.vtype == vtype)
+            first = next(names, None)
+            if first is not None:
+                f.write('{}\n {}\n'.format(section, first))
+                for name in names:
+                    f.write(' {}\n'.format(name))
+        f.write('End\n')
+        f.close()
+
+
+class MPSWriter:
+    # MPS lists the coefficients by column, so that the rows are spooled to temporary files: the row names, senses and
+    # right-hand sides to one, the coefficients to buckets of columns, each of which is sorted in memory on close
+    n_buckets = 64
+
+    def __init__(self, path, variables):
+        self.path = path
+        self.variables = variables
+        self.rows = tempfile.TemporaryFile('w+')
+        self.buckets = {}
+        self.bucket_size = None
+
+    def write_objective(self, sense, objective):
+        pass
+
+    def write_row(self, name, terms, sense, rhs):
+        if self.bucket_size is None:
+            self.bucket_size = max(1, -(-len(self.variables) // self.n_buckets))
+        self.rows.write('{} {} {}\n'.format(name, sense, number(rhs)))
+        for i, c in terms.items():
+            bucket = i // self.bucket_size
+            if bucket not in self.buckets:
+                self.buckets[bucket] = tempfile.TemporaryFile('w+')
+            self.buckets[bucket].write('{} {} {}\n'.format(i, name, number(c)))
+
+    def close(self, sense, objective):
+        objective = objective or Expr({})
+        with open_text(self.path, 'w') as f:
+            f.write('NAME {}\n'.format(os.path.basename(self.path).split('.')[0]))
+            if sense == 'max':
+                f.write('OBJSENSE\n    MAX\n')
+            f.write('ROWS\n N obj\n')
+            self.rows.seek(0)
+            for line in self.rows:
+                (name, row_sense, _) = line.split()
+                f.write(' {} {}\n'.format(row_sense, name))
+
+            f.write('COLUMNS\n')
+            integral = False
+            bucket_size = self.bucket_size or max(1, len(self.variables))
+            for start in range(0, len(self.variables), bucket_size):
+                entries = {}
+                bucket = self.buckets.pop(start // bucket_size, None)
+                if bucket is not None:
+                    bucket.seek(0)
+                    for line in bucket:
+                        (i, name, c) = line.split()
+                        entries.setdefault(int(i), []).append((name, c))
+                    bucket.close()
+                for var in self.variables[start:start + bucket_size]:
+                    if (var.vtype != 'C') != integral:
+                        integral = not integral
+                        f.write("    MARKER 'MARKER' '{}'\n".format('INTORG' if integral else 'INTEND'))
+                    column = entries.get(var.index, [])
+                    c = objective.terms.get(var.index, 0)
+                    if c != 0 or not column:
+                        # every column has to occur at least once
+                        column.insert(0, ('obj', number(c)))
+                    for (name, c) in column:
+                        f.write('    {} {} {}\n'.format(var.name, name, c))
+            if integral:
+                f.write("    MARKER 'MARKER' 'INTEND'\n")
+
+            f.write('RHS\n')
+            if objective.constant != 0:
+                f.write('    RHS obj {}\n'.format(number(-objective.constant)))
+            self.rows.seek(0)
+            for line in self.rows:
+                (name, _, rhs) = line.split()
+                if float(rhs) != 0:
+                    f.write('    RHS {} {}\n'.format(name, rhs))
+            self.rows.close()
+
+            f.write('BOUNDS\n')
+            for var in self.variables:
+                if var.vtype == 'B':
+                    f.write(' BV BND {}\n'.format(var.name))
+                    continue
+                if var.lb == -inf and var.ub == inf:
+                    f.write(' FR BND {}\n'.format(var.name))
+                    continue
+                if var.lb == -inf:
+                    f.write(' MI BND {}\n'.format(var.name))
+                elif var.lb != 0:
+                    f.write(' LO BND {} {}\n'.format(var.name, number(var.lb)))
+                if var.ub != inf:
+                    f.write(' UP BND {} {}\n'.format(var.name, number(var.ub)))
+                elif var.vtype == 'I':
+                    f.write(' PL BND {}\n'.format(var.name))
+            f.write('ENDATA\n')
+
+
+def read_sol(path):
+    # variable name -> value, from a CPLEX solution file (XML) or from the name-value lines written by most other
+    # solvers (HiGHS, Gurobi, SCIP, and CBC with a leading column number)
+    values = {}
+    with open_text(path, 'r') as f:
+        xml = f.read(64).lstrip().startswith('<')
+    if xml:
+        with open_text(path, 'r') as f:
+            for (_, element) in iterparse(f):
+                if element.tag == 'variable':
+                    values[element.get('name')] = float(element.get('value'))
+                element.clear()
+        return values
+    with open_text(path, 'r') as f:
+        for line in f:
+            # HiGHS lists the rows after the columns
+            if line.startswith('# Rows'):
+                break
+            tokens = line.split()
+            if not tokens or tokens[0].startswith('#'):
+                continue
+            if tokens[0] == '**':
+                tokens = tokens[1:]
+            if len(tokens) >= 3 and tokens[0].isdigit():
+                tokens = tokens[1:]
+            if len(tokens) >= 2:
+                try:
+                    values[tokens[0]] = float(tokens[1])
+                except ValueError:
+                    pass
+    return values
+
+
+def export(cls, bay, path, **kwargs):
+    # builds the formulation cls of a bay straight into the file path and returns it; after the file is solved
+    # elsewhere, instance.model.read_solution(...) makes get_bays and get_n_relos available
+    model = StreamModel(path)
+    instance = cls(bay, model=model, **kwargs)
+    model.close()
+    return instance
+
+
+def test():
+    from bay import Bay
+    from demelodasilva2018.BRP_m2 import BRP_m2
+
+    bay = Bay(3, 3, [[4, 1], [2], [1, 3, 4]])
+    directory = tempfile.mkdtemp()
+    for name in ['brp_m2.lp', 'brp_m2.mps.gz']:
+        path = os.path.join(directory, name)
+        brp_m2 = export(BRP_m2, bay, path)
+        print('{}: {} variables, {} constraints, {} bytes'.format(name, len(brp_m2.model.variables), brp_m2.model.number_of_constraints, os.path.getsize(path)))
+
+
+if __name__ == '__main__':
+    test()
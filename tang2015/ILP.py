@@ -16,16 +16,16 @@
 
 from itertools import product
 
-from docplex.mp.model import Model
-
+from backend import new_model
 from bay import Bay
 from common import irange
+from size import Size
 
 
 class MRIP:
-    def __init__(self, bay, bug_fixed=True):
+    def __init__(self, bay, bug_fixed=True, model=None):
         bay.validate_full_distinct()
-        self.model = model = Model()
+        self.model = model = new_model(model)
 
         self.C = C = bay.n_stacks
         self.P = P = bay.n_tiers
@@ -74,6 +74,39 @@ class MRIP:
         # (27)
         model.add_constraints(x[s, i, c, p] == X1[i, c, p] for i in irange(2, S) for s in irange(2, Q[i]) for c in irange(1, C) for p in irange(1, P))
 
+    @staticmethod
+    def estimate_size(bay, bug_fixed=True, model=None):
+        # the size of the model, counted from the index sets (see size.py)
+        (C, P, S) = (bay.n_stacks, bay.n_tiers, bay.n_blocks)
+        Q = {bay.pri[s][t]: bay.qlt[s][t] for s in range(bay.n_stacks) for t in range(bay.h[s])}
+        # the pairs (s, i) with i > s, the triples (s, i, j) of w and the keys (s, i) of x
+        pairs = S * (S - 1) // 2
+        triples = sum((S - s) * (S - s - 1) for s in irange(1, S - 1))
+        stages = S * (S + 1) // 2
+        size = Size(model)
+        size.add_variables('x', stages * C * P)
+        size.add_variables('y', pairs)
+        size.add_variables('w', triples)
+        # x[s, s, c, p] cancels out for P = 1
+        size.add_family('(2)', pairs * C, pairs * C * (P + 1 + sum(1 for p in irange(1, P) if p != P * P)))
+        size.add_family('(3)', pairs * C, pairs * C * (2 * P + 1))
+        size.add_family('(4)', stages, stages * C * P)
+        size.add_family('(5)', S * C * P, stages * C * P)
+        size.add_family('(6)', S * C * (P - 1), stages * C * (P - 1) * 2)
+        size.add_family('(7)', pairs * C, pairs * C * (2 * P + 1))
+        size.add_family('(8)', triples, triples * (3 + 2 * C * P))
+        size.add_family('(9)', triples, triples * (3 + 2 * C * P))
+        size.add_family('(10)', triples, triples * 2)
+        size.add_family('(11)', triples, triples * 2)
+        # x[s + 1, i, c, P] cancels out
+        size.add_family('(12)', triples * C, triples * C * (2 * P + 2))
+        size.add_family('(13)', pairs * C * P, pairs * C * P * 3)
+        size.add_family('(25)', pairs * C * P, pairs * C * P * 3)
+        size.add_family('(15)', (S if bug_fixed else S - 1) * C * P, (S if bug_fixed else S - 1) * C * P)
+        fixed = sum(max(0, Q[i] - 1) for i in irange(2, S)) * C * P
+        size.add_family('(27)', fixed, fixed)
+        return size
+
     def get_bays(self):
         bays = {}
         for s in irange(1, self.S):
@@ -0,0 +1,79 @@
+# Copyright (c) 2021 Bo Jin <jinbostar@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+# Templates: BRP_II, BRP2c and BRP_II_X depend on the bay only through their pre-processing, which fixes the variables
+# of period 1 to the initial configuration. Built with template=True, they fix these variables by their bounds instead
+# of by constraints, and set_bay moves the model to another bay of the same size by rewriting the bounds. Templates
+# keeps one such model per size, so that a stream of bays of the same size builds the model once.
+
+
+def fix(model, variables, values):
+    # lb = ub = value for each of the variables, at once where the model supports it (docplex)
+    if hasattr(model, 'change_var_lower_bounds'):
+        model.change_var_lower_bounds(variables, values)
+        model.change_var_upper_bounds(variables, values)
+    else:
+        for var, value in zip(variables, values):
+            var.lb = var.ub = value
+
+
+def free(model, variables):
+    # lb = 0 and ub = 1 for each of the (binary) variables, undoing fix
+    if hasattr(model, 'change_var_lower_bounds'):
+        model.change_var_lower_bounds(variables, [0] * len(variables))
+        model.change_var_upper_bounds(variables, [1] * len(variables))
+    else:
+        for var in variables:
+            (var.lb, var.ub) = (0, 1)
+
+
+class Templates:
+    # cls(bay, template=True, **kwargs) once per (n_stacks, n_tiers, n_blocks), moved to each later bay of the size
+    def __init__(self, cls, **kwargs):
+        assert cls.supports_template(kwargs), 'a model built with these flags depends on the bay'
+        self.cls = cls
+        self.kwargs = kwargs
+        self.instances = {}
+
+    def get(self, bay):
+        size = (bay.n_stacks, bay.n_tiers, bay.n_blocks)
+        if size not in self.instances:
+            self.instances[size] = self.cls(bay, template=True, **self.kwargs)
+        else:
+            instance = self.instances[size]
+            # the MIP starts of the previous bay do not carry over
+            instance.model.clear_mip_starts()
+            instance.set_bay(bay)
+        return self.instances[size]
+
+
+def test():
+    from time import perf_counter
+
+    from benchmark.generator import random_bays
+    from caserta2012.BRP_II import BRP_II
+
+    templates = Templates(BRP_II, bulk=True)
+    for bay in random_bays(3, 3, 5, 4):
+        start = perf_counter()
+        brp_ii = templates.get(bay)
+        build_time = perf_counter() - start
+        if brp_ii.model.solve():
+            print('n_relos = {} (build {:.3f}s)'.format(brp_ii.get_n_relos(), build_time))
+
+
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,73 @@
+# Copyright (c) 2021 Bo Jin <jinbostar@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+from itertools import islice
+
+from benchmark.generator import random_bay
+
+# Brute-force optima of small bays, the reference of the tests: a breadth-first search over configurations, in which
+# every block of minimum priority on top is retrieved at once (which never costs a relocation).
+
+
+def settle(conf):
+    conf = [list(stack) for stack in conf]
+    while any(conf):
+        p_min = min(p for stack in conf for p in stack)
+        s = next((s for s in range(len(conf)) if conf[s] and conf[s][-1] == p_min), None)
+        if s is None:
+            break
+        conf[s].pop()
+    return tuple(tuple(stack) for stack in conf)
+
+
+def optimum(bay, restricted=True):
+    # the fewest relocations that retrieve all blocks of a bay; if restricted, only blocks above a block of minimum
+    # priority are relocated
+    n_tiers = bay.n_tiers
+    start = settle([list(islice(bay.pri[s], bay.h[s])) for s in range(bay.n_stacks)])
+    (frontier, seen, depth) = ({start}, {start}, 0)
+    while frontier:
+        if any(not any(conf) for conf in frontier):
+            return depth
+        successors = set()
+        for conf in frontier:
+            p_min = min(p for stack in conf for p in stack)
+            for src in range(len(conf)):
+                if not conf[src] or restricted and p_min not in conf[src]:
+                    continue
+                for dst in range(len(conf)):
+                    if dst == src or len(conf[dst]) >= n_tiers:
+                        continue
+                    child = list(conf)
+                    child[dst] = conf[dst] + conf[src][-1:]
+                    child[src] = conf[src][:-1]
+                    child = settle(child)
+                    if child not in seen:
+                        seen.add(child)
+                        successors.add(child)
+        (frontier, depth) = (successors, depth + 1)
+    raise ValueError('no plan retrieves all blocks')
+
+
+def small_bays(n, n_priorities=None, seed=0):
+    # n random bays of 3 or 4 stacks and 3 or 4 tiers, with up to 10 blocks of distinct priorities (or of priorities
+    # drawn from 1..n_priorities)
+    bays = []
+    for i in range(n):
+        (n_stacks, n_tiers) = (3 + i % 2, 3 + i // 2 % 2)
+        n_blocks = min(10, n_stacks * n_tiers - n_tiers + 1) - i % 3
+        bays.append(random_bay(n_stacks, n_tiers, n_blocks, '{}-{}'.format(seed, i), n_priorities))
+    return bays
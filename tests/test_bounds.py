@@ -0,0 +1,82 @@
+# Copyright (c) 2021 Bo Jin <jinbostar@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import pytest
+
+from array_bay import ArrayBay
+from bay import Bay
+from brute import optimum, small_bays
+from deepen import HorizonDeepening
+from heuristics import best_plan, bracket, restricted_lower_bound
+from lu2020.BRP_m3 import BRP_m3
+from zehendner2015.BRP_II_A import BRP_II_A
+
+# Every lower bound against brute-force optima of small bays, with the bays on which a best-fit count of bad placements
+# exceeded the optimum (5 and 4 relocations).
+
+REGRESSIONS = [Bay(3, 4, [[4, 7, 3, 1], [2, 6, 8, 5], []]), Bay(3, 4, [[3, 6, 7, 5], [2, 1], [4]])]
+DISTINCT = REGRESSIONS + small_bays(200)
+DUPLICATE = small_bays(200, n_priorities=4)
+
+
+def total(bounds):
+    (lb, lb_plus) = bounds
+    return sum(lb.values()) + sum(lb_plus.values())
+
+
+def test_regressions():
+    assert [optimum(bay) for bay in REGRESSIONS] == [5, 4]
+    assert [bracket(bay)[0] for bay in REGRESSIONS] == [4, 3]
+
+
+@pytest.mark.parametrize('bay', DISTINCT)
+def test_distinct(bay):
+    opt = optimum(bay)
+    assert bay.compute_lb_kh() <= optimum(bay, restricted=False) <= opt
+    assert total(bay.compute_lb_zhu()) <= opt
+    assert total(bay.compute_lb_fb()) <= opt
+    assert total(bay.compute_lb_lu()) == total(bay.compute_lb_fb())
+    (lb, ub) = bracket(bay)
+    assert lb <= opt <= ub == best_plan(bay).n_relos
+
+
+@pytest.mark.parametrize('bay', DUPLICATE)
+def test_duplicate(bay):
+    opt = optimum(bay)
+    assert bay.compute_lb_kh() <= optimum(bay, restricted=False) <= opt
+    assert restricted_lower_bound(bay) <= opt <= best_plan(bay).n_relos
+
+
+@pytest.mark.parametrize('bay', REGRESSIONS + small_bays(20, n_priorities=4))
+def test_array_bay(bay):
+    array_bay = ArrayBay.from_bay(bay)
+    assert total(array_bay.compute_lb_lu()) == total(bay.compute_lb_lu())
+
+
+@pytest.mark.parametrize('bay', REGRESSIONS)
+def test_deepening(bay):
+    # the first horizon is the lower bound, so a bound above the optimum would cut off every optimal plan
+    deepening = HorizonDeepening(BRP_m3, bay, restricted=True, model='highs')
+    assert deepening.solve() and deepening.get_n_relos() == optimum(bay)
+
+
+@pytest.mark.parametrize('bay', REGRESSIONS)
+def test_models(bay):
+    # the bounds of the models only cut off plans that are not optimal
+    brp_ii_a = BRP_II_A(bay, model='highs')
+    assert (brp_ii_a.get_n_relos() if brp_ii_a.model.solve() else brp_ii_a.ub) == optimum(bay)
+    brp_m3 = BRP_m3(bay, restricted=True, model='highs')
+    assert brp_m3.model.solve() and round(brp_m3.get_n_relos()) == optimum(bay)
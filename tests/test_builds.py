@@ -0,0 +1,76 @@
+# Copyright (c) 2021 Bo Jin <jinbostar@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import pytest
+
+from benchmark.generator import random_bays
+from brute import optimum
+from models import load
+from template import Templates
+
+# The bulk, pruned, lazy and template builds of the formulations solved on HiGHS against brute-force optima of small
+# bays, as are the baseline builds. The non-bulk models index tiers up to n_stacks, so that n_stacks <= n_tiers; a
+# stream of bays of one size moves every template to bays it was not built for.
+
+BAYS = list(random_bays(3, 3, 6, 3, seed='builds')) + list(random_bays(3, 4, 7, 3, seed='builds'))
+BUILDS = [
+    ('BRP_II', {}),
+    ('BRP_II', {'bulk': True}),
+    ('BRP_II', {'prune': True}),
+    ('BRP_II', {'prune': True, 'bulk': True}),
+    ('BRP_II', {'lazy': True}),
+    ('BRP_II_A', {}),
+    ('BRP_II_A', {'bulk': True}),
+    ('BRP_II_A', {'prune': True}),
+    ('BRP_II_A', {'prune': True, 'bulk': True}),
+    ('BRP2c', {}),
+    ('BRP2c', {'bulk': True}),
+    ('BRP2c', {'lazy': True}),
+    ('BRP2ci', {}),
+    ('BRP2ci', {'bulk': True}),
+    ('BRP_II_X', {}),
+    ('BRP_II_X', {'bulk': True}),
+    ('CRP_I', {}),
+    ('CRP_I', {'lazy': True}),
+]
+TEMPLATES = [
+    ('BRP_II', {}),
+    ('BRP_II', {'bulk': True}),
+    ('BRP2c', {}),
+    ('BRP2c', {'bulk': True}),
+    ('BRP_II_X', {}),
+    ('BRP_II_X', {'bulk': True}),
+]
+OPTIMA = [optimum(bay) for bay in BAYS]
+
+
+def n_relos(instance):
+    # the optimum of the model, or the upper bound of a model that only admits plans below it (BRP_II_A)
+    if instance.model.solve():
+        return round(instance.get_n_relos())
+    return instance.ub
+
+
+@pytest.mark.parametrize('name, flags', BUILDS)
+def test_builds(name, flags):
+    cls = load(name)
+    assert [n_relos(cls(bay, model='highs', **flags)) for bay in BAYS] == OPTIMA
+
+
+@pytest.mark.parametrize('name, flags', TEMPLATES)
+def test_templates(name, flags):
+    templates = Templates(load(name), model='highs', **flags)
+    assert [n_relos(templates.get(bay)) for bay in BAYS] == OPTIMA
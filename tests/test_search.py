@@ -0,0 +1,45 @@
+# Copyright (c) 2021 Bo Jin <jinbostar@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import pytest
+
+from bay import Bay
+from bay_state import BayState, play
+from brute import optimum, small_bays
+from search import RestrictedSearch, lower_bound
+
+# RestrictedSearch against brute-force optima of small bays: the plan is valid, restricted and optimal, and the bound of
+# every node is admissible.
+
+REGRESSIONS = [Bay(3, 4, [[4, 7, 3, 1], [2, 6, 8, 5], []]), Bay(3, 4, [[3, 6, 7, 5], [2, 1], [4]])]
+
+
+@pytest.mark.parametrize('bay', REGRESSIONS + small_bays(100, seed=1) + small_bays(100, n_priorities=4, seed=1))
+def test_optimum(bay):
+    opt = optimum(bay)
+    assert lower_bound(BayState.from_bay(bay)) <= opt
+    search = RestrictedSearch(bay)
+    assert search.solve()
+    assert search.get_n_relos() == search.lb == opt
+    assert play(BayState.from_bay(bay), search.get_moves(), restricted=True) == opt
+
+
+def test_node_limit():
+    # a search that stops early keeps a valid bound and the heuristic plan
+    bay = small_bays(1, seed=2)[0]
+    search = RestrictedSearch(bay, node_limit=0)
+    search.solve()
+    assert search.lb <= optimum(bay) <= search.get_n_relos()
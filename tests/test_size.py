@@ -0,0 +1,39 @@
+# Copyright (c) 2021 Bo Jin <jinbostar@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import pytest
+
+from benchmark.generator import random_bay
+from models import load
+
+# The estimates of size.py against the models as built by backend.HighsModel.
+
+# (the non-bulk models index tiers up to W, so W <= H)
+BAYS = [random_bay(3, 3, 5, 0), random_bay(3, 4, 7, 1), random_bay(3, 4, 8, 2), random_bay(4, 4, 9, 4)]
+CASES = [
+    ('BRP_II', {}), ('BRP_II', {'bulk': True}), ('BRP_II', {'prune': True}), ('BRP_II', {'prune': True, 'bulk': True}),
+    ('BRP_II_A', {}), ('BRP_II_A', {'bulk': True}), ('BRP_II_A', {'prune': True}), ('BRP_II_A', {'prune': True, 'bulk': True}),
+    ('BRP2c', {}), ('BRP2ci', {}), ('BRP_II_X', {}),
+]
+
+
+@pytest.mark.parametrize('name, flags', CASES)
+@pytest.mark.parametrize('bay', BAYS)
+def test_estimate(name, flags, bay):
+    cls = load(name)
+    model = cls(bay, model='highs', **flags).model
+    size = cls.estimate_size(bay, model='highs', **flags)
+    assert (size.n_variables, size.n_constraints, size.n_nonzeros) == (model.number_of_variables, model.number_of_rows, model.number_of_nonzeros)
@@ -15,16 +15,17 @@
 
 from itertools import product
 
-from docplex.mp.model import Model
-
+from backend import new_model
 from bay import Bay
 from common import irange
+from size import Size
+from warm_start import add_mip_start, stages
 
 
 class MRIP:
-    def __init__(self, bay, bug_fixed=True):
+    def __init__(self, bay, bug_fixed=True, model=None):
         bay.validate_full_distinct()
-        self.model = model = Model()
+        self.model = model = new_model(model)
 
         self.C = C = bay.n_stacks
         self.P = P = bay.n_tiers
@@ -88,6 +89,57 @@ class MRIP:
         # (27)
         model.add_constraints(x[s, i, c, p] == X1[i, c, p] for i in irange(2, S) for s in irange(2, Q[i]) for c in irange(1, C) for p in irange(1, P))
 
+    @staticmethod
+    def estimate_size(bay, bug_fixed=True, model=None):
+        # the size of the model, counted from the index sets (see size.py)
+        (C, P, S) = (bay.n_stacks, bay.n_tiers, bay.n_blocks)
+        Q = {bay.pri[s][t]: bay.qlt[s][t] for s in range(bay.n_stacks) for t in range(bay.h[s])}
+        # the pairs (s, i) with i > s, the triples (s, i, j) of w and the keys (s, i) of x
+        pairs = S * (S - 1) // 2
+        triples = sum((S - s) * (S - s - 1) for s in irange(1, S - 1))
+        stages = S * (S + 1) // 2
+        size = Size(model)
+        for name in ['u', 'v', 'y', 'z']:
+            size.add_variables(name, pairs)
+        size.add_variables('w', triples)
+        size.add_variables('x', stages * C * P)
+        for name in ['(7)', '(8)', '(9)', '(10)']:
+            size.add_family(name, pairs, pairs * (1 + 2 * C * P))
+        size.add_family('(11)', pairs, pairs * 3)
+        size.add_family('(12)', pairs, pairs * (2 + 2 * C * P))
+        size.add_family('(13)', pairs, pairs * 2)
+        size.add_family('(14)', pairs, pairs * (1 + 2 * C * P))
+        size.add_family('(15)', stages, stages * C * P)
+        size.add_family('(16)', S * C * P, stages * C * P)
+        size.add_family('(17)', S * C * (P - 1), stages * C * (P - 1) * 2)
+        size.add_family('(18)', pairs * C, pairs * C * (2 * P + 1))
+        size.add_family('(19)', triples, triples * (3 + 2 * C * P))
+        size.add_family('(20)', triples, triples * (3 + 2 * C * P))
+        size.add_family('(21)', triples, triples * 2)
+        size.add_family('(22)', triples, triples * 2)
+        # x[s + 1, i, c, P] cancels out
+        size.add_family('(23)', triples * C, triples * C * (2 * P + 2))
+        size.add_family('(24)', pairs * C * P, pairs * C * P * 3)
+        size.add_family('(25)', pairs * C * P, pairs * C * P * 3)
+        size.add_family('(26)', (S if bug_fixed else S - 1) * C * P, (S if bug_fixed else S - 1) * C * P)
+        fixed = sum(max(0, Q[i] - 1) for i in irange(2, S)) * C * P
+        size.add_family('(27)', fixed, fixed)
+        return size
+
+    def add_mip_start(self, bay, moves):
+        # stage s begins with the configuration before block s is dug out (see warm_start.py)
+        (u, v, w, y, z, x) = ({}, {}, {}, {}, {}, {})
+        for s, (conf, relocations, (n, (c_s, p_s))) in enumerate(stages(bay, moves), 1):
+            assert n == s
+            x.update(((s, i, c, p), 1) for c, stack in enumerate(conf, 1) for p, i in enumerate(stack, 1))
+            position = {i: (c, p) for c, stack in enumerate(conf, 1) for p, i in enumerate(stack, 1)}
+            for i in irange(s + 1, self.S):
+                (c, p) = position[i]
+                (u[s, i], v[s, i], z[s, i]) = (int(c >= c_s), int(c <= c_s), int(c == c_s))
+                y[s, i] = int(c == c_s and p > p_s)
+            w.update(((s, i, j), 1) for i, _, _ in relocations for j, _, _ in relocations if position[j][1] > position[i][1])
+        return add_mip_start(self.model, (self.u, u), (self.v, v), (self.w, w), (self.y, y), (self.z, z), (self.x, x))
+
     def get_bays(self):
         bays = {}
         for s in irange(1, self.S):
@@ -0,0 +1,79 @@
+# Copyright (c) 2021 Bo Jin <jinbostar@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+from bay_state import BayState
+
+# MIP starts from a relocation plan, given as the moves of a BayState (see BayState.moves), with 1-based stacks and
+# tiers as in the models. Every model class has an add_mip_start(bay, moves) method that translates the plan into its
+# variables; a plan must fit into the model (e.g., into the horizon of the time-indexed models).
+
+
+def replay(bay, moves):
+    # yields, for every move, the block, its position (stack, tier) before the move and after it (None for a retrieval)
+    # and the state after the move
+    state = BayState.from_bay(bay)
+    for (src, dst, p) in moves:
+        assert state.top(src) == p
+        before = (src + 1, state.h[src])
+        if dst is None:
+            state.retrieve(src)
+            yield p, before, None, state
+        else:
+            after = (dst + 1, state.h[dst] + 1)
+            state.relocate(src, dst)
+            yield p, before, after, state
+
+
+def stages(bay, moves):
+    # one stage per retrieval: yields the configuration before the stage (a list of stacks, as the conf of a Bay), the
+    # relocations (block, before, after) of the stage and the retrieval (block, before)
+    conf = BayState.from_bay(bay).conf()
+    relocations = []
+    for (p, before, after, state) in replay(bay, moves):
+        if after is None:
+            yield conf, relocations, (p, before)
+            conf = state.conf()
+            relocations = []
+        else:
+            relocations.append((p, before, after))
+
+
+def add_mip_start(model, *assignments):
+    # assignments are (var_dict, values) pairs, where values maps keys of var_dict to the non-zero values of the plan;
+    # all other variables of the dictionaries are 0, so that the start is complete
+    values = {}
+    for (var_dict, keyed) in assignments:
+        assert all(key in var_dict for key, value in keyed.items() if value != 0), 'the plan does not fit into the model'
+        values.update((var, keyed.get(key, 0)) for key, var in var_dict.items())
+    solution = model.new_solution(values)
+    model.add_mip_start(solution)
+    return solution
+
+
+def test():
+    from bay import Bay
+    from demelodasilva2018.BRP_m2 import BRP_m2
+
+    bay = Bay(3, 3, [[4, 1], [2], [1, 3, 4]])
+    brp_m2 = BRP_m2(bay)
+    print('plan: {} relocations, {}'.format(brp_m2.plan.n_relos, brp_m2.plan.moves))
+    brp_m2.add_mip_start(bay, brp_m2.plan.moves)
+    if brp_m2.model.solve():
+        print('n_relos = {}'.format(brp_m2.get_n_relos()))
+
+
+if __name__ == '__main__':
+    test()
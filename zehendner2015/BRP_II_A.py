@@ -16,97 +16,332 @@
 
 from itertools import product
 
-from docplex.mp.model import Model
+import numpy as np
 
+from backend import new_model
 from bay import Bay
+from bulk import Rows, grid, var_index
 from common import irange
+from extract import Bays, block_grids, block_moves, solution_values, var_values
+from heuristics import best_plan
+from prune import Pruned, adder
+from size import Size, dry_run
+from warm_start import add_mip_start, stages
 
 
 class BRP_II_A:
-    def __init__(self, bay):
+    def __init__(self, bay, bulk=False, prune=False, model=None):
         bay.validate_full_distinct()
-        self.model = model = Model()
+        self.model = model = new_model(model)
 
         self.W = W = bay.n_stacks
         self.H = H = bay.n_tiers
         self.N = N = bay.n_blocks
 
-        self.b = b = model.binary_var_dict(((i, j, n, t) for i, j, t in product(irange(1, W), irange(1, H), irange(1, N)) for n in irange(t, N)), name='b')
-        self.x = x = model.binary_var_dict(((i, j, k, l, n, t) for i, j, k, l, t in product(irange(1, W), irange(2, H), irange(1, W), irange(1, H), irange(1, N - 1)) for n in irange(t + 1, N)), name='x')
-        self.y = y = model.binary_var_dict(((i, j, t, t) for i, j, t in product(irange(1, W), irange(1, H), irange(1, N - 1))), name='y')
-
         lb, lb_plus = bay.compute_lb_zhu()
-        lb_sum = model.sum(lb.values())
+        lb_sum = sum(lb.values())
         lb_plus_right = {}
         for t in reversed(irange(1, N)):
             lb_plus_right[t] = (lb_plus_right[t + 1] if t < N else 0) + lb_plus[t]
-        ub = bay.brp_min_max()
+        # (B) only admits solutions with fewer than ub relocations, so an infeasible model proves ub, and its heuristic
+        # plan, optimal
+        self.plan = plan = best_plan(bay)
+        self.ub = ub = plan.n_relos
         UB = {t: min(ub - 1 - lb_sum + lb[t] - lb_plus_right[t], H - 1) for t in irange(1, N)}
         Q = {bay.pri[s][t]: bay.qlt[s][t] for s in range(bay.n_stacks) for t in range(bay.h[s])}
         ix = {bay.pri[s][t]: s + 1 for s in range(bay.n_stacks) for t in range(bay.h[s])}
         jx = {bay.pri[s][t]: t + 1 for s in range(bay.n_stacks) for t in range(bay.h[s])}
 
+        # with prune, the variables that the pre-processing fixes to 0 are not created
+        zero = {'b': set(), 'x': set(), 'y': set()}
+        if prune:
+            for var, key, value in self.preprocessing(bay, Q, ix, jx):
+                if value == 0:
+                    zero[var].add(key)
+        self.b = b = model.binary_var_dict(((i, j, n, t) for i, j, t in product(irange(1, W), irange(1, H), irange(1, N)) for n in irange(t, N) if (i, j, n, t) not in zero['b']), name='b')
+        self.x = x = model.binary_var_dict(((i, j, k, l, n, t) for i, j, k, l, t in product(irange(1, W), irange(2, H), irange(1, W), irange(1, H), irange(1, N - 1)) for n in irange(t + 1, N) if (i, j, k, l, n, t) not in zero['x']), name='x')
+        self.y = y = model.binary_var_dict(((i, j, t, t) for i, j, t in product(irange(1, W), irange(1, H), irange(1, N - 1)) if (i, j, t, t) not in zero['y']), name='y')
+        if prune:
+            (self.b, self.x, self.y) = (b, x, y) = (Pruned(b), Pruned(x), Pruned(y))
+
         # objective
         model.minimize(model.sum(x[i, j, k, l, n, t] for i, j, k, l, t in product(irange(1, W), irange(2, H), irange(1, W), irange(1, H), irange(1, N - 1)) for n in irange(t + 1, N)))
+        if bulk:
+            self.add_constraints_bulk(bay, UB, Q, ix, jx, prune)
+            return
+        add = adder(model, prune)
         # (2)
-        model.add_constraints(model.sum(b[i, j, n, t] for n in irange(t, N)) <= 1 for i, j, t in product(irange(1, W), irange(1, H), irange(1, N - 1)))
+        add(model.sum(b[i, j, n, t] for n in irange(t, N)) <= 1 for i, j, t in product(irange(1, W), irange(1, H), irange(1, N - 1)))
         # (3)
-        model.add_constraints(model.sum(b[i, j, n, t] for n in irange(t, N)) >= model.sum(b[i, j + 1, n, t] for n in irange(t, N)) for i, j, t in product(irange(1, W), irange(1, H - 1), irange(1, N)))
+        add(model.sum(b[i, j, n, t] for n in irange(t, N)) >= model.sum(b[i, j + 1, n, t] for n in irange(t, N)) for i, j, t in product(irange(1, W), irange(1, H - 1), irange(1, N)))
         # (6a)
-        model.add_constraints(b[i, j, n, t + 1] == b[i, j, n, t] + model.sum(x[k, l, i, j, n, t] for k, l in product(irange(1, W), irange(2, H))) - (0 if j == 1 else model.sum(x[i, j, k, l, n, t] for k, l in product(irange(1, W), irange(1, H)))) for i, j, t in product(irange(1, W), irange(1, H), irange(1, N - 1)) for n in irange(t + 1, N))
+        add(b[i, j, n, t + 1] == b[i, j, n, t] + model.sum(x[k, l, i, j, n, t] for k, l in product(irange(1, W), irange(2, H))) - (0 if j == 1 else model.sum(x[i, j, k, l, n, t] for k, l in product(irange(1, W), irange(1, H)))) for i, j, t in product(irange(1, W), irange(1, H), irange(1, N - 1)) for n in irange(t + 1, N))
         # (6b)
-        model.add_constraints(b[i, j, t, t] - y[i, j, t, t] == 0 for i, j, t in product(irange(1, W), irange(1, H), irange(1, N - 1)))
+        add(b[i, j, t, t] - y[i, j, t, t] == 0 for i, j, t in product(irange(1, W), irange(1, H), irange(1, N - 1)))
         # (7'')
-        model.add_constraints(model.sum(y[i, j, t, t] for i, j in product(irange(1, W), irange(1, H))) == 1 for t in irange(1, N - 1))
+        add(model.sum(y[i, j, t, t] for i, j in product(irange(1, W), irange(1, H))) == 1 for t in irange(1, N - 1))
         # (8')
-        model.add_constraints((H - 1) * (1 - model.sum(x[i, j, k, l, n, t] for n in irange(t + 1, N))) >= model.sum(x[i, jj, k, ll, n, t] for n, jj, ll in product(irange(t + 1, N), irange(j + 1, H), irange(l + 1, H))) for i, j, k, l, t in product(irange(1, W), irange(2, H - 1), irange(1, W), irange(1, H - 1), irange(1, N - 1)))
+        add((H - 1) * (1 - model.sum(x[i, j, k, l, n, t] for n in irange(t + 1, N))) >= model.sum(x[i, jj, k, ll, n, t] for n, jj, ll in product(irange(t + 1, N), irange(j + 1, H), irange(l + 1, H))) for i, j, k, l, t in product(irange(1, W), irange(2, H - 1), irange(1, W), irange(1, H - 1), irange(1, N - 1)))
         # (A')
-        model.add_constraints(model.sum(y[i, jj, t, t] for jj in irange(1, j - 1)) >= model.sum(x[i, j, k, l, n, t] for k, l, n in product(irange(1, W), irange(1, H), irange(t + 1, N))) for i, j, t in product(irange(1, W), irange(2, H), irange(1, N - 1)))
+        add(model.sum(y[i, jj, t, t] for jj in irange(1, j - 1)) >= model.sum(x[i, j, k, l, n, t] for k, l, n in product(irange(1, W), irange(1, H), irange(t + 1, N))) for i, j, t in product(irange(1, W), irange(2, H), irange(1, N - 1)))
         # (B)
-        model.add_constraints(model.sum(x[i, j, k, l, n, t] for i, j, k, l, n in product(irange(1, W), irange(2, H), irange(1, W), irange(1, H), irange(t + 1, N))) <= UB[t] for t in irange(1, N - 1))
+        add(model.sum(x[i, j, k, l, n, t] for i, j, k, l, n in product(irange(1, W), irange(2, H), irange(1, W), irange(1, H), irange(t + 1, N))) <= UB[t] for t in irange(1, N - 1))
         # pre-processing
+        variables = {'b': b, 'x': x, 'y': y}
+        add(variables[var][key] == value for var, key, value in self.preprocessing(bay, Q, ix, jx))
+
+    def preprocessing(self, bay, Q, ix, jx):
+        # (variable, key, value) for every variable variable[key] that the pre-processing fixes to value
+        (W, H, N) = (self.W, self.H, self.N)
         # Block n is at position (i_n, j_n) and nowhere else until period π_n.
         # No other block n' may be located at position (i_n, j_n) until period π_n.
-        model.add_constraints(b[i, j, n, t] == int(bay.pri[i - 1][j - 1] == n) for i, j, n in product(irange(1, W), irange(1, H), irange(1, N)) for t in irange(1, Q[n]))
+        yield from (('b', (i, j, n, t), int(bay.pri[i - 1][j - 1] == n)) for i, j, n in product(irange(1, W), irange(1, H), irange(1, N)) for t in irange(1, Q[n]))
         # Position (i_n, j_n) is occupied by block n until period π_n.
         # Hence, no other block n' < n may be retrieved from position (i_n, j_n) prior to period π_n.
         # No other block n' may be relocated from or to position (i_n, j_n) until period π_n.
-        model.add_constraints(y[ix[n], jx[n], t, t] == 0 for n in irange(1, N) for t in irange(1, Q[n] - 1))
-        model.add_constraints(x[ix[n], jx[n], k, l, nn, t] == 0 for n in irange(1, N) if jx[n] >= 2 for nn in irange(2, N) if nn != n for k, l, t in product(irange(1, W), irange(1, H), irange(1, min(nn - 1, Q[n]))))
-        model.add_constraints(x[i, j, ix[n], jx[n], nn, t] == 0 for n in irange(1, N) for nn in irange(2, N) if nn != n for i, j, t in product(irange(1, W), irange(2, H), irange(1, min(nn - 1, Q[n]))))
+        yield from (('y', (ix[n], jx[n], t, t), 0) for n in irange(1, N) for t in irange(1, Q[n] - 1))
+        yield from (('x', (ix[n], jx[n], k, l, nn, t), 0) for n in irange(1, N) if jx[n] >= 2 for nn in irange(2, N) if nn != n for k, l, t in product(irange(1, W), irange(1, H), irange(1, min(nn - 1, Q[n]))))
+        yield from (('x', (i, j, ix[n], jx[n], nn, t), 0) for n in irange(1, N) for nn in irange(2, N) if nn != n for i, j, t in product(irange(1, W), irange(2, H), irange(1, min(nn - 1, Q[n]))))
         # If π_n < n, block n is relocated for the first time in period π_n.
         # It is not relocated prior to period π_n or from a position other than (i_n, j_n) in period π_n.
-        model.add_constraints(x[i, j, k, l, n, t] == 0 for n in irange(2, N) if Q[n] >= 2 for i, j, k, l, t in product(irange(1, W), irange(2, H), irange(1, W), irange(1, H), irange(1, min(n - 1, Q[n] - 1))))
-        model.add_constraints(x[i, j, k, l, n, Q[n]] == 0 for n in irange(2, N) if Q[n] < n for i, j in product(irange(1, W), irange(2, H)) if bay.pri[i - 1][j - 1] != n for k, l in product(irange(1, W), irange(1, H)))
+        yield from (('x', (i, j, k, l, n, t), 0) for n in irange(2, N) if Q[n] >= 2 for i, j, k, l, t in product(irange(1, W), irange(2, H), irange(1, W), irange(1, H), irange(1, min(n - 1, Q[n] - 1))))
+        yield from (('x', (i, j, k, l, n, Q[n]), 0) for n in irange(2, N) if Q[n] < n for i, j in product(irange(1, W), irange(2, H)) if bay.pri[i - 1][j - 1] != n for k, l in product(irange(1, W), irange(1, H)))
         # If π_n = n, block n is never relocated and retrieved from its initial position (i_n, j_n) in period t = n.
-        model.add_constraints(x[i, j, k, l, n, t] == 0 for n in irange(2, N) if Q[n] == n for i, j, k, l, t in product(irange(1, W), irange(2, H), irange(1, W), irange(1, H), irange(1, n - 1)))
-        model.add_constraints(y[i, j, t, t] == 0 for t in irange(1, N - 1) if Q[t] == t for i, j in product(irange(1, W), irange(1, H)) if bay.pri[i - 1][j - 1] != t)
+        yield from (('x', (i, j, k, l, n, t), 0) for n in irange(2, N) if Q[n] == n for i, j, k, l, t in product(irange(1, W), irange(2, H), irange(1, W), irange(1, H), irange(1, n - 1)))
+        yield from (('y', (i, j, t, t), 0) for t in irange(1, N - 1) if Q[t] == t for i, j in product(irange(1, W), irange(1, H)) if bay.pri[i - 1][j - 1] != t)
         # If π_n = n, only blocks in stack i_n and above j_n may be relocated in period π_n (Assumption A1).
-        model.add_constraints(x[i, j, k, l, nn, t] == 0 for t in irange(1, N - 1) if Q[t] == t for i in irange(1, W) if i != ix[t] for j, k, l, nn in product(irange(2, H), irange(1, W), irange(1, H), irange(t + 1, N)))
-        model.add_constraints(x[ix[t], j, k, l, nn, t] == 0 for t in irange(1, N - 1) if Q[t] == t and jx[t] >= 2 for j, k, l, nn in product(irange(2, jx[t]), irange(1, W), irange(1, H), irange(t + 1, N)))
+        yield from (('x', (i, j, k, l, nn, t), 0) for t in irange(1, N - 1) if Q[t] == t for i in irange(1, W) if i != ix[t] for j, k, l, nn in product(irange(2, H), irange(1, W), irange(1, H), irange(t + 1, N)))
+        yield from (('x', (ix[t], j, k, l, nn, t), 0) for t in irange(1, N - 1) if Q[t] == t and jx[t] >= 2 for j, k, l, nn in product(irange(2, jx[t]), irange(1, W), irange(1, H), irange(t + 1, N)))
         # If π_n = n, position (i_n, j_n) and all positions above have to be empty in period n + 1.
         # No containers can be retrieved or relocated from these positions in period π_n + 1.
-        model.add_constraints(b[ix[n], j, nn, n + 1] == 0 for n in irange(1, N - 1) if Q[n] == n for j, nn in product(irange(max(2, jx[n]), H), irange(n + 1, N)))
-        model.add_constraints(y[ix[n], j, n + 1, n + 1] == 0 for n in irange(1, N - 2) if Q[n] == n for j in irange(max(2, jx[n]), H))
-        model.add_constraints(x[ix[n], j, k, l, nn, n + 1] == 0 for n in irange(1, N - 2) if Q[n] == n for j, k, l, nn in product(irange(max(2, jx[n]), H), irange(1, W), irange(1, H), irange(n + 2, N)))
+        yield from (('b', (ix[n], j, nn, n + 1), 0) for n in irange(1, N - 1) if Q[n] == n for j, nn in product(irange(max(2, jx[n]), H), irange(n + 1, N)))
+        yield from (('y', (ix[n], j, n + 1, n + 1), 0) for n in irange(1, N - 2) if Q[n] == n for j in irange(max(2, jx[n]), H))
+        yield from (('x', (ix[n], j, k, l, nn, n + 1), 0) for n in irange(1, N - 2) if Q[n] == n for j, k, l, nn in product(irange(max(2, jx[n]), H), irange(1, W), irange(1, H), irange(n + 2, N)))
         # At period t, tiers at height h > N_t may not be occupied and no containers can be retrieved or relocated from these positions:
-        model.add_constraints(b[i, j, n, t] == 0 for t in irange(max(1, N + 2 - H), N) for i, j, n in product(irange(1, W), irange(N + 2 - t, H), irange(t, N)))
-        model.add_constraints(y[i, j, t, t] == 0 for t in irange(max(1, N + 2 - H), N - 1) for i, j in product(irange(1, W), irange(N + 2 - t, H)))
-        model.add_constraints(x[i, j, k, l, n, t] == 0 for t in irange(max(1, N + 2 - H), N - 1) for i, j, k, l, n in product(irange(1, W), irange(N + 2 - t, H), irange(1, W), irange(1, H), irange(t + 1, N)))
+        yield from (('b', (i, j, n, t), 0) for t in irange(max(1, N + 2 - H), N) for i, j, n in product(irange(1, W), irange(N + 2 - t, H), irange(t, N)))
+        yield from (('y', (i, j, t, t), 0) for t in irange(max(1, N + 2 - H), N - 1) for i, j in product(irange(1, W), irange(N + 2 - t, H)))
+        yield from (('x', (i, j, k, l, n, t), 0) for t in irange(max(1, N + 2 - H), N - 1) for i, j, k, l, n in product(irange(1, W), irange(N + 2 - t, H), irange(1, W), irange(1, H), irange(t + 1, N)))
         # At period t, relocation blocks can only be put into tiers h <= N_{t + 1} = N_t − 1:
-        model.add_constraints(x[i, j, k, l, n, t] == 0 for t in irange(max(1, N + 1 - H), N - 1) for i, j, k, l, n in product(irange(1, W), irange(2, H), irange(1, W), irange(N + 1 - t, H), irange(t + 1, N)))
+        yield from (('x', (i, j, k, l, n, t), 0) for t in irange(max(1, N + 1 - H), N - 1) for i, j, k, l, n in product(irange(1, W), irange(2, H), irange(1, W), irange(N + 1 - t, H), irange(t + 1, N)))
         # Relocations x_{ijklnt} with i = k may not exist.
-        model.add_constraints(x[i, j, i, l, n, t] == 0 for i, j, l, n in product(irange(1, W), irange(2, H), irange(1, W), irange(2, N)) for t in irange(1, n - 1))
-
-    def get_bays(self):
-        bays = {}
-        for t in irange(1, self.N):
-            mat = [[None] * self.H for _ in range(self.W)]
-            for i, j, n in product(irange(1, self.W), irange(1, self.H), irange(t, self.N)):
-                if round(self.b[i, j, n, t].solution_value) == 1:
-                    mat[i - 1][j - 1] = n
-            bays[t] = Bay(self.W, self.H, mat)
-        return bays
+        yield from (('x', (i, j, i, l, n, t), 0) for i, j, l, n in product(irange(1, W), irange(2, H), irange(1, W), irange(2, N)) for t in irange(1, n - 1))
+
+    @staticmethod
+    def estimate_size(bay, bulk=False, prune=False, model=None):
+        # the size of the model, counted from the index sets (see size.py); with prune, the variables that the
+        # pre-processing fixes depend on the bay, so the counts are those of a dry run of the build (size.dry_run)
+        (W, H, N) = (bay.n_stacks, bay.n_tiers, bay.n_blocks)
+        pairs = N * (N - 1) // 2
+        # the relocations of a period t, from tiers 2..H, over n = t + 1..N
+        X = W * (H - 1) * W * H
+        Q = {bay.pri[s][t]: bay.qlt[s][t] for s in range(W) for t in range(bay.h[s])}
+        jx = {bay.pri[s][t]: t + 1 for s in range(W) for t in range(bay.h[s])}
+        size = Size(model, bulk)
+        size.add_variables('b', W * H * N * (N + 1) // 2)
+        size.add_variables('x', X * pairs)
+        size.add_variables('y', W * H * (N - 1))
+        size.add_family('(2)', W * H * (N - 1), W * H * (N - 1) * (N + 2) // 2, W * H * (N - 1) * N)
+        size.add_family('(3)', W * (H - 1) * N, W * (H - 1) * N * (N + 1), W * (H - 1) * N * N)
+        # x[i, j, i, j, n, t] cancels out for j >= 2
+        size.add_family('(6a)', W * H * pairs, W * pairs * (2 + W * (H - 1) + (H - 1) * (W * (H - 1) + W * H)), W * H * (N - 1) * N * W * H)
+        size.add_family('(6b)', W * H * (N - 1), W * H * (N - 1) * 2, W * H * (N - 1))
+        size.add_family("(7'')", N - 1, (N - 1) * W * H, (N - 1) * W * H)
+        size.add_family("(8')", W * (H - 2) * W * (H - 1) * (N - 1), W * W * pairs * ((H - 2) * (H - 1) + (H - 2) * (H - 1) // 2 * (H - 1) * H // 2), W * H * W * H * (N - 1) * N * H * H)
+        size.add_family("(A')", W * (H - 1) * (N - 1), W * (N - 1) * H * (H - 1) // 2 + X * pairs, W * H * (N - 1) * W * H * N)
+        size.add_family('(B)', N - 1, X * pairs, (N - 1) * W * H * W * H * N)
+
+        # one row and one non-zero per variable fixed by the pre-processing (as repeated by it), with the tiers up to W
+        # of the last group (as in bulk), term by term in the order of preprocessing
+        def above(n):
+            return max(0, H - max(2, jx[n]) + 1)
+
+        # b of every position and block until period π_n, and y at (i_n, j_n) before π_n
+        fixed = sum(W * H * Q[n] + Q[n] - 1 for n in irange(1, N))
+        # x of every other block nn from (i_n, j_n) (if j_n >= 2) and to it, until period min(nn - 1, π_n)
+        fixed += sum(W * (H - 1 + H * int(jx[n] >= 2)) * min(nn - 1, Q[n]) for n in irange(1, N) for nn in irange(2, N) if nn != n)
+        # x of block n before period π_n
+        fixed += sum(X * min(n - 1, Q[n] - 1) for n in irange(2, N) if Q[n] >= 2)
+        # x of block n from another position than (i_n, j_n) in period π_n < n
+        fixed += sum((W * (H - 1) - int(jx[n] >= 2)) * W * H for n in irange(2, N) if Q[n] < n)
+        # x of block n before period n = π_n
+        fixed += sum(X * (n - 1) for n in irange(2, N) if Q[n] == n)
+        # in period t = π_t, y of the other positions, and x from the other stacks and from below j_t (Assumption A1)
+        fixed += sum(W * H - 1 + ((W - 1) * (H - 1) + max(0, jx[t] - 1)) * W * H * (N - t) for t in irange(1, N - 1) if Q[t] == t)
+        # in period n + 1 for π_n = n, b at (i_n, j_n) and above, then y and x from there
+        fixed += sum(above(n) * (N - n) for n in irange(1, N - 1) if Q[n] == n)
+        fixed += sum(above(n) * (1 + W * H * (N - n - 1)) for n in irange(1, N - 2) if Q[n] == n)
+        # in period t, b above tier N_t, then y and x from there
+        fixed += sum(W * max(0, H - N - 1 + t) * (N - t + 1) for t in irange(max(1, N + 2 - H), N))
+        fixed += sum(W * max(0, H - N - 1 + t) * (1 + W * H * (N - t)) for t in irange(max(1, N + 2 - H), N - 1))
+        # in period t, x to the tiers above N_{t + 1}
+        fixed += sum(W * (H - 1) * W * max(0, H - N + t) * (N - t) for t in irange(max(1, N + 1 - H), N - 1))
+        # x with i = k
+        fixed += W * (H - 1) * min(W, H) * pairs
+        # (the grid of the largest of its bulk parts)
+        size.add_family('pre-processing', fixed, fixed, N * W * H * W * H * N)
+        return dry_run(BRP_II_A, bay, size, prune=True) if prune else size
+
+    def add_constraints_bulk(self, bay, UB, Q, ix, jx, prune):
+        # the constraints above, assembled with NumPy (0-based indices) and loaded into CPLEX at once (see bulk.py)
+        model = self.model
+        (W, H, N) = (self.W, self.H, self.N)
+        b = var_index(self.b, (W, H, N, N))
+        x = var_index(self.x, (W, H, W, H, N, N))
+        y = var_index(self.y, (W, H, N, N))
+        pri = np.array([[p or 0 for p in bay.pri[s]] for s in range(W)])
+        # 1-based values indexed by 0-based n
+        Q = np.array([Q[n] for n in irange(1, N)])
+        ix = np.array([ix[n] for n in irange(1, N)]) - 1
+        jx = np.array([jx[n] for n in irange(1, N)])
+        UB = np.array([UB[t] for t in irange(1, N - 1)])
+
+        # (2)
+        rows = Rows((W, H, N - 1), 'L', 1)
+        (i, j, t, n) = grid(W, H, N - 1, N)
+        rows.add(b[i, j, n, t], 1, (i, j, t))
+        rows.post(model, not prune)
+        # (3)
+        rows = Rows((W, H - 1, N), 'G')
+        (i, j, t, n) = grid(W, H - 1, N, N)
+        rows.add(b[i, j, n, t], 1, (i, j, t))
+        rows.add(b[i, j + 1, n, t], -1, (i, j, t))
+        rows.post(model, not prune)
+        # (6a)
+        (i, j, t, n, k, l) = grid(W, H, N - 1, N, W, H)
+        rows = Rows((W, H, N - 1, N), 'E', where=n > t)
+        rows.add(b[i, j, n, t + 1], 1, (i, j, t, n))
+        rows.add(b[i, j, n, t], -1, (i, j, t, n))
+        rows.add(x[k, l, i, j, n, t], -1, (i, j, t, n))
+        rows.add(x[i, j, k, l, n, t], 1, (i, j, t, n))
+        rows.post(model, not prune)
+        # (6b)
+        rows = Rows((W, H, N - 1), 'E')
+        (i, j, t) = grid(W, H, N - 1)
+        rows.add(b[i, j, t, t], 1, (i, j, t))
+        rows.add(y[i, j, t, t], -1, (i, j, t))
+        rows.post(model, not prune)
+        # (7'')
+        rows = Rows((N - 1,), 'E', 1)
+        (t, i, j) = grid(N - 1, W, H)
+        rows.add(y[i, j, t, t], 1, (t,))
+        rows.post(model, not prune)
+        # (8')
+        (i, j, k, l, t, n, jj, ll) = grid(W, H, W, H, N - 1, N, H, H)
+        rows = Rows((W, H, W, H, N - 1), 'L', H - 1, where=(j >= 1) & (j < H - 1) & (l < H - 1))
+        rows.add(x[i, j, k, l, n, t], H - 1, (i, j, k, l, t))
+        rows.add(x[i, jj, k, ll, n, t], 1, (i, j, k, l, t), (jj > j) & (ll > l))
+        rows.post(model, not prune)
+        # (A')
+        (i, j, t, jj, k, l, n) = grid(W, H, N - 1, H, W, H, N)
+        rows = Rows((W, H, N - 1), 'G', where=j >= 1)
+        rows.add(y[i, jj, t, t], 1, (i, j, t), jj < j)
+        rows.add(x[i, j, k, l, n, t], -1, (i, j, t))
+        rows.post(model, not prune)
+        # (B)
+        rows = Rows((N - 1,), 'L', UB)
+        (t, i, j, k, l, n) = grid(N - 1, W, H, W, H, N)
+        rows.add(x[i, j, k, l, n, t], 1, (t,))
+        rows.post(model, not prune)
+
+        # pre-processing
+        (i, j, n, t) = grid(W, H, N, N)
+        rows = Rows((W, H, N, N), 'E', pri[i, j] == n + 1, t < Q[n])
+        rows.add(b[i, j, n, t], 1, (i, j, n, t))
+        rows.post(model, not prune)
+        (n, t) = grid(N, N)
+        rows = Rows((N, N), 'E', where=t < Q[n] - 1)
+        rows.add(y[ix[n], jx[n] - 1, t, t], 1, (n, t))
+        rows.post(model, not prune)
+        (n, nn, k, l, t) = grid(N, N, W, H, N)
+        rows = Rows((N, N, W, H, N), 'E', where=(jx[n] >= 2) & (nn >= 1) & (nn != n) & (t < nn) & (t < Q[n]))
+        rows.add(x[ix[n], jx[n] - 1, k, l, nn, t], 1, (n, nn, k, l, t))
+        rows.post(model, not prune)
+        (n, nn, i, j, t) = grid(N, N, W, H, N)
+        rows = Rows((N, N, W, H, N), 'E', where=(nn >= 1) & (nn != n) & (j >= 1) & (t < nn) & (t < Q[n]))
+        rows.add(x[i, j, ix[n], jx[n] - 1, nn, t], 1, (n, nn, i, j, t))
+        rows.post(model, not prune)
+        (n, i, j, k, l, t) = grid(N, W, H, W, H, N)
+        rows = Rows((N, W, H, W, H, N), 'E', where=(n >= 1) & (Q[n] >= 2) & (j >= 1) & (t < n) & (t < Q[n] - 1))
+        rows.add(x[i, j, k, l, n, t], 1, (n, i, j, k, l, t))
+        rows.post(model, not prune)
+        (n, i, j, k, l) = grid(N, W, H, W, H)
+        rows = Rows((N, W, H, W, H), 'E', where=(n >= 1) & (Q[n] < n + 1) & (j >= 1) & (pri[i, j] != n + 1))
+        rows.add(x[i, j, k, l, n, Q[n] - 1], 1, (n, i, j, k, l))
+        rows.post(model, not prune)
+        (n, i, j, k, l, t) = grid(N, W, H, W, H, N)
+        rows = Rows((N, W, H, W, H, N), 'E', where=(n >= 1) & (Q[n] == n + 1) & (j >= 1) & (t < n))
+        rows.add(x[i, j, k, l, n, t], 1, (n, i, j, k, l, t))
+        rows.post(model, not prune)
+        (t, i, j) = grid(N - 1, W, H)
+        rows = Rows((N - 1, W, H), 'E', where=(Q[t] == t + 1) & (pri[i, j] != t + 1))
+        rows.add(y[i, j, t, t], 1, (t, i, j))
+        rows.post(model, not prune)
+        (t, i, j, k, l, nn) = grid(N - 1, W, H, W, H, N)
+        rows = Rows((N - 1, W, H, W, H, N), 'E', where=(Q[t] == t + 1) & (i != ix[t]) & (j >= 1) & (nn > t))
+        rows.add(x[i, j, k, l, nn, t], 1, (t, i, j, k, l, nn))
+        rows.post(model, not prune)
+        (t, j, k, l, nn) = grid(N - 1, H, W, H, N)
+        rows = Rows((N - 1, H, W, H, N), 'E', where=(Q[t] == t + 1) & (jx[t] >= 2) & (j >= 1) & (j < jx[t]) & (nn > t))
+        rows.add(x[ix[t], j, k, l, nn, t], 1, (t, j, k, l, nn))
+        rows.post(model, not prune)
+        (n, j, nn) = grid(N - 1, H, N)
+        rows = Rows((N - 1, H, N), 'E', where=(Q[n] == n + 1) & (j + 1 >= np.maximum(2, jx[n])) & (nn > n))
+        rows.add(b[ix[n], j, nn, n + 1], 1, (n, j, nn))
+        rows.post(model, not prune)
+        (n, j) = grid(max(0, N - 2), H)
+        rows = Rows((max(0, N - 2), H), 'E', where=(Q[n] == n + 1) & (j + 1 >= np.maximum(2, jx[n])))
+        rows.add(y[ix[n], j, n + 1, n + 1], 1, (n, j))
+        rows.post(model, not prune)
+        (n, j, k, l, nn) = grid(max(0, N - 2), H, W, H, N)
+        rows = Rows((max(0, N - 2), H, W, H, N), 'E', where=(Q[n] == n + 1) & (j + 1 >= np.maximum(2, jx[n])) & (nn >= n + 2))
+        rows.add(x[ix[n], j, k, l, nn, n + 1], 1, (n, j, k, l, nn))
+        rows.post(model, not prune)
+        (t, i, j, n) = grid(N, W, H, N)
+        rows = Rows((N, W, H, N), 'E', where=(t + 1 >= N + 2 - H) & (j >= N - t) & (n >= t))
+        rows.add(b[i, j, n, t], 1, (t, i, j, n))
+        rows.post(model, not prune)
+        (t, i, j) = grid(N - 1, W, H)
+        rows = Rows((N - 1, W, H), 'E', where=(t + 1 >= N + 2 - H) & (j >= N - t))
+        rows.add(y[i, j, t, t], 1, (t, i, j))
+        rows.post(model, not prune)
+        (t, i, j, k, l, n) = grid(N - 1, W, H, W, H, N)
+        rows = Rows((N - 1, W, H, W, H, N), 'E', where=(t + 1 >= N + 2 - H) & (j >= N - t) & (n > t))
+        rows.add(x[i, j, k, l, n, t], 1, (t, i, j, k, l, n))
+        rows.post(model, not prune)
+        (t, i, j, k, l, n) = grid(N - 1, W, H, W, H, N)
+        rows = Rows((N - 1, W, H, W, H, N), 'E', where=(t + 1 >= N + 1 - H) & (j >= 1) & (l >= N - 1 - t) & (n > t))
+        rows.add(x[i, j, k, l, n, t], 1, (t, i, j, k, l, n))
+        rows.post(model, not prune)
+        # (tiers up to W, as above)
+        (i, j, l, n, t) = grid(W, H, min(W, H), N, N)
+        rows = Rows((W, H, min(W, H), N, N), 'E', where=(j >= 1) & (n >= 1) & (t < n))
+        rows.add(x[i, j, i, l, n, t], 1, (i, j, l, n, t))
+        rows.post(model, not prune)
+
+    def add_mip_start(self, bay, moves):
+        # period t begins with the configuration before block t is dug out (see warm_start.py); by (B), only a plan with
+        # fewer than ub relocations fits, so self.plan does not
+        assert sum(1 for (_, dst, _) in moves if dst is not None) < self.ub, 'the plan does not improve on ub'
+        (b, x, y) = ({}, {}, {})
+        for t, (conf, relocations, (n, (i, j))) in enumerate(stages(bay, moves), 1):
+            assert n == t
+            b.update(((k, l, nn, t), 1) for k, stack in enumerate(conf, 1) for l, nn in enumerate(stack, 1))
+            x.update(((ii, jj, k, l, nn, t), 1) for nn, (ii, jj), (k, l) in relocations)
+            if t < self.N:
+                y[i, j, t, t] = 1
+        return add_mip_start(self.model, (self.b, b), (self.x, x), (self.y, y))
+
+    def get_moves(self, values=None):
+        # the plan as (src, dst, block, period), decoded from all values at once (by default, of the solution; see
+        # extract.py)
+        values = solution_values(self.model) if values is None else values
+        (W, H, N) = (self.W, self.H, self.N)
+        return block_moves(var_values(self.b, (W, H, N, N), values), var_values(self.x, (W, H, W, H, N, N), values))
+
+    def get_bays(self, values=None):
+        # period -> Bay, built on access
+        values = solution_values(self.model) if values is None else values
+        return Bays(block_grids(var_values(self.b, (self.W, self.H, self.N, self.N), values)))
 
     def get_n_relos(self):
         return self.model.objective_value
@@ -126,6 +361,9 @@ def test():
         for t in irange(1, brp2c.N):
             print('t = {}'.format(t))
             print(bays[t])
+    else:
+        print()
+        print('n_relos = {} (heuristic)'.format(brp2c.ub))
 
 
 if __name__ == '__main__':
@@ -16,16 +16,16 @@
 
 from itertools import product
 
-from docplex.mp.model import Model
-
+from backend import new_model
 from bay import Bay
 from common import irange
+from size import Size
 
 
 class BRP_II_C:
-    def __init__(self, bay):
+    def __init__(self, bay, model=None):
         bay.validate_full_distinct()
-        self.model = model = Model()
+        self.model = model = new_model(model)
 
         self.W = W = bay.n_stacks
         self.H = H = bay.n_tiers
@@ -60,6 +60,27 @@ class BRP_II_C:
         # pre-processing
         model.add_constraints(b[i, j, n, 1] == int(bay.pri[i - 1][j - 1] == n) for i, j, n in product(irange(1, W), irange(1, H), irange(1, N)))
 
+    @staticmethod
+    def estimate_size(bay, model=None):
+        # the size of the model, counted from the index sets (see size.py)
+        (W, H, N) = (bay.n_stacks, bay.n_tiers, bay.n_blocks)
+        size = Size(model)
+        size.add_variables('b', W * H * N * N)
+        size.add_variables('x', W * H * W * H * N * N)
+        size.add_variables('y', W * H * N * N)
+        size.add_family('(1)', N * N, N * N * W * H)
+        size.add_family('(2)', W * H * N, W * H * N * N)
+        size.add_family('(3)', W * (H - 1) * N, W * (H - 1) * N * 2 * N)
+        # x[i, j, i, j, n, t - 1] cancels out
+        size.add_family('(6)', W * H * N * (N - 1), W * H * N * (N - 1) * (2 * W * H + 1))
+        size.add_family("(7')", N * (N - 1), N * W * H * N * (N - 1) // 2)
+        size.add_family("(8')", W * (H - 1) * W * (H - 1) * N, W * W * N * N * ((H - 1) ** 2 + (H * (H - 1) // 2) ** 2))
+        size.add_family('(9)', W * N, W * N * (H + (W - 1) * H * W * H * N))
+        size.add_family('(10)', W * H * H * N * N, W * H * H * N * N)
+        size.add_family('(A)', W * (H - 1) * N, W * (H - 1) * N * (2 * W * H * N + 2 * N))
+        size.add_family('pre-processing', W * H * N, W * H * N)
+        return size
+
     def get_bays(self):
         bays = {}
         for t in irange(1, self.N):
@@ -0,0 +1,90 @@
+# Copyright (c) 2021 Bo Jin <jinbostar@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+from collections import OrderedDict
+
+MASK = (1 << 64) - 1
+
+_keys = {}
+
+
+def zobrist_key(s, t, p):
+    # 64-bit key of priority p at stack s and tier t (0-based), derived with splitmix64 so that hashes are stable across
+    # processes and runs
+    key = _keys.get((s, t, p))
+    if key is None:
+        z = (((p << 20) ^ (s << 10) ^ t) * 0x9e3779b97f4a7c15 + 0x9e3779b97f4a7c15) & MASK
+        z = ((z ^ (z >> 30)) * 0xbf58476d1ce4e5b9) & MASK
+        z = ((z ^ (z >> 27)) * 0x94d049bb133111eb) & MASK
+        _keys[s, t, p] = key = z ^ (z >> 31)
+    return key
+
+
+def zobrist_hash(stacks):
+    key = 0
+    for s in range(len(stacks)):
+        for t in range(len(stacks[s])):
+            key ^= zobrist_key(s, t, stacks[s][t])
+    return key
+
+
+class TranspositionTable:
+    # bounded map from a state hash to (bound, cost): bound is a lower bound and cost (or None) an upper bound on the
+    # number of relocations still needed from the state. With replacement='lru', the least recently used entry is
+    # evicted. With replacement='depth', the table has one slot per hash modulo capacity, and a colliding entry is only
+    # replaced by one at the same or a smaller depth (closer to the root, hence covering a larger subtree).
+    def __init__(self, capacity=1 << 20, replacement='lru'):
+        assert capacity > 0 and replacement in ['lru', 'depth']
+        self.capacity = capacity
+        self.replacement = replacement
+        if replacement == 'lru':
+            self.entries = OrderedDict()
+        else:
+            self.slots = [None] * capacity
+            self.n_entries = 0
+
+    def __len__(self):
+        return len(self.entries) if self.replacement == 'lru' else self.n_entries
+
+    def lookup(self, key):
+        if self.replacement == 'lru':
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            self.entries.move_to_end(key)
+            return entry[1:]
+        slot = self.slots[key % self.capacity]
+        return slot[2:] if slot is not None and slot[0] == key else None
+
+    def store(self, key, bound, cost=None, depth=0):
+        # bounds only ever tighten
+        old = self.lookup(key)
+        if old is not None:
+            bound = max(bound, old[0])
+            cost = old[1] if cost is None else cost if old[1] is None else min(cost, old[1])
+        if self.replacement == 'lru':
+            self.entries[key] = (depth, bound, cost)
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+            return
+        i = key % self.capacity
+        slot = self.slots[i]
+        if slot is None:
+            self.n_entries += 1
+        elif slot[0] != key and slot[1] < depth:
+            return
+        self.slots[i] = (key, depth if slot is None or slot[0] != key else min(depth, slot[1]), bound, cost)